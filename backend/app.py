@@ -6,22 +6,35 @@ from datetime import datetime
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit, join_room
+from werkzeug.exceptions import RequestEntityTooLarge
 from utils.learning_agent import (
     analyze_screenshot,
     handle_screenshot_event,
     user_state,
     generate_and_send_popup_message,
+    warm_up,
 )
+from utils.analysis_jobs import QueueFullError, analysis_jobs
+from utils.capture_control import capture_controller
 from utils.database_context import db_context
+from utils.flow_scheduler import flow_scheduler
+from utils.frame_coalescer import frame_coalescer, superseded_result
+from utils.popup_bus import popup_bus
+from utils.screenshot_ingest import MAX_UPLOAD_BYTES, parse_bool, read_screenshot_request
+from utils.verifier_resilience import verifier_guard
 
 # Add the backend directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 app = Flask(__name__)
+# Reject oversized bodies (413) before they are read or buffered
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
 CORS(app)  # Allow React to make requests
 
 # Initialize SocketIO
 socketio = SocketIO(app, cors_allowed_origins="*")
+# Server-side code emits through the bus (no loopback HTTP; fans out across workers if configured)
+popup_bus.bind(socketio.emit)
 
 # Import routes
 from routes import api_routes
@@ -37,18 +50,164 @@ app.register_blueprint(media_bp, url_prefix='/api')
 
 @app.route('/screenshot', methods=['POST'])
 def screenshot():
+    """
+    Analyze a screenshot. Accepts JSON with a base64 "image", a multipart upload with an
+    "image" file part, or the raw image bytes as the body (image/* or
+    application/octet-stream) with the remaining fields in the query string.
+
+    With "async" set (or SCREENSHOT_ASYNC_DEFAULT=1) the frame is queued and the
+    endpoint returns 202 with a job id; the result is emitted to the user's room as
+    a "screenshot_result" event and can also be polled at /api/screenshot-jobs/<job_id>.
+    """
     try:
-        # Get the request data
-        data = request.get_json()
+        base64_image, data = read_screenshot_request(request)
+    except RequestEntityTooLarge:
+        return jsonify({
+            "message": f"Screenshot exceeds the {MAX_UPLOAD_BYTES} byte upload limit",
+            "status": "error"
+        }), 413
+    except Exception as e:
+        return jsonify({
+            "message": f"Error processing request: {str(e)}",
+            "status": "error"
+        }), 400
+
+    if not base64_image:
+        return jsonify({
+            "message": "No image data provided",
+            "status": "error"
+        }), 400
 
-        if not data or 'image' not in data:
+    user_id = str(data.get('user_id') or os.getenv("DEFAULT_USER_ID", "default-user"))
+    limited = _enforce_capture_rate(user_id)
+    if limited:
+        body, status_code, retry_after = limited
+        response = jsonify(body)
+        response.headers['Retry-After'] = str(retry_after)
+        return response, status_code
+
+    if parse_bool(data.get('async', os.getenv("SCREENSHOT_ASYNC_DEFAULT", "0"))):
+        try:
+            if parse_bool(data.get('stateless', False)):
+                job = analysis_jobs.submit(user_id, _run_screenshot_job, base64_image, data)
+            else:
+                job = _submit_latest_frame(user_id, base64_image, data)
+        except QueueFullError:
             return jsonify({
-                "message": "No image data provided",
+                "message": "Analysis queue is full; retry later",
                 "status": "error"
-            }), 400
+            }), 503
+        return jsonify({
+            "message": "Screenshot queued for analysis",
+            "status": "accepted",
+            "job_id": job.id,
+            "status_url": f"/api/screenshot-jobs/{job.id}"
+        }), 202
+
+    body, status_code = process_screenshot(base64_image, data)
+    return jsonify(body), status_code
+
+
+def _enforce_capture_rate(user_id):
+    """Token-bucket check against the user's recommended capture interval; None if allowed."""
+    allowed, retry_after = capture_controller.allow(user_id)
+    if allowed:
+        return None
+    retry_after = max(1, int(retry_after + 0.999))
+    return {
+        "message": "Screenshots are arriving faster than the recommended capture interval",
+        "status": "rate_limited",
+        "capture_interval_ms": int(capture_controller.interval_for(user_id) * 1000),
+        "retry_after": retry_after
+    }, 429, retry_after
+
+
+def push_capture_interval(user_id, interval):
+    """Tell the user's overlay how often to capture."""
+    popup_bus.publish('capture_interval', {
+        "user_id": user_id,
+        "interval_ms": int(interval * 1000)
+    }, room=user_id)
+
+
+capture_controller.set_notifier(push_capture_interval)
+# Drop users that stopped sending frames (and their per-user frame state) periodically
+flow_scheduler.schedule(capture_controller.sweep, delay=capture_controller.sweep_seconds)
+
+
+def _run_screenshot_job(base64_image, data, coalesce=True):
+    body, _status_code = process_screenshot(base64_image, data, coalesce=coalesce)
+    return body
+
+
+def _submit_latest_frame(user_id, base64_image, data):
+    """
+    Queue a progression frame behind the user's in-flight analysis without holding a worker.
+
+    The coalescer keeps only the newest waiting frame per user and submits it to the
+    job queue when the analysis ahead of it finishes; a frame replaced while waiting
+    finishes as "superseded" without running, and one that finds the queue full
+    when its turn comes finishes as "failed"; both are pushed like any other result.
+
+    Raises:
+        QueueFullError: If the frame could start now but the queue has no room
+    """
+    job = analysis_jobs.create(user_id)
+
+    def run():
+        try:
+            return _run_screenshot_job(base64_image, data, coalesce=False)
+        finally:
+            frame_coalescer.done(user_id)
+
+    frame_coalescer.defer(
+        user_id,
+        start=lambda: analysis_jobs.start(job, run),
+        drop=lambda: analysis_jobs.resolve(job, superseded_result()),
+        # The client already has the job id, so a frame that cannot start is reported too
+        fail=lambda error: analysis_jobs.fail(job, str(error)),
+    )
+    return job
 
-        # Extract the base64 image data from the request
-        base64_image = data['image']
+
+def emit_job_result(job):
+    """Push a finished analysis job to the submitting user's room."""
+    popup_bus.publish('screenshot_result', job.to_dict(), room=job.user_id)
+
+
+analysis_jobs.set_result_handler(emit_job_result)
+
+
+@app.route('/api/screenshot-jobs/<job_id>', methods=['GET'])
+def screenshot_job_status(job_id):
+    job = analysis_jobs.get(job_id)
+    if job is None:
+        return jsonify({
+            "message": f"Job {job_id} not found",
+            "status": "error"
+        }), 404
+    return jsonify(job.to_dict())
+
+
+def process_screenshot(base64_image, data, coalesce=True):
+    """
+    Run the screenshot pipeline for an already-ingested frame.
+
+    Args:
+        base64_image: Base64 string or raw image bytes
+        data (dict): Request fields (user_id, lesson_id, step_order, finish_criteria, ...)
+        coalesce (bool): Wait behind the user's in-flight analysis; False when the
+            frame was already admitted through frame_coalescer.defer()
+
+    Returns:
+        Tuple[dict, int]: Response body and HTTP status code
+    """
+    try:
+        if not base64_image:
+            return {
+                "message": "No image data provided",
+                "status": "error"
+            }, 400
 
         # Optional: Log metadata if provided
         if 'metadata' in data:
@@ -75,13 +234,13 @@ def screenshot():
                 finish_criteria = ""
 
     except Exception as e:
-        return jsonify({
+        return {
             "message": f"Error processing request: {str(e)}",
             "status": "error"
-        }), 400
+        }, 400
 
     # Decide flow: default to progression-aware handler. If explicitly stateless, skip progression.
-    stateless = bool(data.get('stateless', False))
+    stateless = parse_bool(data.get('stateless', False))
 
     if not stateless:
         # Resolve identifiers from data, then from current user_state, then from defaults
@@ -101,37 +260,48 @@ def screenshot():
             resolved_step_order = 1
 
         try:
-            progression_result = handle_screenshot_event(
+            def analyze():
+                return handle_screenshot_event(
+                    resolved_user_id,
+                    int(resolved_lesson_id),
+                    int(resolved_step_order),
+                    base64_image,
+                )
+
+            # Latest frame wins: frames queued behind an in-flight analysis for the same
+            # user are dropped as "superseded" when a newer one arrives
+            progression_result = frame_coalescer.run(resolved_user_id, analyze) if coalesce else analyze()
+            interval = capture_controller.record_frame(
                 resolved_user_id,
-                int(resolved_lesson_id),
-                int(resolved_step_order),
-                base64_image,
+                changed=not progression_result.get("deduplicated"),
+                step_advanced=bool(progression_result.get("completed")),
             )
-            return jsonify({
+            return {
                 "status": "success",
+                "capture_interval_ms": int(interval * 1000),
                 **progression_result
-            })
+            }, 200
         except Exception as event_err:
-            return jsonify({
+            return {
                 "message": f"Event handling failed: {str(event_err)}",
                 "status": "error"
-            }), 500
+            }, 500
 
     # Stateless analysis path: compute completion and return
     try:
         analysis = analyze_screenshot(base64_image, finish_criteria or "", lesson_id)
         completed = str(analysis).strip().upper() == "YES"
-        return jsonify({
+        return {
             "message": "Screenshot analyzed successfully",
             "status": "success",
             "analysis": analysis,
             "completed": completed
-        })
+        }, 200
     except Exception as analyze_err:
-        return jsonify({
+        return {
             "message": f"Analysis failed: {str(analyze_err)}",
             "status": "error"
-        }), 500
+        }, 500
 
 @app.route('/')
 def index():
@@ -148,6 +318,25 @@ def health():
         "service": "calhacks2025-backend"
     })
 
+@app.route('/api/verifier-stats')
+def verifier_stats():
+    """Vision verifier call counts, hedges, timeouts, circuit state and latency quantiles."""
+    return jsonify({
+        "status": "success",
+        "verifier": verifier_guard.stats()
+    })
+
+@app.route('/api/catalog-stats')
+def catalog_stats():
+    """Catalog snapshot size and age, and the local replica's row counts and sync lag."""
+    catalog = db_context.catalog
+    replica = db_context.replica
+    return jsonify({
+        "status": "success",
+        "catalog": catalog.stats() if catalog is not None else None,
+        "replica": replica.stats() if replica is not None else None
+    })
+
 ## Removed consolidated event endpoint; use /screenshot only
 
 # Explicit start endpoint to trigger popup and set state before first screenshot
@@ -182,10 +371,7 @@ def start_step():
         generate_and_send_popup_message("", step_description, resolved_user_id)
 
         # Update state to indicate popup already sent for this step
-        state = user_state.setdefault(resolved_user_id, {"lesson_id": lesson_id, "step_order": step_order, "popup_sent_for_step": True})
-        state["lesson_id"] = lesson_id
-        state["step_order"] = step_order
-        state["popup_sent_for_step"] = True
+        user_state.set_step(resolved_user_id, lesson_id, step_order, popup_sent=True)
 
         return jsonify({
             "status": "success",
@@ -238,13 +424,10 @@ def send_popup():
         }
         
         # Send popup to all connected clients or specific user
+        popup_bus.publish('popup_message', popup_data, room=user_id)
         if user_id:
-            # Send to specific user (if user rooms are implemented)
-            socketio.emit('popup_message', popup_data, room=user_id)
             print(f"Popup sent to user {user_id}: {popup_message[:50]}...")
         else:
-            # Send to all connected clients
-            socketio.emit('popup_message', popup_data)
             print(f"Popup broadcasted to all clients: {popup_message[:50]}...")
         
         return jsonify({
@@ -259,6 +442,9 @@ def send_popup():
             "status": "error"
         }), 500
 
+# Socket.IO session id -> user id, so a user's flows stop when their last connection drops
+connected_users = {}
+
 # WebSocket event handlers
 @socketio.on('connect')
 def handle_connect():
@@ -270,6 +456,30 @@ def handle_connect():
 def handle_disconnect():
     """Handle client disconnection"""
     print(f"Client disconnected: {request.sid}")
+    user_id = connected_users.pop(request.sid, None)
+    if user_id is not None and user_id not in connected_users.values():
+        cancelled = flow_scheduler.cancel_user(user_id)
+        if cancelled:
+            print(f"Cancelled {cancelled} learning flow(s) for user {user_id}")
+
+@socketio.on('screenshot')
+def handle_screenshot_frame(data):
+    """
+    Binary screenshot upload over the Socket.IO connection.
+
+    Expects {"image": <bytes>, "user_id": ..., "lesson_id": ..., "step_order": ...};
+    the image arrives as a binary attachment, so no base64 inflation. The result is
+    returned as the event acknowledgement.
+    """
+    if not isinstance(data, dict):
+        return {"message": "Invalid screenshot payload", "status": "error"}
+    fields = dict(data)
+    image = fields.pop('image', None)
+    limited = _enforce_capture_rate(str(fields.get('user_id') or os.getenv("DEFAULT_USER_ID", "default-user")))
+    if limited:
+        return limited[0]
+    body, _status_code = process_screenshot(image, fields)
+    return body
 
 @socketio.on('join_user_room')
 def handle_join_user_room(data):
@@ -277,14 +487,22 @@ def handle_join_user_room(data):
     user_id = data.get('user_id')
     if user_id:
         join_room(user_id)
+        connected_users[request.sid] = str(user_id)
         print(f"User {user_id} joined room")
         emit('status', {'message': f'Joined room for user {user_id}'})
+        emit('capture_interval', {
+            "user_id": user_id,
+            "interval_ms": int(capture_controller.interval_for(str(user_id)) * 1000)
+        })
 
 if __name__ == '__main__':
     print("Starting Flask backend with WebSocket support...")
     print("Backend will be available at: http://localhost:5000")
     print("WebSocket endpoint: ws://localhost:5000/socket.io/")
     debug_mode = os.getenv("FLASK_DEBUG", "0") == "1"
+    # Heavy clients are created lazily; build them in the background so the first
+    # screenshot does not pay for it, without delaying the server coming up
+    socketio.start_background_task(warm_up)
     socketio.run(
         app,
         debug=debug_mode,
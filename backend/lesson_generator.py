@@ -192,8 +192,12 @@ def generate_full_course():
     
     # Save the full course
     output_file = os.path.join(os.path.dirname(__file__), 'generated_course.json')
-    with open(output_file, 'w', encoding='utf-8') as f:
+    # Write to a temp file and rename it over the old one, so readers that reload
+    # the course on change never see a half-written file
+    tmp_file = f"{output_file}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
         json.dump(full_course, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_file, output_file)
     
     print("\n" + "="*80)
     print(f"✅ Course generated and saved to: {output_file}")
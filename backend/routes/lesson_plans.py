@@ -5,9 +5,7 @@ import requests
 from dotenv import load_dotenv
 from flask import Blueprint, jsonify, request
 
-from lesson_generator import generate_full_course
-from tools.bright_data_tool import scrape_to_txt
-from upload_to_supabase_simple import upload_course_to_supabase
+from utils.lesson_cache import lesson_cache
 
 load_dotenv()
 
@@ -28,6 +26,11 @@ headers = {
 @lesson_plans_bp.route('/generate-lesson-plan', methods=['POST'])
 def generateLessonPlan():
     """Generate a new lesson plan based on input parameters"""
+    # Imported here: brightdata and its OpenAI dependency take most of the app's import time
+    from lesson_generator import generate_full_course
+    from tools.bright_data_tool import scrape_to_txt
+    from upload_to_supabase_simple import upload_course_to_supabase
+
     try:
         data = request.get_json()
         lesson_topic = data.get('topic')
@@ -39,6 +42,8 @@ def generateLessonPlan():
         scrape_to_txt(lesson_topic)
         generate_full_course()
         upload_course_to_supabase()
+        # The upload wrote lessons/steps we have no ids for; drop everything cached
+        lesson_cache.invalidate_all()
 
         # Load generated course
         with open('generated_course.json', 'r', encoding='utf-8') as f:
@@ -75,6 +80,7 @@ def generateLessonPlan():
                 lesson_response = response.json()
                 lesson_id = lesson_response[0]['id']
                 print(f"✅ Created lesson (ID: {lesson_id}): {lesson_insert['name']}")
+                lesson_cache.invalidate(lesson_id)
 
                 # Prepare lesson object for response
                 lesson_obj = {
@@ -108,6 +114,8 @@ def generateLessonPlan():
                             json=steps_to_insert
                         )
 
+                        # Steps may have been partially written even on failure
+                        lesson_cache.invalidate(lesson_id)
                         if steps_response.status_code in [200, 201]:
                             steps_data = steps_response.json()
                             lesson_obj['steps'] = steps_data
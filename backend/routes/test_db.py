@@ -1,4 +1,4 @@
-from utils.supabase import supabase
+from utils.lesson_cache import lesson_cache
 from flask import Blueprint, jsonify
 
 test_db_bp = Blueprint("test_db", __name__)
@@ -6,6 +6,9 @@ test_db_bp = Blueprint("test_db", __name__)
 
 @test_db_bp.route("/insert-db", methods=["GET"])
 def insert_db():
+    # Creating the Supabase client is deferred until the route is used
+    from utils.supabase import supabase
+
     try:
         if supabase is None:
             return jsonify({"error": "Supabase client not configured"}), 500
@@ -17,6 +20,7 @@ def insert_db():
                 "lesson_order": 1,
             }
         ).execute()
+        lesson_cache.invalidate_all()
 
         return jsonify({"message": "Lesson inserted successfully"}), 200
     except Exception as e:
@@ -0,0 +1,141 @@
+"""
+Measure learning_agent startup time and completion-check latency against a fake Letta.
+
+The fake (scripts/mock_agent_demo.py) is slowed down to behave like the hosted
+service: creating an agent takes --create-ms, and each agent answers one message at
+a time in --message-ms, which is what serialized all checks behind the single agent.
+
+Each cell runs in a fresh subprocess:
+  startup  cold (no persisted agent ids) vs warm (ids reused from AGENT_STORE_PATH)
+  latency  --users concurrent checkers, per AGENT_POOL_SIZE in --pool-sizes
+
+Usage:
+    python scripts/bench_agent_pool.py [--users 8] [--checks 5] [--pool-sizes 1 4 8]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+
+def _install_slow_fake(create_ms: float, message_ms: float):
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, backend_dir)
+    sys.path.insert(0, os.path.join(backend_dir, "scripts"))
+    from mock_agent_demo import install_fake_letta_module
+
+    fake = install_fake_letta_module()
+    base_letta = fake.Letta
+
+    class SlowLetta(base_letta):
+        def __init__(self, token=None):
+            super().__init__(token)
+            create = self.agents.create
+            send = self.agents.messages.create
+            agent_locks = {}
+            locks_guard = threading.Lock()
+
+            def slow_create(**kwargs):
+                kwargs.pop("message_buffer_autoclear", None)
+                time.sleep(create_ms / 1000.0)
+                return create(**kwargs)
+
+            def slow_send(agent_id, messages):
+                with locks_guard:
+                    lock = agent_locks.setdefault(agent_id, threading.Lock())
+                # One in-flight message per agent, like a single conversation
+                with lock:
+                    time.sleep(message_ms / 1000.0)
+                    return send(agent_id=agent_id, messages=messages)
+
+            self.agents.create = slow_create
+            self.agents.messages.create = slow_send
+
+    fake.Letta = SlowLetta
+
+
+def run_single(kind: str, args) -> dict:
+    _install_slow_fake(args.create_ms, args.message_ms)
+    start = time.perf_counter()
+    from utils import learning_agent as la
+
+    startup_ms = (time.perf_counter() - start) * 1000
+    if kind == "startup":
+        return {"startup_ms": round(startup_ms, 1), "agents_created": la.verifier_pool.created}
+
+    # Steady state: every pooled agent exists before checks start
+    la.verifier_pool.warm()
+    request = la.VerdictRequest("aGVsbG8=", "image/png", "The settings page is open")
+    latencies = []
+    lock = threading.Lock()
+
+    def checker():
+        for _ in range(args.checks):
+            t0 = time.perf_counter()
+            la._send_single_check(request)
+            with lock:
+                latencies.append((time.perf_counter() - t0) * 1000)
+
+    threads = [threading.Thread(target=checker) for _ in range(args.users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    latencies.sort()
+    return {
+        "p50_ms": round(statistics.median(latencies), 1),
+        "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))], 1),
+    }
+
+
+def _run_cell(kind: str, args, env: dict) -> dict:
+    out = subprocess.run(
+        [
+            sys.executable, os.path.abspath(__file__), "--single", kind,
+            "--users", str(args.users), "--checks", str(args.checks),
+            "--create-ms", str(args.create_ms), "--message-ms", str(args.message_ms),
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "LETTA_API_KEY": "bench", **env},
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Letta agent startup and pooled check latency.")
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--checks", type=int, default=5)
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--create-ms", type=float, default=400.0)
+    parser.add_argument("--message-ms", type=float, default=50.0)
+    parser.add_argument("--single", choices=["startup", "latency"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_single(args.single, args)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = os.path.join(tmp, "agents.json")
+        cold = _run_cell("startup", args, {"AGENT_STORE_PATH": store})
+        warm = _run_cell("startup", args, {"AGENT_STORE_PATH": store})
+        print(f"{'startup':<10} {'ms':>8} {'agents created':>15}")
+        print(f"{'cold':<10} {cold['startup_ms']:>8.1f} {cold['agents_created']:>15}")
+        print(f"{'warm':<10} {warm['startup_ms']:>8.1f} {warm['agents_created']:>15}")
+
+        print(f"\n{args.users} concurrent users x {args.checks} checks")
+        print(f"{'pool size':<10} {'p50 ms':>8} {'p95 ms':>8}")
+        for size in args.pool_sizes:
+            row = _run_cell("latency", args, {"AGENT_STORE_PATH": store, "AGENT_POOL_SIZE": str(size)})
+            print(f"{size:<10} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Compare fixed-interval completion checks with the learned check cadence.
+
+Simulated learners finish each step after a lognormal time drawn around the step's
+typical duration. A check made at or after that moment detects completion. For each
+policy the script reports model calls per completed step and detection latency (time
+from the actual completion to the check that saw it). The cadence policy first learns
+from --warmup completions per step, just as it would in production.
+
+Usage:
+    python scripts/bench_check_cadence.py [--learners 2000] [--interval 10]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.check_cadence import CheckCadence  # noqa: E402
+
+# Typical seconds to complete each simulated step: quick clicks to long exercises
+STEP_MEDIANS = [5, 20, 45, 90, 180]
+
+
+def simulate(durations, next_delay):
+    calls, latencies = 0, []
+    for duration in durations:
+        t = 0.0
+        while True:
+            t += next_delay(t)
+            calls += 1
+            if t >= duration:
+                latencies.append(t - duration)
+                break
+    return calls / len(durations), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fixed vs learned completion-check cadence.")
+    parser.add_argument("--learners", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=10.0, help="Fixed check interval (FLOW_CHECK_INTERVAL)")
+    parser.add_argument("--sigma", type=float, default=0.5, help="Spread of completion times (lognormal sigma)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cadence = CheckCadence(path=None)
+    print(f"{'step p50':>9} {'policy':<8} {'calls/step':>11} {'p50 lat s':>10} {'p95 lat s':>10}")
+    for step, median in enumerate(STEP_MEDIANS, start=1):
+        draw = lambda: rng.lognormvariate(0, args.sigma) * median  # noqa: E731
+        for _ in range(args.warmup):
+            cadence.record(1, step, draw())
+        durations = [draw() for _ in range(args.learners)]
+
+        policies = [
+            ("fixed", lambda t: args.interval),
+            ("cadence", lambda t, step=step: cadence.next_delay(1, step, t, args.interval)),
+        ]
+        for name, next_delay in policies:
+            calls, latencies = simulate(durations, next_delay)
+            latencies.sort()
+            p95 = latencies[int(0.95 * (len(latencies) - 1))]
+            print(f"{median:>9} {name:<8} {calls:>11.2f} {statistics.median(latencies):>10.2f} {p95:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Benchmark lesson-step lookups against a local PostgREST stand-in.
+
+The stand-in is a threaded HTTP/1.1 server that answers GET /rest/v1/<table> with
+eq filters, order and limit. Every query takes --query-ms, and every new TCP
+connection costs an extra --connect-ms to stand in for the TCP+TLS handshake to a
+hosted database. --users threads (or coroutines) look up steps concurrently.
+
+Policies:
+  fresh      a new httpx.Client per lookup (no connection reuse)
+  supabase   supabase-py, one shared client per process
+  pool-sync  PostgrestPool through its sync facade (what DatabaseContextProvider uses)
+  pool-async PostgrestPool.execute_async(), all lookups on one event loop
+
+The stand-in speaks HTTP/1.1, so this measures pooling and keep-alive; HTTP/2
+multiplexing only kicks in against a TLS endpoint that negotiates h2.
+
+Usage:
+    python scripts/bench_db_pool.py [--users 16] [--lookups 20] [--connect-ms 30]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+
+from utils.postgrest_pool import PostgrestPool  # noqa: E402
+
+STEPS = [
+    {"lesson_id": lesson_id, "step_order": order, "name": f"Step {order}", "description": "Do it", "finish_criteria": "Done"}
+    for lesson_id in range(1, 21)
+    for order in range(1, 9)
+]
+
+
+def start_standin(query_ms: float, connect_ms: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            time.sleep(connect_ms / 1000.0)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            rows = STEPS if url.path.endswith("/step") else []
+            order = limit = None
+            for key, value in parse_qsl(url.query):
+                if value.startswith("eq."):
+                    rows = [r for r in rows if str(r.get(key)) == value[3:]]
+                elif key == "order":
+                    order = value.split(".")[0]
+                elif key == "limit":
+                    limit = int(value)
+            if order:
+                rows = sorted(rows, key=lambda r: r[order])
+            if limit is not None:
+                rows = rows[:limit]
+            time.sleep(query_ms / 1000.0)
+            body = json.dumps(rows).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def steps_query(client, lesson_id):
+    return (
+        client.table("step")
+        .select("step_order,name,description,finish_criteria")
+        .eq("lesson_id", lesson_id)
+        .order("step_order")
+    )
+
+
+def run_threads(args, lookup):
+    latencies = []
+    lock = threading.Lock()
+
+    def user(index):
+        for i in range(args.lookups):
+            started = time.perf_counter()
+            rows = lookup(1 + (index + i) % 20)
+            assert len(rows) == 8
+            with lock:
+                latencies.append((time.perf_counter() - started) * 1000)
+
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(args.users)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, time.perf_counter() - started
+
+
+def run_async(args, pool):
+    latencies = []
+
+    async def user(index):
+        for i in range(args.lookups):
+            started = time.perf_counter()
+            result = await steps_query(pool, 1 + (index + i) % 20).execute_async()
+            assert len(result.data) == 8
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    async def main():
+        await asyncio.gather(*(user(i) for i in range(args.users)))
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    return latencies, time.perf_counter() - started
+
+
+def report(name, latencies, elapsed):
+    latencies.sort()
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    print(f"{name:<11} {statistics.median(latencies):>8.1f} {p95:>8.1f} {len(latencies) / elapsed:>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark database lookups: fresh connections vs supabase-py vs the pooled client.")
+    parser.add_argument("--users", type=int, default=16)
+    parser.add_argument("--lookups", type=int, default=20)
+    parser.add_argument("--query-ms", type=float, default=5.0)
+    parser.add_argument("--connect-ms", type=float, default=30.0)
+    args = parser.parse_args()
+
+    server, url = start_standin(args.query_ms, args.connect_ms)
+    print(f"{args.users} concurrent users x {args.lookups} lookups (query {args.query_ms:g} ms, connect {args.connect_ms:g} ms)")
+    print(f"{'policy':<11} {'p50 ms':>8} {'p95 ms':>8} {'lookups/s':>10}")
+
+    def fresh(lesson_id):
+        with httpx.Client(base_url=f"{url}/rest/v1") as client:
+            response = client.get("/step", params={"lesson_id": f"eq.{lesson_id}", "order": "step_order.asc"})
+            return response.json()
+
+    report("fresh", *run_threads(args, fresh))
+
+    try:
+        from supabase import create_client
+
+        sb = create_client(url, "anon")
+        report("supabase", *run_threads(args, lambda lesson_id: steps_query(sb, lesson_id).execute().data))
+    except Exception as e:
+        print(f"{'supabase':<11} skipped ({e})")
+
+    pool = PostgrestPool(url, "anon")
+    report("pool-sync", *run_threads(args, lambda lesson_id: steps_query(pool, lesson_id).execute().data))
+    report("pool-async", *run_async(args, pool))
+    pool.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Precision/latency benchmark for the local pre-verifier chain against recorded frames.
+
+The frames directory holds screenshots plus a labels.json file:
+    [{"image": "frame_001.png", "finish_criteria": "...", "expected": "YES"}, ...]
+
+For each verifier the report shows how many frames it decided, how many of those
+decisions matched the label (precision), and its latency. Frames no verifier decides
+would fall through to the vision model.
+
+Usage:
+    python scripts/bench_local_verifier.py path/to/frames
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark local verifiers on labelled frames.")
+    parser.add_argument("frames_dir")
+    parser.add_argument("--labels", default="labels.json", help="Labels file inside frames_dir")
+    parser.add_argument("--min-confidence", type=float, default=None)
+    args = parser.parse_args()
+
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if backend_dir not in sys.path:
+        sys.path.insert(0, backend_dir)
+    from utils.local_verifier import BlankScreenVerifier, LocalVerifierChain, OcrTextVerifier
+
+    with open(os.path.join(args.frames_dir, args.labels), "r", encoding="utf-8") as handle:
+        labels = json.load(handle)
+
+    verifiers = [BlankScreenVerifier(), OcrTextVerifier()]
+    chain = LocalVerifierChain(verifiers)
+    if args.min_confidence is not None:
+        chain.min_confidence = args.min_confidence
+
+    per_verifier = defaultdict(lambda: {"decided": 0, "correct": 0, "latencies": []})
+    chain_latencies = []
+    fallthrough = 0
+
+    for row in labels:
+        with open(os.path.join(args.frames_dir, row["image"]), "rb") as handle:
+            frame = handle.read()
+        expected = row["expected"].strip().upper()
+
+        # Time every verifier individually, then the chain as it runs in production
+        for verifier in verifiers:
+            start = time.perf_counter()
+            verdict = verifier.verify(frame, row["finish_criteria"])
+            stats = per_verifier[verifier.name]
+            stats["latencies"].append((time.perf_counter() - start) * 1000)
+            if verdict.decision is not None and verdict.confidence >= chain.min_confidence:
+                stats["decided"] += 1
+                stats["correct"] += int(verdict.decision == expected)
+
+        start = time.perf_counter()
+        if chain.verify(frame, row["finish_criteria"]) is None:
+            fallthrough += 1
+        chain_latencies.append((time.perf_counter() - start) * 1000)
+
+    total = len(labels)
+    print(f"{total} labelled frames, min confidence {chain.min_confidence}")
+    print(f"{'verifier':<14} {'decided':>8} {'precision':>10} {'p50 ms':>8} {'max ms':>8}")
+    for name, stats in per_verifier.items():
+        precision = stats["correct"] / stats["decided"] if stats["decided"] else float("nan")
+        print(
+            f"{name:<14} {stats['decided']:>8} {precision:>10.2%} "
+            f"{statistics.median(stats['latencies']):>8.2f} {max(stats['latencies']):>8.2f}"
+        )
+    if chain_latencies:
+        print(
+            f"chain: {total - fallthrough}/{total} decided locally, {fallthrough} fall through to the model, "
+            f"p50 {statistics.median(chain_latencies):.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
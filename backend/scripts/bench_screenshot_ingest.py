@@ -0,0 +1,121 @@
+"""
+Compare /screenshot ingest modes: base64-in-JSON vs raw bytes vs multipart.
+
+Each (mode, frame size) pair runs in a fresh subprocess so peak RSS is not polluted by
+earlier runs. Frames are random bytes sized like an uncompressible PNG of the given
+resolution (one byte per pixel), which is the worst case for both paths. The progression
+handler is replaced by a no-op so only ingest cost is measured.
+
+Usage:
+    python scripts/bench_screenshot_ingest.py [--requests 20]
+"""
+import argparse
+import base64
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+FRAME_SIZES = {
+    "1080p": 1920 * 1080,
+    "4k": 3840 * 2160,
+}
+MODES = ("json", "raw", "multipart")
+
+
+def _max_rss_kb() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_single(mode: str, size_name: str, requests_count: int) -> dict:
+    """Run one benchmark cell in the current process and return its measurements."""
+    import io
+
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, backend_dir)
+    sys.path.insert(0, os.path.join(backend_dir, "scripts"))
+    from mock_agent_demo import install_fake_letta_module
+
+    install_fake_letta_module()
+    import app as backend_app
+
+    backend_app.handle_screenshot_event = lambda user_id, lesson_id, step_order, image: {  # type: ignore
+        "completed": False,
+        "received_bytes": len(image),
+    }
+    # Measure ingest, not the per-user capture-rate limiter
+    backend_app.capture_controller.allow = lambda user_id: (True, 0.0)  # type: ignore
+    client = backend_app.app.test_client()
+
+    frame = os.urandom(FRAME_SIZES[size_name])
+    query = "?user_id=bench&lesson_id=1&step_order=1"
+    if mode == "json":
+        body = json.dumps({
+            "image": base64.b64encode(frame).decode("ascii"),
+            "user_id": "bench",
+            "lesson_id": 1,
+            "step_order": 1,
+        }).encode("utf-8")
+
+    # Warm up routing and import-time allocations before taking the baseline
+    client.get("/health")
+    baseline_kb = _max_rss_kb()
+
+    latencies = []
+    for _ in range(requests_count):
+        start = time.perf_counter()
+        if mode == "json":
+            resp = client.post("/screenshot", data=body, content_type="application/json")
+        elif mode == "raw":
+            resp = client.post("/screenshot" + query, data=frame, content_type="image/png")
+        else:
+            resp = client.post(
+                "/screenshot" + query,
+                data={"image": (io.BytesIO(frame), "frame.png")},
+                content_type="multipart/form-data",
+            )
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert resp.status_code == 200, resp.get_data(as_text=True)
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "size": size_name,
+        "frame_bytes": len(frame),
+        "peak_rss_delta_mb": round((_max_rss_kb() - baseline_kb) / 1024, 1),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /screenshot ingest modes.")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--single", nargs=2, metavar=("MODE", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_single(args.single[0], args.single[1], args.requests)))
+        return
+
+    print(f"{'size':<6} {'mode':<10} {'frame MB':>9} {'peak RSS +MB':>13} {'p50 ms':>8} {'p95 ms':>8}")
+    for size_name in FRAME_SIZES:
+        for mode in MODES:
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--requests", str(args.requests), "--single", mode, size_name],
+                check=True,
+                capture_output=True,
+                text=True,
+            )
+            row = json.loads(out.stdout.strip().splitlines()[-1])
+            print(
+                f"{row['size']:<6} {row['mode']:<10} {row['frame_bytes'] / 2**20:>9.1f} "
+                f"{row['peak_rss_delta_mb']:>13.1f} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Measure backend cold start: `import app` time and time to the first /health response.
+
+Each run is a fresh interpreter so nothing is already imported. Also reports which
+heavy dependencies were imported at startup (they should load on first use only).
+
+Usage:
+    python scripts/bench_startup.py [--runs 5] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Dependencies that must not be imported just to serve /health
+HEAVY_MODULES = ("letta_client", "supabase", "brightdata", "bs4", "openai")
+
+
+def run_once() -> dict:
+    """Import the app in this process and time it; returns the measurements."""
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, backend_dir)
+    os.chdir(backend_dir)
+
+    start = time.perf_counter()
+    import app as backend_app
+
+    imported = time.perf_counter()
+    response = backend_app.app.test_client().get("/health")
+    first_health = time.perf_counter()
+
+    return {
+        "import_ms": round((imported - start) * 1000, 1),
+        "first_health_ms": round((first_health - start) * 1000, 1),
+        "health_status": response.status_code,
+        "heavy_modules_loaded": sorted(m for m in HEAVY_MODULES if m in sys.modules),
+        "db_context_initialized": backend_app.db_context.initialized,
+    }
+
+
+def measure(runs: int) -> dict:
+    """Run run_once() in `runs` fresh interpreters and summarize."""
+    rows = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--single"],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        rows.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {
+        "runs": runs,
+        "import_ms_p50": statistics.median(r["import_ms"] for r in rows),
+        "first_health_ms_p50": statistics.median(r["first_health_ms"] for r in rows),
+        "health_status": rows[-1]["health_status"],
+        "heavy_modules_loaded": sorted({m for r in rows for m in r["heavy_modules_loaded"]}),
+        "db_context_initialized": any(r["db_context_initialized"] for r in rows),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark backend cold start.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print a single JSON summary")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_once()))
+        return
+
+    summary = measure(args.runs)
+    if args.json:
+        print(json.dumps(summary))
+        return
+    print(f"import app            p50 {summary['import_ms_p50']:.1f} ms")
+    print(f"first /health         p50 {summary['first_health_ms_p50']:.1f} ms")
+    print(f"heavy modules loaded  {', '.join(summary['heavy_modules_loaded']) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
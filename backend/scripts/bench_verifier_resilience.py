@@ -0,0 +1,108 @@
+"""
+Tail latency of completion checks against a degraded provider, with and without the
+resilience layer (utils/verifier_resilience.py).
+
+The fake provider answers in --base-ms (lognormal jitter); a --slow-share of calls
+stall for --stall-ms and, during the outage phase, --error-share of calls fail.
+Each policy runs --calls checks from --users threads, pausing --think-ms between
+checks; the outage covers the second half of the run.
+
+Usage:
+    python scripts/bench_verifier_resilience.py [--calls 400] [--slow-share 0.05]
+"""
+import argparse
+import itertools
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.verifier_resilience import CircuitBreaker, ResilientCaller  # noqa: E402
+
+
+def make_provider(args, seed):
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    def provider(outage: bool):
+        with lock:
+            slow = rng.random() < args.slow_share
+            fail = outage and rng.random() < args.error_share
+            jitter = rng.lognormvariate(0, 0.3)
+        time.sleep((args.stall_ms if slow else args.base_ms * jitter) / 1000.0)
+        if fail:
+            raise RuntimeError("provider error")
+        return "YES"
+
+    return provider
+
+
+def run(args, name, call):
+    provider = make_provider(args, args.seed)
+    latencies, outcomes = [], {"ok": 0, "error": 0, "degraded": 0}
+    lock = threading.Lock()
+    per_user = args.calls // args.users
+    counter = itertools.count()
+
+    def user():
+        for _ in range(per_user):
+            time.sleep(args.think_ms / 1000.0)
+            outage = next(counter) >= args.calls // 2
+            started = time.perf_counter()
+            try:
+                call(lambda: provider(outage))
+                outcome = "ok"
+            except RuntimeError:
+                outcome = "error"
+            except Exception:
+                outcome = "degraded"
+            with lock:
+                latencies.append((time.perf_counter() - started) * 1000)
+                outcomes[outcome] += 1
+
+    threads = [threading.Thread(target=user) for _ in range(args.users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    latencies.sort()
+    q = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))]  # noqa: E731
+    print(f"{name:<10} {q(0.5):>8.0f} {q(0.95):>8.0f} {q(0.99):>8.0f} {outcomes['ok']:>5} {outcomes['error']:>6} {outcomes['degraded']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the verifier resilience layer against a degraded provider.")
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--base-ms", type=float, default=50.0)
+    parser.add_argument("--stall-ms", type=float, default=3000.0)
+    parser.add_argument("--slow-share", type=float, default=0.05)
+    parser.add_argument("--error-share", type=float, default=0.6, help="Failure share during the second (outage) half")
+    parser.add_argument("--think-ms", type=float, default=20.0)
+    parser.add_argument("--deadline", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    guard = ResilientCaller(
+        deadline=args.deadline,
+        hedge_default_delay=0.2,
+        breaker=CircuitBreaker(open_seconds=1.0),
+        max_workers=4 * args.users,
+    )
+    print(f"{'policy':<10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'ok':>5} {'error':>6} {'degraded':>9}")
+    run(args, "direct", lambda fn: fn())
+    run(args, "guarded", guard.call)
+    stats = guard.stats()
+    print(
+        f"\nguarded: {stats['hedges']} hedges ({stats['hedge_wins']} won), {stats['timeouts']} timeouts, "
+        f"{stats['short_circuits']} short-circuits, circuit opened {stats['circuit_opened']}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Bootstrap or refresh the local SQLite replica of the lesson and step tables.
+
+Reads SUPABASE_URL / SUPABASE_KEY like the backend does and writes the mirror to
+CATALOG_REPLICA_PATH (or --path). Run it once before enabling CATALOG_REPLICA=1 so the
+first request is served from a populated mirror; afterwards the backend keeps it in
+sync on its own.
+
+Usage:
+    python scripts/sync_catalog_replica.py [--full] [--path catalog_replica.db]
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv  # noqa: E402
+
+from utils.catalog_replica import CATALOG_REPLICA_PATH, CatalogReplica, postgrest_page_fetcher  # noqa: E402
+from utils.database_context import create_client  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bootstrap or refresh the local lesson/step replica.")
+    parser.add_argument("--path", default=CATALOG_REPLICA_PATH)
+    parser.add_argument("--full", action="store_true", help="re-read both tables instead of syncing past the watermark")
+    args = parser.parse_args()
+
+    load_dotenv()
+    url = os.environ.get("SUPABASE_URL")
+    key = os.environ.get("SUPABASE_KEY")
+    if not url or not key:
+        sys.exit("SUPABASE_URL and SUPABASE_KEY must be set")
+    client = create_client(url, key)
+
+    replica = CatalogReplica(postgrest_page_fetcher(client), path=args.path)
+    written = replica.sync(full=args.full)
+    print(f"Wrote {written} rows to {os.path.abspath(args.path)}")
+    print(json.dumps(replica.stats(), indent=2))
+    replica.close()
+    close = getattr(client, "close", None)
+    if close is not None:
+        close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+-- Learner progress written by DatabaseContextProvider.update_user_progress
+-- (one row per learner and lesson; upserted on conflict of user_id, lesson_id).
+-- Run once in the Supabase SQL editor, then set PROGRESS_JOURNAL=1 to batch the writes.
+create table if not exists public.user_progress (
+    user_id text not null,
+    lesson_id bigint not null references public.lesson(id) on delete cascade,
+    step_order integer not null,
+    completed boolean not null default false,
+    updated_at timestamptz not null default now(),
+    constraint user_progress_user_lesson_key unique (user_id, lesson_id)
+);
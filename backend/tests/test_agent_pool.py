@@ -0,0 +1,144 @@
+import os
+import sys
+import threading
+import time
+import types
+
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.dirname(CURRENT_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from utils.agent_pool import AgentIdStore, AgentPool, AgentSpec  # noqa: E402
+
+SPEC = AgentSpec(name="Task Completion Decider", system="prompt", model="m", embedding="e")
+
+
+class _FakeMessages:
+    def __init__(self):
+        self.resets = []
+
+    def reset(self, agent_id, add_default_initial_messages):  # noqa: ARG002
+        self.resets.append(agent_id)
+
+
+class _FakeAgents:
+    def __init__(self, autoclear=True):
+        self.autoclear = autoclear
+        self.created = []
+        self.messages = _FakeMessages()
+
+    def create(self, name, system, model, embedding, tools, include_base_tools, **kwargs):  # noqa: ARG002
+        if kwargs and not self.autoclear:
+            raise TypeError("unexpected keyword argument")
+        agent = types.SimpleNamespace(id=f"agent-{len(self.created) + 1}")
+        self.created.append((name, kwargs))
+        return agent
+
+
+def _client(autoclear=True):
+    return types.SimpleNamespace(agents=_FakeAgents(autoclear))
+
+
+def test_agent_ids_are_reused_across_restarts(tmp_path):
+    store = AgentIdStore(str(tmp_path / "agents.json"))
+    first_client = _client()
+    first = AgentPool(first_client, SPEC, size=2, token="key", store=store)
+    primary = first.primary()
+    with first.acquire():
+        with first.acquire():
+            pass
+
+    assert len(first_client.agents.created) == 2
+    assert first_client.agents.created[0][1] == {"message_buffer_autoclear": True}
+
+    second_client = _client()
+    second = AgentPool(second_client, SPEC, size=2, token="key", store=store)
+    assert second.primary().id == primary.id
+    assert second.agent_ids == first.agent_ids
+    assert second_client.agents.created == []
+
+
+def test_store_key_depends_on_spec_and_token(tmp_path):
+    store = AgentIdStore(str(tmp_path / "agents.json"))
+    AgentPool(_client(), SPEC, token="key", store=store).primary()
+
+    other_token = _client()
+    AgentPool(other_token, SPEC, token="other", store=store).primary()
+    changed_prompt = _client()
+    AgentPool(changed_prompt, AgentSpec("Task Completion Decider", "new prompt", "m", "e"), token="key", store=store).primary()
+
+    assert len(other_token.agents.created) == 1
+    assert len(changed_prompt.agents.created) == 1
+
+
+def test_concurrent_checks_use_distinct_agents():
+    pool = AgentPool(_client(), SPEC, size=3, store=AgentIdStore(None))
+    in_use = set()
+    overlap = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(3)
+
+    def check():
+        with pool.acquire() as agent:
+            with lock:
+                overlap.append(agent.id in in_use)
+                in_use.add(agent.id)
+            barrier.wait(2)
+            time.sleep(0.01)
+            with lock:
+                in_use.discard(agent.id)
+
+    threads = [threading.Thread(target=check) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert overlap == [False, False, False]
+    assert len(pool.agent_ids) == 3
+
+
+def test_history_reset_without_autoclear():
+    client = _client(autoclear=False)
+    pool = AgentPool(client, SPEC, size=1, store=AgentIdStore(None), reset_every=2)
+    for _ in range(4):
+        with pool.acquire():
+            pass
+
+    assert client.agents.messages.resets == ["agent-1", "agent-1"]
+
+
+def test_discarded_agent_is_replaced(tmp_path):
+    store = AgentIdStore(str(tmp_path / "agents.json"))
+    client = _client()
+    pool = AgentPool(client, SPEC, size=1, store=store)
+    with pool.acquire() as agent:
+        pool.discard(agent)
+    with pool.acquire() as replacement:
+        pass
+
+    assert replacement.id != agent.id
+    assert pool.agent_ids == [replacement.id]
+    assert AgentPool(_client(), SPEC, size=1, store=store).agent_ids == [replacement.id]
+
+
+def test_try_borrow_never_waits_or_creates():
+    pool = AgentPool(_client(), SPEC, size=2, store=AgentIdStore(None))
+    assert pool.try_borrow() is None
+    assert pool.agent_ids == []
+
+    agent = pool.borrow()
+    assert pool.try_borrow() is None
+    pool.give_back(agent)
+    assert pool.try_borrow() is agent
+
+
+def test_default_store_reads_path_when_created(monkeypatch, tmp_path):
+    monkeypatch.setenv("AGENT_STORE_PATH", str(tmp_path / "agents.json"))
+    assert AgentIdStore.from_env().path == str(tmp_path / "agents.json")
+
+    monkeypatch.setenv("AGENT_STORE_PATH", "")
+    assert AgentIdStore.from_env().path is None
+    assert AgentPool(_client(), SPEC, size=1).store.path is None
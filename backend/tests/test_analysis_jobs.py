@@ -0,0 +1,115 @@
+import os
+import sys
+import threading
+
+import pytest
+
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.dirname(CURRENT_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from utils.analysis_jobs import AnalysisJobQueue, QueueFullError  # noqa: E402
+
+
+@pytest.fixture
+def queue():
+    q = AnalysisJobQueue(max_workers=1, max_pending=1, retained=10)
+    yield q
+    q.shutdown(wait=True)
+
+
+def test_job_runs_and_notifies_handler(queue):
+    finished = []
+    done = threading.Event()
+
+    def handler(job):
+        finished.append(job)
+        done.set()
+
+    queue.set_result_handler(handler)
+    job = queue.submit("u1", lambda x: {"completed": x}, True)
+
+    assert done.wait(5)
+    assert finished[0] is job
+    assert job.status == "done"
+    assert job.result == {"completed": True}
+    assert queue.get(job.id).to_dict()["user_id"] == "u1"
+    assert queue.depth == 0
+
+
+def test_failed_job_records_error(queue):
+    done = threading.Event()
+    queue.set_result_handler(lambda job: done.set())
+
+    def boom():
+        raise RuntimeError("provider down")
+
+    job = queue.submit("u1", boom)
+
+    assert done.wait(5)
+    assert job.status == "failed"
+    assert job.error == "provider down"
+
+
+def test_queue_rejects_when_workers_and_pending_slots_are_full(queue):
+    release = threading.Event()
+
+    queue.submit("u1", release.wait)  # occupies the only worker
+    queue.submit("u2", release.wait)  # waits in the single pending slot
+    with pytest.raises(QueueFullError):
+        queue.submit("u3", release.wait)
+    assert queue.depth == 2
+
+    release.set()
+
+
+def test_created_job_is_pollable_before_it_starts(queue):
+    done = threading.Event()
+    queue.set_result_handler(lambda job: done.set())
+
+    job = queue.create("u1")
+    assert queue.get(job.id).status == "queued"
+    assert queue.depth == 0  # holds no slot until started
+
+    queue.start(job, lambda: {"completed": False})
+    assert done.wait(5)
+    assert job.status == "done"
+
+
+def test_resolved_job_finishes_without_a_worker(queue):
+    finished = []
+    queue.set_result_handler(finished.append)
+
+    job = queue.create("u1")
+    queue.resolve(job, {"status": "superseded"})
+
+    assert finished == [job]
+    assert (job.status, job.result) == ("done", {"status": "superseded"})
+    assert queue.depth == 0
+
+
+def test_failed_job_finishes_without_a_worker_and_notifies(queue):
+    finished = []
+    queue.set_result_handler(finished.append)
+
+    job = queue.create("u1")
+    queue.fail(job, "Analysis queue is full")
+
+    assert finished == [job]
+    assert (job.status, job.error) == ("failed", "Analysis queue is full")
+    assert job.finished_at is not None
+
+
+def test_start_marks_job_failed_when_queue_is_full(queue):
+    release = threading.Event()
+    queue.submit("u1", release.wait)
+    queue.submit("u2", release.wait)
+
+    job = queue.create("u3")
+    with pytest.raises(QueueFullError):
+        queue.start(job, release.wait)
+    assert job.status == "failed"
+
+    release.set()
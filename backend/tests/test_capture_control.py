@@ -0,0 +1,98 @@
+import os
+import sys
+
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.dirname(CURRENT_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from utils import capture_control as cc  # noqa: E402
+
+
+def _controller(depth=0):
+    state = {"depth": depth}
+    controller = cc.CaptureRateController(
+        queue_depth=lambda: state["depth"],
+        min_interval=2,
+        base_interval=10,
+        max_interval=60,
+        soft_limit=4,
+    )
+    return controller, state
+
+
+def test_token_bucket_allows_burst_then_limits(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cc.time, "monotonic", lambda: now[0])
+    bucket = cc.TokenBucket(rate=0.5, capacity=2)
+
+    assert bucket.try_acquire() == (True, 0.0)
+    assert bucket.try_acquire() == (True, 0.0)
+    allowed, retry_after = bucket.try_acquire()
+    assert not allowed and retry_after == 2.0
+
+    now[0] += 2
+    assert bucket.try_acquire()[0] is True
+
+
+def test_interval_backs_off_for_idle_screens_and_notifies():
+    controller, _ = _controller()
+    pushed = []
+    controller.set_notifier(lambda user_id, interval: pushed.append((user_id, interval)))
+
+    for _ in range(5):
+        controller.record_frame("u", changed=False)
+
+    assert controller.interval_for("u") > 20
+    assert pushed and pushed[-1][0] == "u"
+
+    # Advancing a step snaps back to the base interval
+    assert controller.record_frame("u", changed=True, step_advanced=True) == 10
+    assert controller.interval_for("u") == 10
+
+
+def test_interval_backs_off_under_queue_load():
+    controller, state = _controller()
+    assert controller.record_frame("u", changed=True) == 10
+
+    state["depth"] = 12  # two soft limits over
+    assert controller.record_frame("u", changed=True) == 30
+
+
+def test_allow_enforces_recommended_rate():
+    controller, _ = _controller()
+    results = [controller.allow("u")[0] for _ in range(cc.CAPTURE_BURST + 1)]
+    assert results == [True] * cc.CAPTURE_BURST + [False]
+    assert controller.allow("other")[0] is True
+
+
+def test_evicted_users_are_reported_to_listeners(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cc.time, "monotonic", lambda: now[0])
+    controller = cc.CaptureRateController(max_users=2, max_idle_seconds=60, sweep_seconds=30)
+    dropped = []
+    controller.add_listener(dropped.append)
+
+    controller.allow("a")
+    controller.allow("b")
+    controller.allow("a")
+    controller.allow("c")  # over the bound: "b" was seen least recently
+    assert dropped == ["b"]
+    assert len(controller) == 2
+
+    now[0] += 61
+    controller.allow("c")
+    assert controller.sweep() == 30
+    assert dropped == ["b", "a"]
+
+    controller.forget("c")
+    controller.forget("c")
+    assert dropped == ["b", "a", "c"]
+    assert len(controller) == 0
+
+
+def test_interval_for_does_not_track_unknown_users():
+    controller, _ = _controller()
+    assert controller.interval_for("nobody") == 10
+    assert len(controller) == 0
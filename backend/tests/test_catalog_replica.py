@@ -0,0 +1,180 @@
+import os
+import sys
+
+import pytest
+
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.dirname(CURRENT_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from utils.catalog_replica import CatalogReplica, postgrest_page_fetcher  # noqa: E402
+from utils.catalog_snapshot import CatalogSnapshot  # noqa: E402
+from utils.database_context import DatabaseContextProvider  # noqa: E402
+
+
+class _Source:
+    """In-memory lesson/step tables answering keyset-paginated fetches."""
+
+    def __init__(self):
+        self.tables = {
+            "lesson": [{"id": 1, "lesson_order": 1, "name": "Intro"}],
+            "step": [
+                {"id": 10, "lesson_id": 1, "step_order": 2, "name": "Two", "description": "D2", "finish_criteria": "C2"},
+                {"id": 11, "lesson_id": 1, "step_order": 1, "name": "One", "description": "D1", "finish_criteria": "C1"},
+            ],
+        }
+        self.calls = []
+        self.down = False
+
+    def __call__(self, table, column, after, limit):
+        self.calls.append((table, column, after, limit))
+        if self.down:
+            raise ConnectionError("supabase unreachable")
+        rows = sorted(self.tables[table], key=lambda row: row[column])
+        if after is not None:
+            rows = [row for row in rows if row[column] > after]
+        return [dict(row) for row in rows[:limit]]
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def source():
+    return _Source()
+
+
+@pytest.fixture
+def clock():
+    return _Clock()
+
+
+@pytest.fixture
+def replica_path(tmp_path):
+    return str(tmp_path / "catalog_replica.db")
+
+
+def test_first_sync_mirrors_both_tables(source, clock, replica_path):
+    replica = CatalogReplica(source, replica_path, page_size=1, clock=clock)
+
+    assert replica.lag_seconds() is None
+    assert replica.sync() == 3
+
+    rows = replica.rows()
+    assert [lesson["id"] for lesson in rows] == [1]
+    assert [step["step_order"] for step in rows[0]["step"]] == [1, 2]
+    assert replica.stats()["watermarks"] == {"lesson": 1, "step": 11}
+    # page_size=1 pages through each table by id
+    assert [call[2] for call in source.calls if call[0] == "step"] == [None, 10, 11]
+
+
+def test_incremental_sync_fetches_past_the_watermark(source, clock, replica_path):
+    replica = CatalogReplica(source, replica_path, clock=clock)
+    replica.sync()
+    source.calls.clear()
+    source.tables["step"].append({"id": 12, "lesson_id": 1, "step_order": 3, "name": "Three"})
+
+    clock.now += 30
+    assert replica.sync() == 1
+
+    assert ("step", "id", 11, 1000) in source.calls
+    assert [step["step_order"] for step in replica.rows()[0]["step"]] == [1, 2, 3]
+    assert replica.stats()["full_syncs"] == 1
+
+
+def test_full_sync_picks_up_edits_and_deletes(source, clock, replica_path):
+    replica = CatalogReplica(source, replica_path, full_sync_seconds=3600, clock=clock)
+    replica.sync()
+    source.tables["step"] = [dict(source.tables["step"][1], name="Renamed")]
+
+    replica.sync()
+    assert len(replica.rows()[0]["step"]) == 2
+
+    replica.request_full_sync()
+    replica.sync()
+    assert [(step["step_order"], step["name"]) for step in replica.rows()[0]["step"]] == [(1, "Renamed")]
+
+    # Full syncs also run on their own once due
+    source.tables["lesson"] = []
+    clock.now += 3600
+    replica.sync()
+    assert replica.rows() == []
+
+
+def test_failed_sync_keeps_mirror_and_reports_lag(source, clock, replica_path):
+    replica = CatalogReplica(source, replica_path, clock=clock)
+    replica.sync()
+    source.down = True
+    clock.now += 90
+
+    with pytest.raises(ConnectionError):
+        replica.sync()
+
+    assert len(replica.rows()[0]["step"]) == 2
+    stats = replica.stats()
+    assert stats["lag_seconds"] == 90
+    assert stats["failures"] == 1
+    assert "unreachable" in stats["last_error"]
+
+
+def test_mirror_survives_restart(source, clock, replica_path):
+    CatalogReplica(source, replica_path, clock=clock).sync()
+
+    reopened = CatalogReplica(None, replica_path, clock=clock)
+
+    snapshot = CatalogSnapshot(reopened.rows())
+    assert snapshot.step(1, 2).name == "Two"
+    assert reopened.synced_at() == 1000.0
+
+
+def test_postgrest_page_fetcher_builds_keyset_query():
+    class Query:
+        def __init__(self):
+            self.ops = []
+
+        def __getattr__(self, name):
+            def op(*args):
+                self.ops.append((name, *args))
+                return self
+            return op
+
+        def execute(self):
+            return type("Response", (), {"data": [{"id": 5}]})()
+
+    query = Query()
+    fetch_page = postgrest_page_fetcher(type("Client", (), {"table": lambda self, name: query.table(name)})())
+
+    assert fetch_page("step", "id", 4, 100) == [{"id": 5}]
+    assert query.ops == [("table", "step"), ("select", "*"), ("gt", "id", 4), ("order", "id"), ("limit", 100)]
+
+
+def test_provider_serves_lookups_from_replica_when_supabase_is_down(monkeypatch, source, replica_path):
+    class Client:
+        def table(self, name):
+            raise AssertionError("direct query while the replica has the row")
+
+    monkeypatch.setenv("SUPABASE_URL", "http://db.local")
+    monkeypatch.setenv("SUPABASE_KEY", "anon")
+    monkeypatch.setattr("utils.database_context.create_client", lambda url, key, options=None: Client())
+    monkeypatch.setattr("utils.database_context.CATALOG_REPLICA_ENABLED", True)
+    monkeypatch.setattr(
+        "utils.database_context.CatalogReplica",
+        lambda fetch_page: CatalogReplica(source, replica_path),
+    )
+    ctx = DatabaseContextProvider()
+    ctx.catalog.background = False
+
+    assert ctx.get_lesson_steps_batch(1)[2]["name"] == "Two"
+
+    source.down = True
+    assert ctx.catalog.refresh() is True
+    assert ctx.get_step_by_order_and_lesson(1, 1) == ("One", "D1")
+    assert ctx.get_lesson_id_by_order(1) == 1
+    ctx.close_connection()
@@ -0,0 +1,214 @@
+import os
+import sys
+import types
+
+import pytest
+
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.dirname(CURRENT_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from utils.catalog_snapshot import CatalogIndex, CatalogSnapshot  # noqa: E402
+from utils.database_context import DatabaseContextProvider  # noqa: E402
+from utils.lesson_cache import lesson_cache  # noqa: E402
+
+CATALOG = [
+    {
+        "id": 10,
+        "lesson_order": 1,
+        "name": "Intro",
+        "step": [
+            {"step_order": 2, "name": "Second", "description": "D2", "finish_criteria": None},
+            {"step_order": 1, "name": "First", "description": "D1", "finish_criteria": "C1"},
+        ],
+    },
+    {"id": 11, "lesson_order": 2, "name": "Next", "step": []},
+]
+
+
+class _CountingQuery:
+    """Supabase-style builder over CATALOG that counts executed queries."""
+
+    def __init__(self, table, log, catalog=None):
+        self.table_name = table
+        self.log = log
+        self.filters = []
+        self.catalog = CATALOG if catalog is None else catalog
+
+    def select(self, columns):
+        self.columns = columns
+        return self
+
+    def eq(self, col, val):
+        self.filters.append((col, val))
+        return self
+
+    def order(self, col):
+        return self
+
+    def limit(self, n):
+        return self
+
+    def execute(self):
+        self.log.append((self.table_name, self.columns, tuple(self.filters)))
+        if self.table_name == "lesson" and self.columns == "*,step(*)":
+            return types.SimpleNamespace(data=self.catalog)
+        if self.table_name == "step" and self.filters and self.filters[0][0] == "lesson_id":
+            lesson = next((row for row in self.catalog if row["id"] == self.filters[0][1]), None)
+            steps = sorted(lesson["step"], key=lambda step: step["step_order"]) if lesson else []
+            return types.SimpleNamespace(data=steps)
+        return types.SimpleNamespace(data=[])
+
+
+def test_snapshot_indexes_lessons_and_steps():
+    snapshot = CatalogSnapshot(CATALOG)
+
+    assert snapshot.lesson_id_by_order(2) == 11
+    assert snapshot.step(10, 1).finish_criteria == "C1"
+    assert list(snapshot.lesson_steps(10)) == [1, 2]
+    assert snapshot.lesson_steps(11) is None
+    assert snapshot.step(11, 1) is None
+    with pytest.raises(TypeError):
+        snapshot.steps[(10, 3)] = None
+
+
+def test_index_swaps_snapshot_on_refresh_and_keeps_old_on_failure():
+    rows = [CATALOG[:1]]
+    index = CatalogIndex(lambda: rows[0], background=False)
+
+    first = index.current()
+    assert first.lesson_id_by_order(2) is None
+
+    rows[0] = CATALOG
+    assert index.refresh() is True
+    assert index.current() is not first
+    assert index.current().lesson_id_by_order(2) == 11
+
+    def boom():
+        raise RuntimeError("db down")
+
+    index.loader = boom
+    kept = index.current()
+    assert index.refresh() is False
+    assert index.current() is kept
+    assert index.stats()["failures"] == 1
+
+
+def test_failed_first_load_is_retried_after_backoff():
+    calls = []
+
+    def boom():
+        calls.append(1)
+        raise RuntimeError("db down")
+
+    index = CatalogIndex(boom, retry_seconds=60, background=False)
+    assert index.current() is None
+    assert index.current() is None
+    assert len(calls) == 1
+
+
+def test_provider_lookups_are_served_from_one_catalog_query(monkeypatch):
+    log = []
+    stub = types.SimpleNamespace(table=lambda name: _CountingQuery(name, log))
+    monkeypatch.setattr("utils.database_context.create_client", lambda url, key, options=None: stub)
+    monkeypatch.setenv("SUPABASE_URL", "http://db.local")
+    monkeypatch.setenv("SUPABASE_KEY", "anon")
+    ctx = DatabaseContextProvider()
+    ctx.catalog.background = False
+
+    assert ctx.get_step_by_order_and_lesson_order(step_order=2, lesson_order=1) == ("Second", "D2")
+    assert ctx.get_step_finish_criteria(step_order=2, lesson_id=10) == "Step 2 completion criteria"
+    assert ctx.get_lesson_id_by_order(2) == 11
+    assert ctx.get_lesson_steps_batch(10)[1] == {"name": "First", "description": "D1", "finish_criteria": "C1"}
+    assert log == [("lesson", "*,step(*)", ())]
+
+    # Misses fall back to a direct query
+    assert ctx.get_step_by_order_and_lesson(step_order=5, lesson_id=10) == ("", "")
+    assert len(log) == 2
+
+
+def _edited_catalog(criteria):
+    lesson = dict(CATALOG[0], step=[dict(CATALOG[0]["step"][1], finish_criteria=criteria), CATALOG[0]["step"][0]])
+    return [lesson, CATALOG[1]]
+
+
+def test_invalidated_lesson_stays_stale_until_a_later_load():
+    writes = []
+
+    def loader():
+        # A write landing while the catalog is being read may be missing from it
+        for lesson_id in writes:
+            index.mark_stale(lesson_id)
+        writes.clear()
+        return CATALOG
+
+    index = CatalogIndex(loader, background=False)
+    index.current()
+    assert not index.is_stale()
+
+    index.mark_stale(10)
+    assert index.is_stale(10) and index.is_stale()
+    assert not index.is_stale(11)
+
+    writes.append(10)
+    index.refresh()
+    assert index.is_stale(10)
+    index.refresh()
+    assert not index.is_stale(10)
+
+    index.mark_stale(None)
+    assert index.is_stale(11)
+    index.refresh()
+    assert not index.is_stale()
+
+
+def test_swap_reports_lessons_whose_steps_changed():
+    rows = [CATALOG]
+    index = CatalogIndex(lambda: rows[0], background=False)
+    changed = []
+
+    def listener(lesson_id):
+        changed.append(lesson_id)
+        index.mark_stale(lesson_id)  # e.g. through lesson cache invalidation
+
+    index.add_listener(listener)
+    index.current()
+    index.refresh()
+    assert changed == []
+
+    rows[0] = _edited_catalog("C1 edited")
+    index.refresh()
+    assert changed == [10]
+    assert not index.is_stale()
+
+
+def test_provider_reads_invalidated_lesson_directly_and_drops_cache_on_swap(monkeypatch):
+    log = []
+    catalog = [CATALOG]
+    stub = types.SimpleNamespace(table=lambda name: _CountingQuery(name, log, catalog[0]))
+    monkeypatch.setattr("utils.database_context.create_client", lambda url, key, options=None: stub)
+    monkeypatch.setenv("SUPABASE_URL", "http://db.local")
+    monkeypatch.setenv("SUPABASE_KEY", "anon")
+    lesson_cache.clear()
+    ctx = DatabaseContextProvider()
+    ctx.catalog.background = False
+    assert ctx.get_lesson_steps_batch(10)[1]["finish_criteria"] == "C1"
+
+    # The write path invalidates; the snapshot still has the old criteria
+    catalog[0] = _edited_catalog("C1 edited")
+    ctx.catalog.mark_stale(10)
+    steps = lesson_cache.get_or_load(10, ctx.get_lesson_steps_batch)
+    assert steps[1]["finish_criteria"] == "C1 edited"
+    assert log[-1][0] == "step"
+
+    # An edit the write paths did not see reaches the lesson cache with the next snapshot
+    ctx.catalog.refresh()
+    lesson_cache.get_or_load(10, ctx.get_lesson_steps_batch)
+    catalog[0] = _edited_catalog("C1 edited twice")
+    assert lesson_cache.get(10) is not None
+    ctx.catalog.refresh()
+    assert lesson_cache.get(10) is None
+    assert ctx.get_lesson_steps_batch(10)[1]["finish_criteria"] == "C1 edited twice"
+    lesson_cache.clear()
@@ -0,0 +1,126 @@
+import os
+import random
+import sys
+
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.dirname(CURRENT_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from utils import user_state_store  # noqa: E402
+from utils.check_cadence import CheckCadence, P2Quantile  # noqa: E402
+
+
+def test_p2_quantile_tracks_exact_quantiles():
+    rng = random.Random(7)
+    samples = [rng.lognormvariate(3, 0.5) for _ in range(5000)]
+    for q in (0.1, 0.5, 0.9):
+        estimator = P2Quantile(q)
+        for x in samples:
+            estimator.add(x)
+        exact = sorted(samples)[int(q * (len(samples) - 1))]
+        assert abs(estimator.value() - exact) / exact < 0.05
+
+
+def test_p2_quantile_is_exact_for_few_samples():
+    estimator = P2Quantile(0.5)
+    assert estimator.value() is None
+    for x in (30, 10, 20):
+        estimator.add(x)
+    assert estimator.value() == 20
+
+
+def test_next_delay_uses_default_until_enough_history():
+    cadence = CheckCadence(min_interval=2, max_interval=30, min_samples=3, path=None)
+    cadence.record(1, 1, 60)
+    cadence.record(1, 1, 60)
+    assert cadence.quantiles(1, 1) is None
+    assert cadence.next_delay(1, 1, 0, default=10) == 10
+
+
+def test_next_delay_is_sparse_early_dense_in_window_and_backs_off():
+    cadence = CheckCadence(min_interval=2, max_interval=30, min_samples=5, path=None)
+    for seconds in (50, 55, 60, 65, 70, 60, 58, 62):
+        cadence.record(1, 1, seconds)
+    low, median, high = cadence.quantiles(1, 1)
+    assert low < median < high
+
+    assert cadence.next_delay(1, 1, 0, default=10) == 30  # sparse early
+    assert cadence.next_delay(1, 1, low - 1, default=10) == 2  # never below min_interval
+    assert cadence.next_delay(1, 1, median, default=10) == 2  # dense around the typical time
+    assert 2 < cadence.next_delay(1, 1, high + 20, default=10) <= 30  # backs off when stuck
+    assert cadence.next_delay(1, 1, high + 600, default=10) == 30
+
+
+def test_state_round_trips_through_file(tmp_path):
+    path = str(tmp_path / "cadence.json")
+    cadence = CheckCadence(min_samples=3, path=path, save_every=2)
+    for seconds in (10, 20, 30, 40):
+        cadence.record(4, 2, seconds)
+
+    restored = CheckCadence(min_samples=3, path=path)
+    assert restored.quantiles(4, 2) == cadence.quantiles(4, 2)
+    assert restored.stats()["steps"] == 1
+
+
+def test_steps_are_lru_bounded():
+    cadence = CheckCadence(max_steps=2, path=None)
+    for step in (1, 2, 3):
+        cadence.record(1, step, 5)
+    assert cadence.stats() == {"steps": 2, "recorded": 3}
+
+
+def _simulate(monkeypatch, noisy: bool, capture: float = 3.0, checks_per_window: float = 16, seed: int = 5):
+    # Learners finish at random times, the overlay captures every few seconds and
+    # checks follow the cadence being learned. With noisy=True every frame differs
+    # (cursor moves, typing) whether or not the step is done.
+    now = [1000.0]
+    monkeypatch.setattr(user_state_store.time, "time", lambda: now[0])
+    store = user_state_store.InMemoryUserStateStore(shards=1)
+    cadence = CheckCadence(min_interval=2, max_interval=30, checks_per_window=checks_per_window, min_samples=5, path=None)
+    rng = random.Random(seed)
+    actual = []
+
+    for _ in range(1000):
+        finish = rng.lognormvariate(4, 0.6)
+        actual.append(finish)
+        store.set_step("u", 1, 1)
+        store.claim_popup("u", 1, 1)
+        started, analyzed, frame = now[0], None, 0
+        # Captures are not aligned with the popup
+        phase = rng.random() * capture if noisy else 0.0
+        while True:
+            frame += 1
+            now[0] = started + phase + capture * frame
+            done = now[0] - started >= finish
+            screen = (done, frame) if noisy else done
+            if screen == analyzed:
+                continue  # identical frame: the deduplicator reuses the last verdict
+            due, elapsed = store.claim_check("u", 1, lambda seconds: cadence.next_delay(1, 1, seconds, 0.0))
+            if not due:
+                continue
+            analyzed = screen
+            if done:
+                cadence.record(1, 1, elapsed)
+                break
+
+    actual.sort()
+    expected = [actual[int(q * (len(actual) - 1))] for q in (0.1, 0.5, 0.9)]
+    return cadence.quantiles(1, 1), expected
+
+
+def test_learned_quantiles_stay_unbiased_under_own_cadence(monkeypatch):
+    learned, expected = _simulate(monkeypatch, noisy=False)
+    for estimate, true in zip(learned, expected):
+        assert abs(estimate - true) <= 3.0 + 0.05 * true
+
+
+def test_learned_quantiles_stay_unbiased_when_every_frame_changes(monkeypatch):
+    # Sparse checks and frequent captures: the first changed frame after a NO says
+    # nothing about when the step was done, so only the interval up to the YES does
+    errors = []
+    for seed in range(4):
+        learned, expected = _simulate(monkeypatch, noisy=True, capture=1.0, checks_per_window=4, seed=seed)
+        errors += [estimate - true for estimate, true in zip(learned, expected)]
+    assert abs(sum(errors) / len(errors)) <= 2.0
@@ -0,0 +1,144 @@
+import json
+import os
+import sys
+
+import pytest
+
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.dirname(CURRENT_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from utils import course_store  # noqa: E402
+from utils.course_store import CourseIndex, LocalCourseStore  # noqa: E402
+
+COURSE = [
+    {
+        "chapter": 1,
+        "title": "Intro",
+        "steps": [
+            {"step": 1, "title": "Open", "instruction": "Open the app", "finished_criteria": "App open"},
+            {"step": 2, "title": None, "instruction": None},
+            {"title": "no order"},
+        ],
+    },
+    {"chapter": 2, "title": "Next", "steps": [{"step": 1, "title": "Save", "instruction": "Save it"}]},
+    {"chapter": 1, "title": "Duplicate", "steps": [{"step": 9, "title": "Ignored"}]},
+]
+
+
+def _write(path, course):
+    # Bump mtime explicitly; some filesystems have coarse timestamps
+    previous = os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+    path.write_text(json.dumps(course), encoding="utf-8")
+    os.utime(path, ns=(previous + 10**9, previous + 10**9))
+
+
+@pytest.fixture
+def course_file(tmp_path):
+    path = tmp_path / "generated_course.json"
+    _write(path, COURSE)
+    return path
+
+
+def test_index_matches_old_linear_scan_shape():
+    index = CourseIndex(COURSE)
+
+    assert sorted(index.chapters) == [1, 2]
+    assert dict(index.chapters[1][1]) == {
+        "name": "Open",
+        "description": "Open the app",
+        "finish_criteria": "App open",
+    }
+    assert dict(index.chapters[1][2]) == {
+        "name": "Step 2",
+        "description": "",
+        "finish_criteria": "Step 2 completion criteria",
+    }
+    # First chapter wins, as the old scan returned the first match
+    assert 9 not in index.chapters[1]
+
+
+def test_index_ignores_non_list_course():
+    assert len(CourseIndex({"chapter": 1}).chapters) == 0
+
+
+def test_get_lesson_steps_returns_copies(course_file):
+    store = LocalCourseStore(str(course_file), check_interval=60)
+
+    steps = store.get_lesson_steps(1)
+    steps[1]["name"] = "changed"
+
+    assert store.get_lesson_steps(1)[1]["name"] == "Open"
+    assert store.get_lesson_steps(99) == {}
+    assert len(store) == 2
+
+
+def test_reloads_when_file_changes(course_file):
+    reloads = []
+    store = LocalCourseStore(str(course_file), check_interval=0, on_reload=lambda: reloads.append(1))
+    assert store.loads == 1
+    assert reloads == []
+
+    _write(course_file, [{"chapter": 3, "steps": [{"step": 1, "title": "New"}]}])
+
+    assert store.get_lesson_steps(1) == {}
+    assert store.get_lesson_steps(3)[1]["name"] == "New"
+    assert store.loads == 2
+    assert reloads == [1]
+
+
+def test_unchanged_file_is_not_reparsed(course_file):
+    store = LocalCourseStore(str(course_file), check_interval=0)
+
+    for _ in range(5):
+        store.get_lesson_steps(1)
+
+    assert store.loads == 1
+
+
+def test_check_interval_limits_stat_calls(course_file):
+    store = LocalCourseStore(str(course_file), check_interval=60)
+    _write(course_file, [])
+
+    # Not checked again until the interval passes
+    assert store.get_lesson_steps(1)[1]["name"] == "Open"
+    assert store.reload() is True
+    assert store.get_lesson_steps(1) == {}
+
+
+def test_parse_failure_keeps_previous_index(course_file):
+    store = LocalCourseStore(str(course_file), check_interval=0)
+    previous = os.stat(course_file).st_mtime_ns
+    course_file.write_text('[{"chapter": 1, "steps": [', encoding="utf-8")
+    os.utime(course_file, ns=(previous + 10**9, previous + 10**9))
+
+    assert store.get_lesson_steps(1)[1]["name"] == "Open"
+    assert store.loads == 1
+
+
+def test_missing_file_gives_empty_store(tmp_path):
+    store = LocalCourseStore(str(tmp_path / "missing.json"), check_interval=0)
+
+    assert store.get_lesson_steps(1) == {}
+    assert store.course == []
+
+
+def test_reload_callback_errors_are_swallowed(course_file):
+    def boom():
+        raise RuntimeError("listener failed")
+
+    store = LocalCourseStore(str(course_file), check_interval=0, on_reload=boom)
+    _write(course_file, [])
+
+    assert store.reload() is True
+    assert store.get_lesson_steps(1) == {}
+
+
+def test_stdlib_parser_without_orjson(course_file, monkeypatch):
+    monkeypatch.setattr(course_store, "orjson", None)
+
+    store = LocalCourseStore(str(course_file), check_interval=60)
+
+    assert store.get_lesson_steps(2)[1]["name"] == "Save"
@@ -0,0 +1,97 @@
+import os
+import sys
+import threading
+import time
+
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.dirname(CURRENT_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from utils.flow_scheduler import FlowScheduler  # noqa: E402
+
+
+def test_flow_runs_transitions_until_done():
+    scheduler = FlowScheduler(max_workers=2)
+    steps = []
+    done = threading.Event()
+
+    def transition():
+        steps.append(len(steps))
+        return 0.01 if len(steps) < 3 else None
+
+    scheduler.schedule(transition, user_id="u1", on_done=done.set)
+
+    assert done.wait(2)
+    assert steps == [0, 1, 2]
+    assert scheduler.active == 0
+
+
+def test_many_waiting_flows_do_not_need_threads():
+    scheduler = FlowScheduler(max_workers=2)
+    finished = []
+    lock = threading.Lock()
+    all_done = threading.Event()
+    total = 200
+
+    def make_transition(i):
+        state = {"checks": 0}
+
+        def transition():
+            state["checks"] += 1
+            return 0.02 if state["checks"] < 2 else None
+
+        def on_done():
+            with lock:
+                finished.append(i)
+                if len(finished) == total:
+                    all_done.set()
+
+        return transition, on_done
+
+    threads_before = threading.active_count()
+    for i in range(total):
+        transition, on_done = make_transition(i)
+        scheduler.schedule(transition, user_id=f"u{i}", on_done=on_done)
+
+    # Two workers plus one timer thread, regardless of how many flows are waiting
+    assert threading.active_count() - threads_before <= 3
+    assert all_done.wait(5)
+    assert sorted(finished) == list(range(total))
+
+
+def test_cancel_user_stops_pending_flow():
+    scheduler = FlowScheduler(max_workers=1)
+    calls = []
+    finished = []
+
+    def transition():
+        calls.append(time.monotonic())
+        return 0.05
+
+    scheduler.schedule(transition, user_id="u1", on_done=lambda: finished.append(True))
+    scheduler.schedule(transition, user_id="u1")
+    time.sleep(0.02)
+
+    assert scheduler.cancel_user("u1") == 2
+    seen = len(calls)
+    time.sleep(0.15)
+
+    assert len(calls) == seen
+    assert finished == []
+    assert scheduler.active == 0
+    assert scheduler.cancel_user("u1") == 0
+
+
+def test_failing_transition_finishes_flow():
+    scheduler = FlowScheduler(max_workers=1)
+    done = threading.Event()
+
+    def transition():
+        raise RuntimeError("boom")
+
+    scheduler.schedule(transition, on_done=done.set)
+
+    assert done.wait(2)
+    assert scheduler.active == 0
@@ -0,0 +1,150 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.dirname(CURRENT_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from utils.frame_coalescer import LatestFrameCoalescer  # noqa: E402
+
+
+def _wait_for(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def test_single_frame_runs_immediately():
+    coalescer = LatestFrameCoalescer()
+    assert coalescer.run("u", lambda: {"completed": True}) == {"completed": True}
+
+
+def test_latest_pending_frame_wins():
+    coalescer = LatestFrameCoalescer()
+    release = threading.Event()
+    ran = []
+    results = {}
+
+    def analysis(name):
+        def fn():
+            ran.append(name)
+            if name == "first":
+                release.wait(5)
+            return {"frame": name}
+        return fn
+
+    def submit(name):
+        results[name] = coalescer.run("u", analysis(name))
+
+    first = threading.Thread(target=submit, args=("first",))
+    first.start()
+    _wait_for(lambda: ran == ["first"])
+
+    second = threading.Thread(target=submit, args=("second",))
+    second.start()
+    _wait_for(lambda: coalescer._slots["u"].pending is not None)
+
+    third = threading.Thread(target=submit, args=("third",))
+    third.start()
+    second.join(5)  # released as superseded while "first" is still running
+    assert results["second"]["status"] == "superseded"
+
+    release.set()
+    for thread in (first, third):
+        thread.join(5)
+
+    assert ran == ["first", "third"]
+    assert results["first"] == {"frame": "first"}
+    assert results["third"] == {"frame": "third"}
+    assert coalescer.superseded_count == 1
+    assert coalescer._slots == {}
+
+
+def test_users_do_not_block_each_other():
+    coalescer = LatestFrameCoalescer()
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return {}
+
+    blocker = threading.Thread(target=coalescer.run, args=("a", slow))
+    blocker.start()
+    assert started.wait(5)
+
+    assert coalescer.run("b", lambda: {"user": "b"}) == {"user": "b"}
+    release.set()
+    blocker.join(5)
+
+
+def test_deferred_frames_wait_without_a_worker():
+    coalescer = LatestFrameCoalescer()
+    started, dropped = [], []
+
+    def admit(name):
+        coalescer.defer("u", start=lambda: started.append(name), drop=lambda: dropped.append(name))
+
+    admit("first")
+    admit("second")  # parked: nothing runs for it while "first" is in flight
+    admit("third")  # replaces "second"
+
+    assert started == ["first"]
+    assert dropped == ["second"]
+    assert coalescer.depth == 2
+
+    coalescer.done("u")  # "first" finished; the newest waiting frame is started
+    assert started == ["first", "third"]
+    assert coalescer.depth == 1
+
+    coalescer.done("u")
+    assert coalescer._slots == {}
+    assert coalescer.superseded_count == 1
+
+
+def test_deferred_start_failure_releases_the_slot():
+    coalescer = LatestFrameCoalescer()
+
+    def full():
+        raise RuntimeError("queue full")
+
+    failed = []
+    with pytest.raises(RuntimeError):
+        coalescer.defer("u", start=full, drop=lambda: None, fail=failed.append)
+    assert coalescer._slots == {}
+    # The immediate caller got the exception; fail() is only for parked frames
+    assert failed == []
+
+    # A parked frame that cannot start is reported through fail() and the user is released
+    coalescer.defer("u", start=lambda: None, drop=lambda: None)
+    coalescer.defer("u", start=full, drop=lambda: None, fail=failed.append)
+    coalescer.done("u")
+    assert coalescer._slots == {}
+    assert [str(error) for error in failed] == ["queue full"]
+
+
+def test_blocking_run_hands_over_to_deferred_frame():
+    coalescer = LatestFrameCoalescer()
+    release = threading.Event()
+    started = []
+
+    runner = threading.Thread(target=coalescer.run, args=("u", lambda: release.wait(5)))
+    runner.start()
+    _wait_for(lambda: coalescer.depth == 1)
+
+    coalescer.defer("u", start=lambda: started.append("deferred"), drop=lambda: None)
+    assert started == []
+    release.set()
+    runner.join(5)
+
+    assert started == ["deferred"]
+    coalescer.done("u")
+    assert coalescer._slots == {}
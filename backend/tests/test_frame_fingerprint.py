@@ -0,0 +1,103 @@
+import base64
+import io
+import os
+import sys
+
+import pytest
+
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.dirname(CURRENT_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from utils.frame_fingerprint import FrameDeduplicator, compute_fingerprint  # noqa: E402
+
+
+def _png_base64(color, size=(320, 200), box=None, label=None):
+    Image = pytest.importorskip("PIL.Image")
+    img = Image.new("RGB", size, color)
+    if box:
+        img.paste((0, 0, 0), box)
+    if label:
+        from PIL import ImageDraw
+
+        ImageDraw.Draw(img).text(label[0], label[1], fill=(40, 40, 40))
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return base64.b64encode(buf.getvalue()).decode("ascii")
+
+
+def test_fingerprint_matches_for_reencoded_frame():
+    Image = pytest.importorskip("PIL.Image")
+    original = _png_base64((200, 200, 200), box=(10, 10, 100, 100))
+
+    # Re-encode with different compression settings: bytes differ, pixels do not
+    img = Image.open(io.BytesIO(base64.b64decode(original)))
+    buf = io.BytesIO()
+    img.save(buf, format="PNG", compress_level=1)
+    reencoded = buf.getvalue()
+
+    assert reencoded != base64.b64decode(original)
+    assert compute_fingerprint(original) == compute_fingerprint(reencoded)
+
+
+def test_fingerprint_differs_for_changed_frame():
+    left = compute_fingerprint(_png_base64((200, 200, 200), box=(10, 10, 100, 100)))
+    right = compute_fingerprint(_png_base64((200, 200, 200), box=(200, 100, 310, 190)))
+    assert left != right
+
+
+def test_fingerprint_matches_across_pixel_formats():
+    Image = pytest.importorskip("PIL.Image")
+    rgb = Image.new("RGB", (64, 48), (10, 120, 200))
+    buffers = []
+    for img in (rgb, rgb.convert("RGBA")):
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+        buffers.append(buf.getvalue())
+
+    assert compute_fingerprint(buffers[0]) == compute_fingerprint(buffers[1])
+
+
+def test_small_criteria_relevant_edit_is_not_deduplicated():
+    # A full-size editor screen; the step's only visible effect is a "Frame 1" layer label
+    before = _png_base64((245, 245, 245), size=(1440, 900), box=(0, 0, 240, 900))
+    after = _png_base64((245, 245, 245), size=(1440, 900), box=(0, 0, 240, 900), label=((260, 60), "Frame 1"))
+    dedup = FrameDeduplicator()
+    dedup.remember("u", (1, 1), compute_fingerprint(before), "NO")
+
+    assert dedup.lookup("u", (1, 1), compute_fingerprint(after)) is None
+    assert dedup.lookup("u", (1, 1), compute_fingerprint(before)) == "NO"
+
+
+def test_fingerprint_non_image_payload_is_exact():
+    assert compute_fingerprint("not-an-image") == compute_fingerprint("not-an-image")
+    assert compute_fingerprint("not-an-image") != compute_fingerprint("also-not")
+    assert compute_fingerprint("") is None
+
+
+def test_deduplicator_scopes_verdict_to_context():
+    dedup = FrameDeduplicator()
+    dedup.remember("u", (1, 1), "a1", "NO")
+
+    assert dedup.lookup("u", (1, 1), "a1") == "NO"  # identical frame
+    assert dedup.lookup("u", (1, 2), "a1") is None  # different step
+    assert dedup.lookup("u", (1, 1), "a2") is None  # any change
+    assert dedup.lookup("other", (1, 1), "a1") is None
+    assert (dedup.hits, dedup.misses) == (1, 3)
+
+    dedup.forget("u")
+    assert dedup.lookup("u", (1, 1), "a1") is None
+
+
+def test_deduplicator_keeps_most_recent_users():
+    dedup = FrameDeduplicator(max_users=2)
+    dedup.remember("a", (1, 1), "a1", "NO")
+    dedup.remember("b", (1, 1), "b1", "NO")
+    dedup.remember("a", (1, 1), "a2", "NO")
+    dedup.remember("c", (1, 1), "c1", "NO")
+
+    assert len(dedup) == 2
+    assert dedup.lookup("b", (1, 1), "b1") is None
+    assert dedup.lookup("a", (1, 1), "a2") == "NO"
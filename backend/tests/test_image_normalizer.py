@@ -0,0 +1,65 @@
+import base64
+import io
+import os
+import sys
+
+import pytest
+
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.dirname(CURRENT_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from utils import image_normalizer as norm  # noqa: E402
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _noisy_png(size):
+    img = Image.effect_noise(size, 64).convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def test_normalize_downscales_and_fits_budget():
+    raw = _noisy_png((1920, 1080))
+
+    result = norm.normalize_image(raw, max_edge=800, image_format="JPEG", byte_budget=60_000)
+
+    assert result.media_type == "image/jpeg"
+    assert max(result.width, result.height) <= 800
+    assert len(result.data) <= 60_000
+    assert result.bytes_saved == len(raw) - len(result.data) > 0
+    assert Image.open(io.BytesIO(result.data)).format == "JPEG"
+
+
+def test_normalize_grayscale_and_webp_from_base64():
+    encoded = base64.b64encode(_noisy_png((640, 480))).decode("ascii")
+
+    gray = norm.normalize_image(encoded, max_edge=320, grayscale=True, image_format="JPEG")
+    webp = norm.normalize_image(encoded, max_edge=320, image_format="WEBP")
+
+    assert Image.open(io.BytesIO(gray.data)).mode == "L"
+    assert webp.media_type == "image/webp"
+    assert Image.open(io.BytesIO(webp.data)).size == (320, 240)
+
+
+def test_normalize_passes_through_undecodable_payload():
+    result = norm.normalize_image(b"\xff\xd8\xffnot-really-a-jpeg")
+    assert result.data == b"\xff\xd8\xffnot-really-a-jpeg"
+    assert result.media_type == "image/jpeg"
+    assert result.bytes_saved == 0
+
+
+def test_submit_normalization_runs_on_pool_and_records_stats():
+    before = norm.normalization_stats.snapshot()["frames"]
+    result = norm.submit_normalization(_noisy_png((400, 300)), max_edge=200).result(timeout=10)
+    assert result.width == 200
+    assert norm.normalization_stats.snapshot()["frames"] == before + 1
+
+
+def test_grayscale_allowed_respects_color_criteria():
+    assert norm.grayscale_allowed("The layers panel shows a new frame named Frame 1")
+    assert not norm.grayscale_allowed("The rectangle fill is set to blue")
@@ -1,6 +1,9 @@
+import io
 import os
 import sys
+import threading
 import types
+from concurrent.futures import Future
 import pytest
 
 
@@ -63,6 +66,9 @@ class _FakeImageContent:  # noqa: D401 - minimal stub
         self.source = source
 
 
+# Keep agent ids created by the fake client out of the real agent id store
+os.environ["AGENT_STORE_PATH"] = ""
+
 fake_letta_mod = types.ModuleType("letta_client")
 fake_letta_mod.Letta = _FakeLetta
 fake_letta_mod.MessageCreate = _FakeMessageCreate
@@ -75,14 +81,39 @@ sys.modules.setdefault("letta_client", fake_letta_mod)
 from utils import learning_agent as la  # noqa: E402
 
 
+@pytest.fixture
+def progress_events(monkeypatch):
+    """Capture progress writes instead of journaling them on disk."""
+    events = []
+
+    def record(user_id, lesson_id, step_order, completed=False):
+        events.append((user_id, lesson_id, step_order, completed))
+        return True
+
+    monkeypatch.setattr(la.db_context, "update_user_progress", record)
+    return events
+
+
 @pytest.fixture(autouse=True)
-def reset_agent_state():
+def reset_agent_state(progress_events):  # noqa: ARG001
     """Reset in-memory caches between tests for isolation."""
     la.lesson_cache.clear()
     la.user_state.clear()
+    la.frame_deduplicator.clear()
+    la.tile_change_detector.clear()
+    la.verdict_cache.clear()
+    la.step_payloads.clear()
+    la.check_cadence.clear()
+    la.verifier_guard.reset()
     yield
     la.lesson_cache.clear()
     la.user_state.clear()
+    la.frame_deduplicator.clear()
+    la.tile_change_detector.clear()
+    la.verdict_cache.clear()
+    la.step_payloads.clear()
+    la.check_cadence.clear()
+    la.verifier_guard.reset()
 
 
 @pytest.fixture
@@ -106,6 +137,92 @@ def test_analyze_screenshot_returns_yes(monkeypatch):
     assert result.strip() == "YES"
 
 
+def test_check_completion_streams_and_stops_early(monkeypatch):
+    consumed = []
+
+    def fake_stream(agent_id, messages, stream_tokens):  # noqa: ARG001
+        for token in ["NO", ".", " The", " dialog", " is", " still", " open"]:
+            consumed.append(token)
+            yield types.SimpleNamespace(message_type="assistant_message", content=token)
+
+    monkeypatch.setattr(la.client.agents.messages, "create_stream", fake_stream, raising=False)
+    monkeypatch.setattr(la.db_context, "get_relevant_context", lambda t, i: "")  # noqa: ARG005
+
+    verdict = la.check_completion(base64_image="abc", finish_criteria="Dialog closed", lesson_id="1")
+
+    assert verdict.decision == "NO"
+    assert verdict.source == "stream"
+    assert verdict.early_stopped is True
+    assert consumed == ["NO", "."]
+    assert la.analyze_screenshot(base64_image="abc", finish_criteria="Dialog closed") == "NO"
+
+
+def test_check_completion_falls_back_to_local_verdict_when_circuit_open(monkeypatch):
+    weak = types.SimpleNamespace(decision="NO", confidence=0.6, verifier="weak")
+    monkeypatch.setattr(la.local_verifier_chain, "evaluate", lambda img, crit, expected_text=None: (None, weak))  # noqa: ARG005
+    monkeypatch.setattr(la.db_context, "get_relevant_context", lambda t, i: "")  # noqa: ARG005
+    monkeypatch.setattr(la.verifier_guard.breaker, "allow", lambda: False)
+
+    verdict = la.check_completion(base64_image="abc", finish_criteria="Dialog closed", lesson_id="1")
+
+    assert (verdict.decision, verdict.source) == ("NO", "fallback")
+    assert la.verifier_guard.stats()["fallbacks"] == 1
+
+    monkeypatch.setattr(la.local_verifier_chain, "evaluate", lambda img, crit, expected_text=None: (None, None))  # noqa: ARG005
+    verdict = la.check_completion(base64_image="abc", finish_criteria="Dialog closed", lesson_id="1")
+    assert (verdict.text, verdict.source) == ("UNAVAILABLE", "circuit_open")
+
+
+def test_normalization_overlaps_local_checks_and_is_dropped_on_local_decision(monkeypatch):
+    events = []
+    future = Future()
+
+    def fake_submit(image, **kwargs):  # noqa: ARG001
+        events.append("normalize")
+        return future
+
+    def fake_evaluate(img, crit, expected_text=None):  # noqa: ARG001
+        events.append("local")
+        return types.SimpleNamespace(decision="YES", confidence=0.99, verifier="ocr", detail="found"), None
+
+    monkeypatch.setattr(la, "submit_normalization", fake_submit)
+    monkeypatch.setattr(la.local_verifier_chain, "evaluate", fake_evaluate)
+
+    verdict = la.check_completion(base64_image="abc", finish_criteria="Dialog closed", lesson_id="1")
+
+    assert (verdict.decision, verdict.source) == ("YES", "local")
+    # Started before the local verifiers ran, never waited on once they decided
+    assert events == ["normalize", "local"]
+    assert future.cancelled()
+
+
+def test_check_completion_uses_prebuilt_step_payload(monkeypatch):
+    seen = {}
+
+    def fake_submit(image, grayscale=False, **kwargs):  # noqa: ARG001
+        seen["grayscale"] = grayscale
+        return Future()
+
+    def fake_evaluate(img, crit, expected_text=None):  # noqa: ARG001
+        seen["expected_text"] = expected_text
+        return types.SimpleNamespace(decision="YES", confidence=0.99, verifier="ocr", detail="found"), None
+
+    def fail(*args):
+        raise AssertionError("criteria re-derived despite a prebuilt payload")
+
+    monkeypatch.setattr(la, "submit_normalization", fake_submit)
+    monkeypatch.setattr(la.local_verifier_chain, "evaluate", fake_evaluate)
+    monkeypatch.setattr(la, "grayscale_allowed", fail)
+    monkeypatch.setattr("utils.verdict_cache.criteria_hash", fail)
+    monkeypatch.setattr(la, "GRAYSCALE", True)
+    payload = la.step_payloads.get(1, {1: {"name": "S1", "description": "D1", "finish_criteria": 'Click "Save"'}})[1]
+
+    verdict = la.check_completion(b"frame", payload.finish_criteria, "1", payload=payload)
+
+    assert verdict.source == "local"
+    assert seen == {"grayscale": payload.grayscale_ok, "expected_text": payload.expected_text}
+
+
 def test_generate_and_send_popup_message_calls_websocket(monkeypatch):
     # Arrange: capture what is sent; function now uses step_description directly
     sent = {}
@@ -157,6 +274,22 @@ def test__ensure_lesson_loaded_caches(monkeypatch):
     assert calls["count"] == 1  # Only loaded once
 
 
+def test_send_popup_via_websocket_uses_bound_bus_without_http(monkeypatch):
+    import requests  # noqa: WPS433 - used for monkeypatch target
+
+    def fail_post(*args, **kwargs):  # noqa: ARG001
+        raise AssertionError("loopback HTTP should not be used when the bus is bound")
+
+    emitted = []
+    monkeypatch.setattr(requests, "post", fail_post)
+    monkeypatch.setattr(la.popup_bus, "_emit", lambda event, data, room=None: emitted.append((event, data, room)))
+
+    assert la.send_popup_via_websocket("msg", user_id="u1") is True
+    event, data, room = emitted[0]
+    assert (event, room) == ("popup_message", "u1")
+    assert data["message"] == "msg" and data["user_id"] == "u1"
+
+
 def test_handle_screenshot_event_popup_then_not_completed_then_completed(monkeypatch):
     # Arrange lesson data
     lesson_data = {
@@ -171,17 +304,73 @@ def test_handle_screenshot_event_popup_then_not_completed_then_completed(monkeyp
     assert out1["step_order"] == 1
 
     # Second call not completed
-    monkeypatch.setattr(la, "analyze_screenshot", lambda img, crit, lesson_id=None: "NO")  # noqa: ARG005
-    out2 = la.handle_screenshot_event(user_id="u", lesson_id=1, step_order=1, base64_image="img")
+    monkeypatch.setattr(la, "analyze_screenshot", lambda img, crit, lesson_id=None, payload=None: "NO")  # noqa: ARG005
+    out2 = la.handle_screenshot_event(user_id="u", lesson_id=1, step_order=1, base64_image="img-2")
     assert out2["completed"] is False
 
     # Third call completed -> lesson_completed (no next step exists)
-    monkeypatch.setattr(la, "analyze_screenshot", lambda img, crit, lesson_id=None: "YES")  # noqa: ARG005
-    out3 = la.handle_screenshot_event(user_id="u", lesson_id=1, step_order=1, base64_image="img")
+    monkeypatch.setattr(la, "analyze_screenshot", lambda img, crit, lesson_id=None, payload=None: "YES")  # noqa: ARG005
+    out3 = la.handle_screenshot_event(user_id="u", lesson_id=1, step_order=1, base64_image="img-3")
     assert out3["completed"] is True
     assert out3["lesson_completed"] is True
 
 
+def test_handle_screenshot_event_sends_next_popup_on_advance(monkeypatch, progress_events):
+    steps = {
+        1: {"name": "S1", "description": "D1", "finish_criteria": "C1"},
+        2: {"name": "S2", "description": " D2 ", "finish_criteria": "C2"},
+    }
+    monkeypatch.setattr(la.db_context, "get_lesson_steps_batch", lambda lesson_id: steps)  # noqa: ARG005
+    popups = []
+    monkeypatch.setattr(la, "generate_and_send_popup_message", lambda img, desc, user_id=None: popups.append(desc))  # noqa: ARG005
+    checked = []
+    monkeypatch.setattr(la, "analyze_screenshot", lambda img, crit, lesson_id=None, payload=None: checked.append(payload.finish_criteria) or "YES")  # noqa: ARG005
+
+    la.handle_screenshot_event(user_id="u", lesson_id=1, step_order=1, base64_image="f1")
+    out = la.handle_screenshot_event(user_id="u", lesson_id=1, step_order=1, base64_image="f2")
+
+    assert out == {"completed": True, "next_step_order": 2, "popup_sent": True}
+    assert popups == ["D1", "D2"]
+
+    # The next frame for step 2 is checked right away instead of sending the popup
+    out = la.handle_screenshot_event(user_id="u", lesson_id=1, step_order=2, base64_image="f3")
+    assert out["lesson_completed"] is True
+    assert checked == ["C1", "C2"]
+    assert la.step_payloads.builds == 1
+    assert progress_events == [("u", 1, 2, False), ("u", 1, 2, True)]
+
+
+def test_handle_screenshot_event_defers_checks_before_typical_completion(monkeypatch):
+    steps = {1: {"name": "S1", "description": "D1", "finish_criteria": "C1"}}
+    monkeypatch.setattr(la.db_context, "get_lesson_steps_batch", lambda lesson_id: steps)  # noqa: ARG005
+    monkeypatch.setattr(la, "generate_and_send_popup_message", lambda img, desc, user_id=None: "Popup")  # noqa: ARG005
+    calls = []
+    monkeypatch.setattr(la, "analyze_screenshot", lambda img, crit, lesson_id=None, payload=None: calls.append(img) or "NO")  # noqa: ARG005
+    # This step usually takes about two minutes
+    for seconds in (110, 115, 120, 125, 130):
+        la.check_cadence.record(1, 1, seconds)
+
+    la.handle_screenshot_event(user_id="u", lesson_id=1, step_order=1, base64_image="f0")  # popup
+    first = la.handle_screenshot_event(user_id="u", lesson_id=1, step_order=1, base64_image="f1")
+    second = la.handle_screenshot_event(user_id="u", lesson_id=1, step_order=1, base64_image="f2")
+
+    assert "deferred" not in first
+    assert second["deferred"] is True
+    assert calls == ["f1"]
+
+
+def test_handle_screenshot_event_records_time_to_complete(monkeypatch):
+    steps = {1: {"name": "S1", "description": "D1", "finish_criteria": "C1"}}
+    monkeypatch.setattr(la.db_context, "get_lesson_steps_batch", lambda lesson_id: steps)  # noqa: ARG005
+    monkeypatch.setattr(la, "generate_and_send_popup_message", lambda img, desc, user_id=None: "Popup")  # noqa: ARG005
+    monkeypatch.setattr(la, "analyze_screenshot", lambda img, crit, lesson_id=None, payload=None: "YES")  # noqa: ARG005
+
+    la.handle_screenshot_event(user_id="u", lesson_id=1, step_order=1, base64_image="f0")
+    la.handle_screenshot_event(user_id="u", lesson_id=1, step_order=1, base64_image="f1")
+
+    assert la.check_cadence.stats()["recorded"] == 1
+
+
 def test_execute_learning_flow_completes_lesson(monkeypatch, no_sleep):
     # Arrange two steps where completion is immediately YES
     steps = {
@@ -190,7 +379,7 @@ def test_execute_learning_flow_completes_lesson(monkeypatch, no_sleep):
     }
     monkeypatch.setattr(la.db_context, "get_lesson_steps_batch", lambda lesson_id: steps)  # noqa: ARG005
     monkeypatch.setattr(la, "generate_and_send_popup_message", lambda img, desc, user_id=None: "Popup")  # noqa: ARG005
-    monkeypatch.setattr(la, "analyze_screenshot", lambda img, crit, lesson_id=None: "YES")  # noqa: ARG005
+    monkeypatch.setattr(la, "analyze_screenshot", lambda img, crit, lesson_id=None, payload=None: "YES")  # noqa: ARG005
 
     # Act
     result = la.execute_learning_flow(lesson_id=1, step_order=1, base64_image="img", user_id=None)
@@ -199,6 +388,27 @@ def test_execute_learning_flow_completes_lesson(monkeypatch, no_sleep):
     assert result["status"] == "lesson_completed"
 
 
+def test_start_learning_flow_runs_on_scheduler(monkeypatch):
+    steps = {
+        1: {"name": "S1", "description": "D1", "finish_criteria": "C1"},
+        2: {"name": "S2", "description": "D2", "finish_criteria": "C2"},
+    }
+    monkeypatch.setattr(la.db_context, "get_lesson_steps_batch", lambda lesson_id: steps)  # noqa: ARG005
+    monkeypatch.setattr(la, "generate_and_send_popup_message", lambda img, desc, user_id=None: "Popup")  # noqa: ARG005
+    verdicts = iter(["NO", "YES", "YES"])
+    monkeypatch.setattr(la, "analyze_screenshot", lambda img, crit, lesson_id=None, payload=None: next(verdicts))  # noqa: ARG005
+    monkeypatch.setattr(la, "FLOW_CHECK_INTERVAL", 0.01)
+    results = []
+    done = threading.Event()
+
+    flow_id = la.start_learning_flow(1, 1, lambda: "img", user_id="u", on_complete=lambda r: (results.append(r), done.set()))
+
+    assert flow_id is not None
+    assert done.wait(2)
+    assert results[0]["status"] == "lesson_completed"
+    assert la.user_state["u"]["step_order"] == 2
+
+
 def test_handle_screenshot_event_missing_step_returns_error(monkeypatch):
     # No steps for the lesson
     monkeypatch.setattr(la.db_context, "get_lesson_steps_batch", lambda lesson_id: {})  # noqa: ARG005
@@ -207,3 +417,114 @@ def test_handle_screenshot_event_missing_step_returns_error(monkeypatch):
     assert "error" in out
 
 
+def test_handle_screenshot_event_reuses_verdict_for_unchanged_frame(monkeypatch):
+    lesson_data = {
+        1: {"name": "S1", "description": "Do A", "finish_criteria": "Crit"},
+    }
+    monkeypatch.setattr(la.db_context, "get_lesson_steps_batch", lambda lesson_id: lesson_data)  # noqa: ARG005
+    monkeypatch.setattr(la, "generate_and_send_popup_message", lambda img, desc, user_id=None: "Popup")  # noqa: ARG005
+    calls = {"count": 0}
+
+    def fake_analyze(img, crit, lesson_id=None, payload=None):  # noqa: ARG001
+        calls["count"] += 1
+        return "NO"
+
+    monkeypatch.setattr(la, "analyze_screenshot", fake_analyze)
+
+    la.handle_screenshot_event(user_id="u", lesson_id=1, step_order=1, base64_image="frame")  # popup
+    out1 = la.handle_screenshot_event(user_id="u", lesson_id=1, step_order=1, base64_image="frame")
+    out2 = la.handle_screenshot_event(user_id="u", lesson_id=1, step_order=1, base64_image="frame")
+    out3 = la.handle_screenshot_event(user_id="u", lesson_id=1, step_order=1, base64_image="other")
+
+    assert out1["completed"] is out2["completed"] is out3["completed"] is False
+    assert calls["count"] == 2  # identical frame reused the first verdict
+
+
+def test_crop_no_is_not_replayed_for_unchanged_frames(monkeypatch):
+    Image = pytest.importorskip("PIL.Image")
+
+    def frame(edited):
+        img = Image.new("RGB", (1280, 720), (245, 245, 245))
+        img.paste((30, 30, 30), (0, 0, 200, 720))
+        if edited:
+            img.paste((0, 120, 255), (600, 300, 680, 340))
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+        return buf.getvalue()
+
+    steps = {1: {"name": "S1", "description": "D1", "finish_criteria": "Panel and button both visible"}}
+    monkeypatch.setattr(la.db_context, "get_lesson_steps_batch", lambda lesson_id: steps)  # noqa: ARG005
+    monkeypatch.setattr(la, "generate_and_send_popup_message", lambda img, desc, user_id=None: "Popup")  # noqa: ARG005
+    seen = []
+
+    def fake_analyze(img, crit, lesson_id=None, payload=None):  # noqa: ARG001
+        size = Image.open(io.BytesIO(img)).size
+        seen.append(size)
+        # The criteria span the whole screen, so only a full frame can answer YES
+        return "YES" if size == (1280, 720) and len(seen) > 2 else "NO"
+
+    monkeypatch.setattr(la, "analyze_screenshot", fake_analyze)
+    before, after = frame(False), frame(True)
+
+    la.handle_screenshot_event(user_id="u", lesson_id=1, step_order=1, base64_image=before)  # popup
+    assert la.handle_screenshot_event(user_id="u", lesson_id=1, step_order=1, base64_image=before)["completed"] is False
+    cropped = la.handle_screenshot_event(user_id="u", lesson_id=1, step_order=1, base64_image=after)
+    assert cropped["completed"] is False
+    assert seen[-1] != (1280, 720)
+
+    # The same frame again is re-checked whole instead of reusing the crop's NO
+    out = la.handle_screenshot_event(user_id="u", lesson_id=1, step_order=1, base64_image=after)
+
+    assert "deduplicated" not in out
+    assert out["lesson_completed"] is True
+    assert seen[-1] == (1280, 720)
+
+
+def test_verdict_cache_does_not_share_yes_across_screens_that_differ_slightly(monkeypatch):
+    Image = pytest.importorskip("PIL.Image")
+    from PIL import ImageDraw
+
+    def screen(with_label):
+        img = Image.new("RGB", (1440, 900), (245, 245, 245))
+        img.paste((30, 30, 30), (0, 0, 240, 900))
+        if with_label:
+            ImageDraw.Draw(img).text((20, 60), "Frame 1", fill=(230, 230, 230))
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+        return buf.getvalue()
+
+    answers = iter(["YES", "NO"])
+    calls = []
+
+    def fake_create(agent_id, messages):  # noqa: ARG001
+        calls.append(1)
+        return types.SimpleNamespace(messages=[types.SimpleNamespace(content=next(answers))])
+
+    monkeypatch.setattr(la.client.agents.messages, "create", fake_create)
+    monkeypatch.setattr(la.db_context, "get_relevant_context", lambda t, i: "")  # noqa: ARG005
+
+    # User A's screen shows the new layer; user B's does not
+    assert la.check_completion(screen(True), "A layer named Frame 1 exists", "1").decision == "YES"
+    verdict = la.check_completion(screen(False), "A layer named Frame 1 exists", "1")
+
+    assert verdict.decision == "NO"
+    assert verdict.source != "cache"
+    assert len(calls) == 2
+
+
+def test_analyze_screenshot_caches_verdict_by_image_and_criteria(monkeypatch):
+    calls = {"count": 0}
+
+    def fake_create(agent_id, messages):  # noqa: ARG001
+        calls["count"] += 1
+        return types.SimpleNamespace(messages=[types.SimpleNamespace(content="NO")])
+
+    monkeypatch.setattr(la.client.agents.messages, "create", fake_create)
+    monkeypatch.setattr(la.db_context, "get_relevant_context", lambda t, i: "")  # noqa: ARG005
+
+    assert la.analyze_screenshot("same-frame", "Click  next", "1") == "NO"
+    assert la.analyze_screenshot("same-frame", "click next", "1") == "NO"  # normalized criteria
+    assert la.analyze_screenshot("same-frame", "Open the menu", "1") == "NO"
+
+    assert calls["count"] == 2
+    assert la.verdict_cache.stats()["hits"] == 1
@@ -0,0 +1,95 @@
+import os
+import sys
+import threading
+
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.dirname(CURRENT_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from utils import lesson_cache as lc  # noqa: E402
+from utils.lesson_cache import LessonCache  # noqa: E402
+
+STEPS = {1: {"name": "S1", "description": "D1", "finish_criteria": "C1"}}
+
+
+def test_get_or_load_caches_and_counts():
+    cache = LessonCache(max_lessons=4, ttl=60)
+    calls = []
+
+    def loader(lesson_id):
+        calls.append(lesson_id)
+        return STEPS
+
+    assert cache.get_or_load(1, loader) == STEPS
+    assert cache.get_or_load(1, loader) == STEPS
+    assert calls == [1]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_empty_results_are_not_cached():
+    cache = LessonCache()
+    cache.get_or_load(7, lambda lesson_id: {})
+    assert 7 not in cache
+
+
+def test_lru_bound_evicts_least_recent():
+    cache = LessonCache(max_lessons=2, ttl=60)
+    cache.put(1, STEPS)
+    cache.put(2, STEPS)
+    cache.get(1)
+    cache.put(3, STEPS)
+
+    assert 1 in cache and 3 in cache
+    assert 2 not in cache
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(lc.time, "monotonic", lambda: now[0])
+    cache = LessonCache(ttl=10)
+    cache.put(1, STEPS)
+    now[0] += 11
+
+    assert cache.get(1) is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_invalidate_drops_entry_and_notifies():
+    cache = LessonCache()
+    seen = []
+    cache.add_listener(seen.append)
+    cache.put(1, STEPS)
+    before = cache.version(1)
+
+    cache.invalidate(1)
+    cache.invalidate_all()
+
+    assert 1 not in cache
+    assert cache.version(1) != before
+    assert seen == [1, None]
+
+
+def test_load_racing_an_invalidation_is_not_cached():
+    cache = LessonCache()
+    loading = threading.Event()
+    release = threading.Event()
+
+    def slow_loader(lesson_id):
+        loading.set()
+        release.wait(2)
+        return {1: {"name": "old", "description": "", "finish_criteria": ""}}
+
+    result = {}
+    t = threading.Thread(target=lambda: result.setdefault("steps", cache.get_or_load(1, slow_loader)))
+    t.start()
+    assert loading.wait(2)
+    cache.invalidate(1)
+    release.set()
+    t.join()
+
+    assert result["steps"][1]["name"] == "old"
+    assert 1 not in cache
@@ -0,0 +1,96 @@
+import io
+import os
+import sys
+
+import pytest
+
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.dirname(CURRENT_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from utils.local_verifier import (  # noqa: E402
+    BlankScreenVerifier,
+    LocalVerdict,
+    LocalVerifier,
+    LocalVerifierChain,
+    OcrTextVerifier,
+    extract_expected_text,
+)
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _png(color=(30, 30, 30), box=None):
+    img = Image.new("RGB", (640, 360), color)
+    if box:
+        img.paste((250, 250, 250), box)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def test_extract_expected_text():
+    assert extract_expected_text("A new frame named Frame 1 appears on the canvas") == ["Frame 1"]
+    assert extract_expected_text(
+        "A new prototype appears in the Prototype tab, with a 'Create Prototype' button"
+    ) == ["Create Prototype", "Prototype"]
+    assert extract_expected_text("Rulers appear on the top and left side of the canvas") == []
+
+
+def test_blank_screen_is_a_confident_no():
+    verifier = BlankScreenVerifier()
+    assert verifier.verify(_png(), "anything").decision == "NO"
+    assert verifier.verify(_png(box=(100, 100, 300, 200)), "anything").decision is None
+
+
+def test_ocr_verifier_only_trusts_positive_matches():
+    verifier = OcrTextVerifier(ocr=lambda img: "Layers\nFrame 1\nPages")
+    assert verifier.verify(_png(), "A new frame named Frame 1 appears").decision == "YES"
+    assert verifier.verify(_png(), "A new frame named Frame 2 appears").decision is None
+    assert verifier.verify(_png(), "Rulers appear on the canvas").decision is None
+
+
+def test_ocr_verifier_uses_precomputed_expected_text():
+    verifier = OcrTextVerifier(ocr=lambda img: "Layers\nFrame 1\nPages")
+    # The step payload's expected text wins over re-parsing the criteria
+    assert verifier.verify(_png(), "Rulers appear on the canvas", expected_text=("Frame 1",)).decision == "YES"
+    assert verifier.verify(_png(), "A new frame named Frame 1 appears", expected_text=()).decision is None
+
+
+def test_chain_returns_first_confident_verdict_and_records_stats():
+    class Unsure(LocalVerifier):
+        name = "unsure"
+
+        def verify(self, image, finish_criteria, expected_text=None):
+            return LocalVerdict("YES", 0.5, self.name)
+
+    class Sure(LocalVerifier):
+        name = "sure"
+
+        def verify(self, image, finish_criteria, expected_text=None):
+            return LocalVerdict("YES", 0.99, self.name)
+
+    chain = LocalVerifierChain([Unsure()], min_confidence=0.8)
+    assert chain.verify(b"frame", "crit") is None
+
+    chain.register(Sure())
+    verdict = chain.verify(b"frame", "crit")
+    assert (verdict.decision, verdict.verifier) == ("YES", "sure")
+    assert chain.stats()["unsure"]["calls"] == 2
+    assert chain.stats()["sure"]["decided"] == 1
+
+
+def test_evaluate_keeps_weaker_verdict_for_fallback():
+    class Weak(LocalVerifier):
+        name = "weak"
+
+        def verify(self, image, finish_criteria, expected_text=None):
+            return LocalVerdict("NO", 0.6, self.name)
+
+    chain = LocalVerifierChain([Weak()], min_confidence=0.8)
+    confident, fallback = chain.evaluate(b"frame", "crit", fallback_confidence=0.5)
+    assert confident is None
+    assert (fallback.decision, fallback.verifier) == ("NO", "weak")
+    assert chain.evaluate(b"frame", "crit", fallback_confidence=0.7) == (None, None)
@@ -0,0 +1,73 @@
+import os
+import sys
+
+import pytest
+
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.dirname(CURRENT_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from utils.popup_bus import LocalPubSub, PopupBus, PubSubTransport  # noqa: E402
+
+
+class _Recorder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, event, data, room=None):
+        self.calls.append((event, data, room))
+
+
+def test_unbound_bus_reports_failure():
+    bus = PopupBus()
+    assert bus.bound is False
+    assert bus.publish("popup_message", {"message": "hi"}, room="u1") is False
+
+
+def test_bound_bus_emits_in_process():
+    bus = PopupBus()
+    emit = _Recorder()
+    bus.bind(emit)
+
+    assert bus.publish("popup_message", {"message": "hi"}, room="u1") is True
+    assert bus.publish("popup_message", {"message": "all"}) is True
+    assert emit.calls == [
+        ("popup_message", {"message": "hi"}, "u1"),
+        ("popup_message", {"message": "all"}, None),
+    ]
+    assert bus.delivered == 2
+
+
+def test_transport_fans_out_to_every_worker():
+    broker = LocalPubSub()
+    worker_a, worker_b = PopupBus(broker), PopupBus(broker)
+    emit_a, emit_b = _Recorder(), _Recorder()
+    worker_a.bind(emit_a)
+    worker_b.bind(emit_b)
+
+    assert worker_a.publish("popup_message", {"message": "hi"}, room="u1") is True
+
+    # The user may be connected to either worker, so both emit to their own clients
+    assert emit_a.calls == [("popup_message", {"message": "hi"}, "u1")]
+    assert emit_b.calls == [("popup_message", {"message": "hi"}, "u1")]
+
+
+def test_emit_failure_is_contained():
+    bus = PopupBus()
+
+    def broken_emit(event, data, room=None):  # noqa: ARG001
+        raise RuntimeError("socket gone")
+
+    bus.bind(broken_emit)
+    assert bus.publish("popup_message", {"message": "hi"}, room="u1") is False
+
+
+def test_incomplete_transport_fails_at_creation():
+    class PublishOnly(PubSubTransport):
+        def publish(self, channel, message):
+            pass
+
+    with pytest.raises(TypeError):
+        PublishOnly()
@@ -0,0 +1,127 @@
+import asyncio
+import json
+import os
+import sys
+
+import httpx
+import pytest
+
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.dirname(CURRENT_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from utils.database_context import DatabaseContextProvider  # noqa: E402
+from utils.postgrest_pool import PostgrestError, PostgrestPool  # noqa: E402
+
+ROWS = {
+    "step": [
+        {"lesson_id": 7, "step_order": 2, "name": "Two", "description": "D2", "finish_criteria": None},
+        {"lesson_id": 7, "step_order": 1, "name": "One", "description": "D1", "finish_criteria": "C1"},
+        {"lesson_id": 8, "step_order": 1, "name": "Other", "description": "D", "finish_criteria": "C"},
+    ],
+    "lesson": [{"id": 7, "lesson_order": 3}],
+}
+
+
+def _postgrest_handler(seen):
+    """Minimal PostgREST: eq filters, order and limit over ROWS."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        if request.method == "POST":
+            # Upserts with return=minimal
+            return httpx.Response(201)
+        table = request.url.path.rsplit("/", 1)[-1]
+        if table not in ROWS:
+            return httpx.Response(404, json={"message": "relation does not exist"})
+        rows = list(ROWS[table])
+        for column, value in request.url.params.multi_items():
+            if value.startswith("eq."):
+                rows = [r for r in rows if str(r.get(column)) == value[3:]]
+        if "order" in request.url.params:
+            column = request.url.params["order"].split(".")[0]
+            rows.sort(key=lambda r: r[column])
+        if "limit" in request.url.params:
+            rows = rows[: int(request.url.params["limit"])]
+        return httpx.Response(200, json=rows)
+
+    return handler
+
+
+@pytest.fixture
+def pool():
+    seen = []
+    pool = PostgrestPool("http://db.local", "anon", transport=httpx.MockTransport(_postgrest_handler(seen)))
+    pool.seen = seen
+    yield pool
+    pool.close()
+
+
+def test_sync_facade_builds_postgrest_request(pool):
+    result = pool.table("step").select("step_order,name").eq("lesson_id", 7).order("step_order").execute()
+
+    assert [row["step_order"] for row in result.data] == [1, 2]
+    request = pool.seen[0]
+    assert request.url.path == "/rest/v1/step"
+    assert request.url.params["lesson_id"] == "eq.7"
+    assert request.url.params["order"] == "step_order.asc"
+    assert request.headers["apikey"] == "anon"
+    assert request.headers["authorization"] == "Bearer anon"
+
+
+def test_upsert_posts_rows_with_merge_duplicates(pool):
+    rows = [{"user_id": "u1", "lesson_id": 7, "step_order": 2}]
+
+    result = pool.table("user_progress").upsert(rows, on_conflict="user_id,lesson_id").execute()
+
+    assert result.data == []
+    request = pool.seen[0]
+    assert request.method == "POST"
+    assert request.url.path == "/rest/v1/user_progress"
+    assert request.url.params["on_conflict"] == "user_id,lesson_id"
+    assert request.headers["prefer"] == "resolution=merge-duplicates,return=minimal"
+    assert json.loads(request.content) == rows
+
+
+def test_async_execute_from_another_loop_shares_the_pool(pool):
+    async def lookups():
+        queries = [pool.table("lesson").select("id").eq("lesson_order", 3).limit(1) for _ in range(5)]
+        return await asyncio.gather(*(query.execute_async() for query in queries))
+
+    results = asyncio.run(lookups())
+
+    assert [result.data for result in results] == [[{"id": 7, "lesson_order": 3}]] * 5
+    assert pool.stats()["requests"] == 5
+
+
+def test_error_status_raises(pool):
+    with pytest.raises(PostgrestError) as info:
+        pool.table("missing").select("*").execute()
+    assert info.value.status_code == 404
+    assert pool.stats()["errors"] == 1
+
+
+def test_provider_reads_through_pool_sync_and_async(monkeypatch, pool):
+    monkeypatch.setattr("utils.database_context.create_client", lambda url, key, options=None: pool)
+    monkeypatch.setenv("SUPABASE_URL", "http://db.local")
+    monkeypatch.setenv("SUPABASE_KEY", "anon")
+    ctx = DatabaseContextProvider()
+
+    expected = {
+        1: {"name": "One", "description": "D1", "finish_criteria": "C1"},
+        2: {"name": "Two", "description": "D2", "finish_criteria": "Step 2 completion criteria"},
+    }
+    assert ctx.get_lesson_steps_batch(7) == expected
+    assert asyncio.run(ctx.get_lesson_steps_batch_async(7)) == expected
+    assert asyncio.run(ctx.get_lesson_id_by_order_async(3)) == 7
+
+
+def test_create_client_defaults_to_pool(monkeypatch):
+    from utils import database_context
+
+    monkeypatch.setattr(database_context, "DB_HTTP_POOL", True)
+    client = database_context.create_client("http://db.local", "anon")
+    assert isinstance(client, PostgrestPool)
+    client.close()
@@ -0,0 +1,258 @@
+import os
+import sys
+import threading
+
+import pytest
+
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.dirname(CURRENT_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from utils.database_context import DatabaseContextProvider  # noqa: E402
+from utils.postgrest_pool import PostgrestError  # noqa: E402
+from utils.progress_journal import ProgressJournal, ProgressRejected, coalesce_events  # noqa: E402
+
+
+class _Writer:
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+        self.reject = False
+        self.flushed = threading.Event()
+
+    def __call__(self, rows):
+        if self.reject:
+            raise ProgressRejected("relation user_progress does not exist")
+        if self.fail:
+            raise RuntimeError("database unavailable")
+        self.batches.append(rows)
+        self.flushed.set()
+
+
+@pytest.fixture
+def writer():
+    return _Writer()
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+    return str(tmp_path / "progress_journal.db")
+
+
+def test_coalesce_keeps_latest_step_per_user_and_lesson():
+    rows = coalesce_events([
+        ("u1", 1, 2, 0, 0.0),
+        ("u2", 1, 5, 0, 1.0),
+        ("u1", 1, 3, 0, 2.0),
+        ("u1", 2, 1, 1, 3.0),
+    ])
+
+    assert [(r["user_id"], r["lesson_id"], r["step_order"], r["completed"]) for r in rows] == [
+        ("u1", 1, 3, False),
+        ("u2", 1, 5, False),
+        ("u1", 2, 1, True),
+    ]
+    assert rows[0]["updated_at"] == "1970-01-01T00:00:02+00:00"
+
+
+def test_record_does_not_write_until_flush(writer, journal_path):
+    journal = ProgressJournal(writer, journal_path, background=False)
+
+    journal.record("u1", 1, 2)
+    journal.record("u1", 1, 3)
+
+    assert writer.batches == []
+    assert journal.pending() == 2
+    assert journal.flush() == 1
+    assert [row["step_order"] for row in writer.batches[0]] == [3]
+    assert journal.pending() == 0
+    assert journal.flush() == 0
+
+
+def test_failed_flush_keeps_events(writer, journal_path):
+    journal = ProgressJournal(writer, journal_path, background=False)
+    journal.record("u1", 1, 2)
+    writer.fail = True
+
+    assert journal.flush() == 0
+    assert journal.pending() == 1
+    assert journal.stats()["failures"] == 1
+
+    writer.fail = False
+    assert journal.flush() == 1
+    assert journal.pending() == 0
+
+
+def test_rejected_batch_is_dropped_not_retried(writer, journal_path):
+    journal = ProgressJournal(writer, journal_path, background=False)
+    journal.record("u1", 1, 2)
+    journal.record("u2", 1, 3)
+    writer.reject = True
+
+    assert journal.flush() == 0
+    assert journal.pending() == 0
+    assert journal.stats()["rejected"] == 2
+    assert journal.stats()["failures"] == 0
+
+
+def test_journal_compacts_then_drops_oldest_past_max_events(writer, journal_path):
+    journal = ProgressJournal(writer, journal_path, max_events=10, background=False)
+
+    # Superseded events for one user and lesson are compacted away
+    for step in range(1, 13):
+        journal.record("u1", 1, step)
+    assert journal.pending() <= 10
+    assert journal.stats()["dropped"] == 0
+
+    # Distinct users cannot be compacted, so the oldest are dropped
+    for user in range(20):
+        journal.record(f"u{user}", 2, 1)
+    assert journal.pending() <= 10
+    assert journal.stats()["dropped"] > 0
+
+    journal.flush()
+    users = {row["user_id"] for row in writer.batches[0] if row["lesson_id"] == 2}
+    assert "u19" in users
+    assert "u0" not in users
+
+
+def test_events_survive_a_crash(writer, journal_path):
+    crashed = ProgressJournal(writer, journal_path, background=False)
+    crashed.record("u1", 1, 4)
+    crashed.record("u2", 3, 1, completed=True)
+    # No close(): the process died before flushing
+
+    recovered = ProgressJournal(writer, journal_path, background=False)
+
+    assert recovered.recovered == 2
+    assert recovered.flush() == 2
+    assert {(row["user_id"], row["step_order"], row["completed"]) for row in writer.batches[0]} == {
+        ("u1", 4, False),
+        ("u2", 1, True),
+    }
+
+
+def test_background_flush_on_size_trigger(writer, journal_path):
+    journal = ProgressJournal(writer, journal_path, flush_rows=3, flush_seconds=60)
+
+    for step in range(1, 4):
+        journal.record("u1", 1, step)
+
+    assert writer.flushed.wait(5)
+    assert writer.batches[0][0]["step_order"] == 3
+    journal.close()
+
+
+def test_background_flush_on_time_trigger(writer, journal_path):
+    journal = ProgressJournal(writer, journal_path, flush_rows=100, flush_seconds=0.05)
+
+    journal.record("u1", 1, 2)
+
+    assert writer.flushed.wait(5)
+    journal.close()
+    assert journal.pending() == 0
+
+
+def test_reopened_journal_flushes_recovered_events_in_background(writer, journal_path):
+    ProgressJournal(writer, journal_path, background=False).record("u1", 1, 2)
+
+    journal = ProgressJournal(writer, journal_path, flush_seconds=60)
+
+    assert writer.flushed.wait(5)
+    journal.close()
+
+
+def test_close_flushes_pending_events(writer, journal_path):
+    journal = ProgressJournal(writer, journal_path, flush_seconds=60)
+    journal.record("u1", 1, 2)
+
+    journal.close()
+    journal.close()
+
+    assert len(writer.batches) == 1
+    assert journal.pending() == 0
+
+
+class _UpsertStub:
+    def __init__(self, error=None):
+        self.calls = []
+        self.error = error
+
+    def table(self, name):
+        self.name = name
+        return self
+
+    def upsert(self, rows, on_conflict=None):
+        self.calls.append((self.name, rows, on_conflict))
+        return self
+
+    def execute(self):
+        if self.error is not None:
+            raise self.error
+        return None
+
+
+def _provider(monkeypatch, stub):
+    monkeypatch.setenv("SUPABASE_URL", "http://db.local")
+    monkeypatch.setenv("SUPABASE_KEY", "anon")
+    monkeypatch.setattr("utils.database_context.create_client", lambda url, key, options=None: stub)
+    monkeypatch.setattr("utils.database_context.CATALOG_SNAPSHOT_ENABLED", False)
+    return DatabaseContextProvider()
+
+
+def test_provider_journals_progress_and_upserts_in_batches(monkeypatch, journal_path):
+    stub = _UpsertStub()
+    ctx = _provider(monkeypatch, stub)
+    ctx._progress_journal = ProgressJournal(ctx.upsert_progress_rows, journal_path, background=False)
+    monkeypatch.setattr("utils.database_context.PROGRESS_JOURNAL_ENABLED", True)
+
+    assert ctx.update_user_progress("u1", 1, 2) is True
+    assert ctx.update_user_progress("u1", 1, 3) is True
+    assert stub.calls == []
+
+    ctx.close_connection()
+
+    [(table, rows, on_conflict)] = stub.calls
+    assert table == "user_progress"
+    assert on_conflict == "user_id,lesson_id"
+    assert [(row["user_id"], row["step_order"]) for row in rows] == [("u1", 3)]
+
+
+def test_missing_progress_table_stops_recording(monkeypatch, journal_path):
+    stub = _UpsertStub(PostgrestError(404, '{"code":"42P01","message":"relation user_progress does not exist"}'))
+    ctx = _provider(monkeypatch, stub)
+    journal = ctx._progress_journal = ProgressJournal(ctx.upsert_progress_rows, journal_path, background=False)
+    monkeypatch.setattr("utils.database_context.PROGRESS_JOURNAL_ENABLED", True)
+
+    assert ctx.update_user_progress("u1", 1, 2) is True
+    assert journal.flush() == 0
+    assert journal.pending() == 0
+    assert ctx.progress_rejected is not None
+
+    # Nothing more is journaled or sent once the table is known to be missing
+    assert ctx.update_user_progress("u1", 1, 3) is False
+    assert journal.pending() == 0
+    assert len(stub.calls) == 1
+
+
+def test_transient_progress_errors_are_retried(monkeypatch, journal_path):
+    stub = _UpsertStub(PostgrestError(503, "upstream unavailable"))
+    ctx = _provider(monkeypatch, stub)
+    journal = ctx._progress_journal = ProgressJournal(ctx.upsert_progress_rows, journal_path, background=False)
+    monkeypatch.setattr("utils.database_context.PROGRESS_JOURNAL_ENABLED", True)
+    ctx.update_user_progress("u1", 1, 2)
+
+    assert journal.flush() == 0
+    assert journal.pending() == 1
+    assert ctx.progress_rejected is None
+
+
+def test_other_rejected_batches_keep_recording(monkeypatch):
+    stub = _UpsertStub(PostgrestError(409, '{"code":"23503","message":"violates foreign key constraint"}'))
+    ctx = _provider(monkeypatch, stub)
+
+    with pytest.raises(ProgressRejected):
+        ctx.upsert_progress_rows([{"user_id": "u1", "lesson_id": 99, "step_order": 1, "completed": False}])
+    assert ctx.progress_rejected is None
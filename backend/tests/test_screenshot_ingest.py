@@ -0,0 +1,99 @@
+import base64
+import io
+import os
+import sys
+
+import pytest
+from flask import Flask
+from werkzeug.exceptions import RequestEntityTooLarge
+
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.dirname(CURRENT_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from utils.screenshot_ingest import (  # noqa: E402
+    parse_bool,
+    read_screenshot_request,
+    read_stream_into_buffer,
+    to_base64,
+)
+
+
+app = Flask(__name__)
+FRAME = bytes(range(256)) * 40
+
+
+def test_read_stream_into_buffer_known_and_unknown_length():
+    assert read_stream_into_buffer(io.BytesIO(FRAME), len(FRAME)) == FRAME
+    assert read_stream_into_buffer(io.BytesIO(FRAME), None, chunk_size=1000) == FRAME
+    # Short body: buffer is trimmed to what actually arrived
+    assert read_stream_into_buffer(io.BytesIO(FRAME[:10]), 50) == FRAME[:10]
+
+
+def test_read_stream_into_buffer_rejects_oversized_bodies():
+    class NeverRead(io.BytesIO):
+        def readinto(self, b):
+            raise AssertionError("body read despite an oversized content length")
+
+    # A claimed length over the limit is refused before the buffer is allocated
+    with pytest.raises(RequestEntityTooLarge):
+        read_stream_into_buffer(NeverRead(), 2**40, max_bytes=len(FRAME))
+    with pytest.raises(RequestEntityTooLarge):
+        read_stream_into_buffer(io.BytesIO(FRAME), None, chunk_size=1000, max_bytes=len(FRAME) - 1)
+    assert read_stream_into_buffer(io.BytesIO(FRAME), len(FRAME), max_bytes=len(FRAME)) == FRAME
+
+
+def test_read_screenshot_request_honours_max_content_length():
+    limited = Flask(__name__)
+    limited.config["MAX_CONTENT_LENGTH"] = len(FRAME) - 1
+    with limited.test_request_context("/screenshot", method="POST", data=FRAME, content_type="image/png"):
+        from flask import request
+
+        with pytest.raises(RequestEntityTooLarge):
+            read_screenshot_request(request)
+
+
+def test_read_screenshot_request_json():
+    encoded = base64.b64encode(FRAME).decode("ascii")
+    with app.test_request_context("/screenshot", method="POST", json={"image": encoded, "user_id": "u"}):
+        from flask import request
+
+        image, fields = read_screenshot_request(request)
+    assert image == encoded
+    assert fields == {"user_id": "u"}
+
+
+def test_read_screenshot_request_raw_body():
+    with app.test_request_context(
+        "/screenshot?user_id=u&lesson_id=3&stateless=1",
+        method="POST",
+        data=FRAME,
+        content_type="image/png",
+    ):
+        from flask import request
+
+        image, fields = read_screenshot_request(request)
+    assert bytes(image) == FRAME
+    assert fields == {"user_id": "u", "lesson_id": "3", "stateless": "1"}
+    assert parse_bool(fields["stateless"]) is True
+
+
+def test_read_screenshot_request_multipart():
+    with app.test_request_context(
+        "/screenshot",
+        method="POST",
+        data={"image": (io.BytesIO(FRAME), "frame.png"), "step_order": "2"},
+        content_type="multipart/form-data",
+    ):
+        from flask import request
+
+        image, fields = read_screenshot_request(request)
+    assert bytes(image) == FRAME
+    assert fields == {"step_order": "2"}
+
+
+def test_to_base64_passes_strings_through():
+    assert to_base64("abc") == "abc"
+    assert base64.b64decode(to_base64(bytearray(FRAME))) == FRAME
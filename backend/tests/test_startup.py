@@ -0,0 +1,22 @@
+import os
+import sys
+
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.dirname(CURRENT_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "scripts"))
+
+from bench_startup import measure  # noqa: E402
+
+# Generous ceiling so slow CI machines pass; regressions (eager heavy imports) blow well past it
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "3000"))
+
+
+def test_cold_start_is_lazy_and_fast():
+    summary = measure(runs=1)
+    print(f"startup: {summary}")
+
+    assert summary["health_status"] == 200
+    assert summary["heavy_modules_loaded"] == []
+    assert summary["db_context_initialized"] is False
+    assert summary["first_health_ms_p50"] < STARTUP_BUDGET_MS
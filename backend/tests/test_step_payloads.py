@@ -0,0 +1,55 @@
+import os
+import sys
+
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.dirname(CURRENT_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from utils.step_payloads import StepPayloadCache, build_step_payloads  # noqa: E402
+from utils.verdict_cache import criteria_hash  # noqa: E402
+
+STEPS = {
+    1: {"name": "Open", "description": "  Open the menu  ", "finish_criteria": 'The "Settings" page is open'},
+    2: {"name": "Save", "description": "Click save", "finish_criteria": "A chart is shown"},
+}
+
+
+def test_build_step_payloads_precomputes_each_step():
+    payloads = build_step_payloads(STEPS)
+
+    first, second = payloads[1], payloads[2]
+    assert first.popup_message == "Open the menu"
+    assert first.criteria_key == criteria_hash(STEPS[1]["finish_criteria"])
+    assert "settings" in [text.lower() for text in first.expected_text]
+    assert first.next_step_order == 2
+    assert second.next_step_order is None
+
+
+def test_cache_reuses_payloads_until_steps_object_changes():
+    cache = StepPayloadCache(max_lessons=4)
+
+    first = cache.get(1, STEPS)
+    assert cache.get(1, STEPS) is first
+    assert cache.builds == 1
+
+    # A reload from the lesson cache hands out a new dict
+    rebuilt = cache.get(1, dict(STEPS))
+    assert rebuilt is not first
+    assert cache.builds == 2
+
+
+def test_cache_is_bounded_and_forgets():
+    cache = StepPayloadCache(max_lessons=2)
+    for lesson_id in (1, 2, 3):
+        cache.get(lesson_id, STEPS)
+    cache.get(1, STEPS)
+    assert cache.builds == 4  # lesson 1 was evicted
+
+    cache.forget(1)
+    cache.get(1, STEPS)
+    assert cache.builds == 5
+
+    cache.clear()
+    assert cache.builds == 0
@@ -0,0 +1,79 @@
+import io
+import os
+import sys
+
+import pytest
+
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.dirname(CURRENT_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from utils.tile_diff import TileChangeDetector  # noqa: E402
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _frame(boxes=()):
+    img = Image.new("RGB", (1600, 900), (240, 240, 240))
+    for box in boxes:
+        img.paste((20, 20, 20), box)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _detector(**kwargs):
+    params = {"cols": 16, "rows": 9, "threshold": 6, "max_area": 0.4, "context_tiles": 1, "full_frame_every": 5}
+    params.update(kwargs)
+    return TileChangeDetector(**params)
+
+
+def test_first_frame_is_sent_whole():
+    detector = _detector()
+    frame = _frame()
+    assert detector.select_analysis_image("u", (1, 1), frame) is frame
+
+
+def test_localized_change_sends_crop_with_context():
+    detector = _detector()
+    detector.select_analysis_image("u", (1, 1), _frame())
+
+    # Change inside tile (col 2, row 3): 100px tiles horizontally and vertically
+    out = detector.select_analysis_image("u", (1, 1), _frame([(210, 310, 290, 390)]))
+
+    crop = Image.open(io.BytesIO(out))
+    # Changed tile plus one tile of context on each side -> 3x3 tiles
+    assert crop.size == (300, 300)
+
+
+def test_large_or_cross_step_change_sends_whole_frame():
+    detector = _detector()
+    detector.select_analysis_image("u", (1, 1), _frame())
+
+    spread = _frame([(0, 0, 50, 50), (1550, 850, 1600, 900)])
+    assert detector.select_analysis_image("u", (1, 1), spread) is spread
+
+    moved_on = _frame([(210, 310, 290, 390)])
+    assert detector.select_analysis_image("u", (1, 2), moved_on) is moved_on
+
+
+def test_periodic_full_frame():
+    detector = _detector(full_frame_every=2)
+    detector.select_analysis_image("u", (1, 1), _frame())
+
+    first = _frame([(210, 310, 290, 390)])
+    second = _frame([(210, 310, 290, 390), (610, 310, 690, 390)])
+    assert detector.select_analysis_image("u", (1, 1), first) is not first
+    assert detector.select_analysis_image("u", (1, 1), second) is second
+
+
+def test_thumbnails_are_bounded_per_user():
+    detector = _detector(max_users=2)
+    frame = _frame()
+    for user in ("a", "b", "c"):
+        detector.select_analysis_image(user, (1, 1), frame)
+
+    assert len(detector) == 2
+    assert "a" not in detector._last
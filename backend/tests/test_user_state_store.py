@@ -0,0 +1,253 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.dirname(CURRENT_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from utils.user_state_store import (  # noqa: E402
+    InMemoryUserStateStore,
+    RedisUserStateStore,
+    SQLiteUserStateStore,
+    UserStateStore,
+    WatchError,
+)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class _FakePipeline:
+    """Minimal stand-in for a redis-py pipeline: WATCH/MULTI/EXEC over a dict."""
+
+    def __init__(self, server):
+        self.server = server
+        self.watched = {}
+        self.queued = []
+        self.buffering = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.watched = {}
+        self.queued = []
+
+    def watch(self, key):
+        self.buffering = False
+        with self.server.lock:
+            self.watched[key] = self.server.versions.get(key, 0)
+
+    def multi(self):
+        self.buffering = True
+
+    def get(self, key):
+        if self.buffering:
+            self.queued.append(("get", key))
+            return self
+        return self.server.get(key)
+
+    def set(self, key, value, ex=None):
+        self.queued.append(("set", key, value, ex))
+        return self
+
+    def delete(self, key):
+        self.queued.append(("delete", key))
+        return self
+
+    def execute(self):
+        with self.server.lock:
+            for key, version in self.watched.items():
+                if self.server.versions.get(key, 0) != version:
+                    raise WatchError(key)
+            results = []
+            for op in self.queued:
+                if op[0] == "get":
+                    results.append(self.server.data.get(op[1]))
+                elif op[0] == "set":
+                    self.server._set(op[1], op[2], op[3])
+                    results.append(True)
+                else:
+                    results.append(self.server._delete(op[1]))
+            self.queued = []
+            return results
+
+
+class FakeRedis:
+    """Local stand-in for the subset of the Redis protocol the store uses."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.data = {}
+        self.versions = {}
+        self.expiries = {}
+
+    def _set(self, key, value, ex):
+        self.data[key] = value.encode("utf-8")
+        self.versions[key] = self.versions.get(key, 0) + 1
+        self.expiries[key] = ex
+
+    def _delete(self, key):
+        self.versions[key] = self.versions.get(key, 0) + 1
+        return int(self.data.pop(key, None) is not None)
+
+    def get(self, key):
+        with self.lock:
+            return self.data.get(key)
+
+    def delete(self, *keys):
+        with self.lock:
+            return sum(self._delete(key) for key in keys)
+
+    def scan_iter(self, match):
+        prefix = match.rstrip("*")
+        with self.lock:
+            return [key for key in self.data if key.startswith(prefix)]
+
+    def pipeline(self):
+        return _FakePipeline(self)
+
+
+def _exercise_step_operations(store):
+    assert store.get("u") is None
+    assert store.claim_popup("u", 1, 1) is True
+    assert store.claim_popup("u", 1, 1) is False
+    state = store["u"]
+    assert state.pop("step_started_at") <= time.time()
+    assert state == {"lesson_id": 1, "step_order": 1, "popup_sent_for_step": True}
+
+    # First check is due and schedules the next one; a check for another step is not gated
+    assert store.claim_check("u", 1, lambda elapsed: 60.0)[0] is True
+    assert store.claim_check("u", 1, lambda elapsed: 60.0) == (False, None)
+    assert store.claim_check("u", 7, lambda elapsed: 60.0) == (True, None)
+
+    assert store.advance_step("u", 1, 2) is True
+    assert store.advance_step("u", 1, 2) is False
+    assert store.get("u")["step_order"] == 2
+    assert store.claim_popup("u", 1, 2) is True
+
+    store.release_popup("u")
+    assert store.get("u")["popup_sent_for_step"] is False
+
+    store.set_step("u", 3, 4, popup_sent=False)
+    assert store.pop("u") == {"lesson_id": 3, "step_order": 4, "popup_sent_for_step": False}
+    assert "u" not in store
+
+
+def _concurrent_claims(store, threads=16):
+    wins = []
+    barrier = threading.Barrier(threads)
+
+    def worker():
+        barrier.wait()
+        wins.append(store.claim_popup("u", 1, 1))
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return wins
+
+
+def test_memory_store_step_operations():
+    _exercise_step_operations(InMemoryUserStateStore(shards=4))
+
+
+def test_memory_store_only_one_concurrent_popup_claim():
+    wins = _concurrent_claims(InMemoryUserStateStore(shards=4))
+    assert wins.count(True) == 1
+
+
+def test_memory_store_evicts_idle_users():
+    clock = _Clock()
+    store = InMemoryUserStateStore(ttl=60, shards=2, clock=clock)
+    store.set_step("idle", 1, 1)
+    clock.now += 30
+    store.set_step("active", 1, 1)
+    clock.now += 45
+
+    assert store.get("idle") is None
+    assert store.get("active") is not None
+    store.set_step("other", 1, 1)
+    clock.now += 100
+    assert store.evict_idle() == 2
+    assert len(store) == 0
+
+
+def test_memory_store_returns_copies():
+    store = InMemoryUserStateStore()
+    store.set_step("u", 1, 1)
+    store.get("u")["step_order"] = 99
+    assert store.get("u")["step_order"] == 1
+
+
+def test_sqlite_store_shared_between_instances(tmp_path):
+    path = str(tmp_path / "state.db")
+    first = SQLiteUserStateStore(path)
+    _exercise_step_operations(first)
+
+    first.claim_popup("u", 1, 1)
+    second = SQLiteUserStateStore(path)
+    assert second.claim_popup("u", 1, 1) is False
+    assert second.advance_step("u", 1, 2) is True
+    assert first.get("u")["step_order"] == 2
+
+
+def test_sqlite_store_only_one_concurrent_popup_claim(tmp_path):
+    wins = _concurrent_claims(SQLiteUserStateStore(str(tmp_path / "state.db")), threads=8)
+    assert wins.count(True) == 1
+
+
+def test_sqlite_store_evicts_idle_users(tmp_path):
+    clock = _Clock()
+    store = SQLiteUserStateStore(str(tmp_path / "state.db"), ttl=60, clock=clock)
+    store.set_step("u", 1, 1)
+    clock.now += 61
+    assert store.get("u") is None
+    assert store.evict_idle() == 1
+
+
+def test_redis_store_step_operations_and_ttl():
+    server = FakeRedis()
+    store = RedisUserStateStore(server, ttl=120)
+    _exercise_step_operations(store)
+
+    store.set_step("u", 1, 1)
+    assert server.expiries["mentra:user_state:u"] == 120
+    store.clear()
+    assert server.data == {}
+
+
+def test_redis_store_only_one_concurrent_popup_claim():
+    wins = _concurrent_claims(RedisUserStateStore(FakeRedis()))
+    assert wins.count(True) == 1
+
+
+def test_incomplete_backend_fails_at_creation():
+    class NoEviction(UserStateStore):
+        def get(self, user_id, default=None):
+            return default
+
+        def update(self, user_id, fn):
+            return fn({})
+
+        def pop(self, user_id, default=None):
+            return default
+
+        def clear(self):
+            pass
+
+    with pytest.raises(TypeError):
+        NoEviction()
@@ -0,0 +1,101 @@
+import os
+import sys
+import threading
+import time
+
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.dirname(CURRENT_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from utils.verdict_batcher import VerdictBatcher, parse_batch_verdicts  # noqa: E402
+
+
+def test_parse_batch_verdicts():
+    assert parse_batch_verdicts("1: YES\n2: no\n3) YES", 3) == ["YES", "NO", "YES"]
+    assert parse_batch_verdicts("Image 2 - NO\nImage 1 - YES", 2) == ["YES", "NO"]
+    assert parse_batch_verdicts("1: YES", 2) is None
+    assert parse_batch_verdicts(None, 1) is None
+
+
+def _run_concurrently(batcher, criteria):
+    results = {}
+
+    def check(crit):
+        results[crit] = batcher.submit("img", "image/png", crit).result(timeout=5)
+
+    threads = [threading.Thread(target=check, args=(crit,)) for crit in criteria]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_checks_within_window_share_one_request():
+    batches, singles = [], []
+
+    def send_batch(requests):
+        batches.append([r.finish_criteria for r in requests])
+        return "\n".join(f"{i}: {'YES' if r.finish_criteria.startswith('y') else 'NO'}" for i, r in enumerate(requests, 1))
+
+    batcher = VerdictBatcher(send_single=singles.append, send_batch=send_batch, window_ms=200, max_items=3)
+    results = _run_concurrently(batcher, ["y1", "n2", "y3"])
+
+    assert results == {"y1": "YES", "n2": "NO", "y3": "YES"}
+    assert len(batches) == 1 and sorted(batches[0]) == ["n2", "y1", "y3"]
+    assert singles == []
+    assert (batcher.batches_sent, batcher.items_batched) == (1, 3)
+
+
+def test_unparseable_batch_falls_back_to_single_checks():
+    batcher = VerdictBatcher(
+        send_single=lambda r: "YES" if r.finish_criteria == "a" else "NO",
+        send_batch=lambda requests: "I cannot tell",
+        window_ms=200,
+        max_items=2,
+    )
+    assert _run_concurrently(batcher, ["a", "b"]) == {"a": "YES", "b": "NO"}
+
+
+def test_single_item_uses_single_request():
+    batcher = VerdictBatcher(send_single=lambda r: "NO", send_batch=lambda requests: 1 / 0, window_ms=10)
+    assert batcher.submit("img", "image/png", "crit").result(timeout=5) == "NO"
+
+
+def test_batches_are_sent_concurrently():
+    in_flight, peak = [0], [0]
+    lock = threading.Lock()
+
+    def send_batch(requests):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.2)
+        with lock:
+            in_flight[0] -= 1
+        return "\n".join(f"{i}: NO" for i in range(1, len(requests) + 1))
+
+    batcher = VerdictBatcher(send_single=lambda r: "NO", send_batch=send_batch, window_ms=20, max_items=2, workers=3)
+
+    started = time.monotonic()
+    results = _run_concurrently(batcher, [f"c{i}" for i in range(6)])
+
+    assert set(results.values()) == {"NO"} and len(results) == 6
+    assert peak[0] > 1
+    assert time.monotonic() - started < 0.5
+
+
+def test_fallback_single_checks_run_concurrently():
+    def send_single(request):
+        time.sleep(0.2)
+        return "YES"
+
+    batcher = VerdictBatcher(send_single=send_single, send_batch=lambda requests: "unclear", window_ms=50, max_items=4)
+
+    started = time.monotonic()
+    results = _run_concurrently(batcher, ["a", "b", "c", "d"])
+
+    assert results == {"a": "YES", "b": "YES", "c": "YES", "d": "YES"}
+    assert time.monotonic() - started < 0.6
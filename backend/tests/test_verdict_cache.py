@@ -0,0 +1,69 @@
+import json
+import os
+import sys
+import time
+
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.dirname(CURRENT_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from utils import verdict_cache as vc  # noqa: E402
+
+
+def test_lru_eviction_and_counters():
+    cache = vc.VerdictCache(max_entries=2, ttl=60, path=None)
+    a, b, c = (vc.make_key(n, "crit", "model") for n in ("a1", "b2", "c3"))
+
+    cache.put(a, "YES")
+    cache.put(b, "NO")
+    assert cache.get(a) == "YES"  # refreshes a
+    cache.put(c, "NO")  # evicts b
+
+    assert cache.get(b) is None
+    assert cache.get(c) == "NO"
+    assert cache.stats() == {"entries": 2, "hits": 2, "misses": 1, "evictions": 1}
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(vc.time, "time", lambda: now[0])
+    cache = vc.VerdictCache(max_entries=10, ttl=5, path=None)
+    key = vc.make_key("f7", "crit", "model")
+
+    cache.put(key, "NO")
+    now[0] += 4
+    assert cache.get(key) == "NO"
+    now[0] += 2
+    assert cache.get(key) is None
+
+
+def test_key_separates_models_and_normalizes_criteria():
+    assert vc.make_key("f1", " Click   Next ", "m") == vc.make_key("f1", "click next", "m")
+    assert vc.make_key("f1", "click next", "m") != vc.make_key("f1", "click next", "other-model")
+
+
+def test_persistence_round_trip(tmp_path):
+    path = str(tmp_path / "verdicts.json")
+    key = vc.make_key("f42", "crit", "model")
+
+    cache = vc.VerdictCache(max_entries=10, ttl=60, path=path, save_interval=3600)
+    cache.put(key, "YES")
+    cache.save()
+
+    warm = vc.VerdictCache(max_entries=10, ttl=60, path=path)
+    assert warm.get(key) == "YES"
+
+
+def test_load_drops_entries_keyed_by_perceptual_hash(tmp_path):
+    path = tmp_path / "verdicts.json"
+    path.write_text(json.dumps([
+        [1234567, "crit", "model", "YES", time.time() + 60],
+        ["f1", "crit", "model", "NO", time.time() + 60],
+    ]), encoding="utf-8")
+
+    cache = vc.VerdictCache(max_entries=10, ttl=60, path=str(path))
+
+    assert cache.stats()["entries"] == 1
+    assert cache.get(("f1", "crit", "model")) == "NO"
@@ -0,0 +1,120 @@
+import os
+import sys
+import time
+import types
+
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.dirname(CURRENT_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from utils.verdict_stream import (  # noqa: E402
+    Verdict,
+    VerdictStreamParser,
+    consume_verdict_stream,
+    parse_decision,
+)
+
+
+def _text(chunk):
+    return types.SimpleNamespace(message_type="assistant_message", content=chunk)
+
+
+class _Stream:
+    """Token stream stand-in that records how far it was read and whether it was closed."""
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.read = 0
+        self.closed = False
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            if self.closed:
+                return
+            self.read += 1
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+def test_parse_decision():
+    assert parse_decision("Yes.") == "YES"
+    assert parse_decision("  no, the dialog is closed") == "NO"
+    assert parse_decision("NOT YET") is None
+    assert parse_decision("") is None
+
+
+def test_parser_waits_for_word_boundary():
+    parser = VerdictStreamParser()
+    assert parser.feed("N") is None
+    assert parser.feed("O") is None
+    assert parser.feed("T") is None
+    assert parser.feed(" done, so NO") is None
+    assert parser.feed(".") == "NO"
+
+
+def test_parser_accepts_decision_at_end_of_stream():
+    parser = VerdictStreamParser()
+    assert parser.feed("YES") is None
+    assert parser.finish() == "YES"
+
+
+def test_stream_stops_at_first_decision_and_closes():
+    stream = _Stream([
+        types.SimpleNamespace(message_type="reasoning_message", reasoning="checking"),
+        _text("YES"),
+        _text(","),
+        _text(" the"),
+        _text(" settings"),
+        _text(" page"),
+    ])
+
+    verdict = consume_verdict_stream(stream, time.perf_counter())
+
+    assert verdict.decision == "YES" and verdict.text == "YES"
+    assert verdict.early_stopped is True
+    assert verdict.output_tokens == 2
+    assert stream.closed is True
+    assert stream.read == 3
+
+
+def test_stream_caps_output_tokens():
+    stream = _Stream([_text(" hmm")] * 50)
+
+    verdict = consume_verdict_stream(stream, time.perf_counter(), max_tokens=5)
+
+    assert verdict.decision is None
+    assert verdict.early_stopped is True
+    assert stream.read == 5
+
+
+def test_stream_without_early_stop_keeps_full_text_and_usage():
+    stream = _Stream([
+        _text("1: YES\n"),
+        _text("2: NO"),
+        types.SimpleNamespace(message_type="usage_statistics", completion_tokens=7),
+    ])
+
+    verdict = consume_verdict_stream(stream, time.perf_counter(), early_stop=False)
+
+    assert verdict.text == "1: YES\n2: NO"
+    assert verdict.decision is None
+    assert verdict.output_tokens == 7
+    assert stream.closed is False
+
+
+def test_list_content_chunks():
+    part = types.SimpleNamespace(text="NO")
+    stream = _Stream([types.SimpleNamespace(message_type="assistant_message", content=[part])])
+
+    assert consume_verdict_stream(stream, time.perf_counter()).decision == "NO"
+
+
+def test_verdict_from_text():
+    verdict = Verdict.from_text("Yes.", "model", 12.0)
+    assert verdict.completed is True
+    assert verdict.text == "YES"
+    assert Verdict.from_text("unclear", "model").text == "unclear"
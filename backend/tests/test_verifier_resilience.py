@@ -0,0 +1,169 @@
+import os
+import queue
+import sys
+import threading
+import time
+
+import pytest
+
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.dirname(CURRENT_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from utils.verifier_resilience import (  # noqa: E402
+    CircuitBreaker,
+    CircuitOpenError,
+    ResilientCaller,
+    VerifierTimeout,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeLease:
+    """Stands in for AgentPool: a fixed set of agents, borrowed and given back."""
+
+    def __init__(self, *agents):
+        self.idle = queue.Queue()
+        for agent in agents:
+            self.idle.put(agent)
+
+    def borrow(self, timeout=None):
+        return self.idle.get(timeout=timeout)
+
+    def try_borrow(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            return None
+
+    def give_back(self, agent):
+        self.idle.put(agent)
+
+
+def _caller(**kwargs):
+    kwargs.setdefault("deadline", 2.0)
+    kwargs.setdefault("hedge_default_delay", 0.05)
+    kwargs.setdefault("hedge_budget", 1.0)
+    kwargs.setdefault("max_workers", 4)
+    return ResilientCaller(**kwargs)
+
+
+def test_hedge_wins_when_primary_is_slow():
+    caller = _caller()
+    calls = []
+    lock = threading.Lock()
+
+    def fn():
+        with lock:
+            calls.append(len(calls))
+            first = len(calls) == 1
+        time.sleep(1.0 if first else 0.01)
+        return "slow" if first else "fast"
+
+    started = time.perf_counter()
+    assert caller.call(fn) == "fast"
+    assert time.perf_counter() - started < 0.5
+    stats = caller.stats()
+    assert (stats["hedges"], stats["hedge_wins"], stats["successes"]) == (1, 1, 1)
+
+
+def test_deadline_raises_timeout_and_counts_failure():
+    caller = _caller(deadline=0.1, hedge=False)
+    with pytest.raises(VerifierTimeout):
+        caller.call(lambda: time.sleep(0.5))
+    stats = caller.stats()
+    assert (stats["timeouts"], stats["failures"]) == (1, 1)
+
+
+def test_failed_primary_is_retried_once_then_error_is_raised():
+    caller = _caller(hedge_default_delay=10)
+    attempts = []
+
+    def fn():
+        attempts.append(1)
+        raise RuntimeError("provider 500")
+
+    with pytest.raises(RuntimeError):
+        caller.call(fn)
+    assert len(attempts) == 2
+
+
+def test_hedge_budget_limits_duplicates():
+    caller = _caller(hedge_budget=0.0)
+    caller._hedge_tokens = 0.0
+    assert caller.call(lambda: time.sleep(0.1) or "ok") == "ok"
+    assert caller.stats()["hedges"] == 0
+
+
+def test_breaker_opens_on_error_rate_and_recovers_through_probe():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_rate=0.5, window=4, min_calls=4, open_seconds=30, clock=clock)
+    for success in (True, False, True, False):
+        assert breaker.allow()
+        breaker.record(success)
+    assert breaker.state == "open"
+    assert breaker.allow() is False
+
+    clock.now = 31
+    assert breaker.allow() is True  # one probe
+    assert breaker.allow() is False
+    breaker.record(True)
+    assert breaker.state == "closed"
+
+
+def test_open_circuit_fails_fast():
+    caller = _caller(breaker=CircuitBreaker(min_calls=1, window=1, open_seconds=60), hedge=False)
+
+    with pytest.raises(RuntimeError):
+        caller.call(lambda: (_ for _ in ()).throw(RuntimeError("down")))
+    with pytest.raises(CircuitOpenError):
+        caller.call(lambda: "never called")
+
+    stats = caller.stats()
+    assert stats["circuit"] == "open"
+    assert stats["short_circuits"] == 1
+
+
+def test_waiting_for_an_agent_is_not_charged_to_the_deadline_or_breaker():
+    caller = _caller(deadline=0.2, hedge=False)
+    lease = FakeLease("a1")
+    agent = lease.borrow()
+    threading.Timer(0.4, lease.give_back, args=(agent,)).start()
+
+    # Queued 0.4s for the only agent, longer than the deadline, then answered at once
+    assert caller.call(lambda agent: f"answered by {agent}", lease=lease) == "answered by a1"
+    assert lease.try_borrow() == "a1"  # given back after the attempt
+
+    caller = _caller(queue_timeout=0.05, breaker=CircuitBreaker(min_calls=1, window=1))
+    with pytest.raises(VerifierTimeout):
+        caller.call(lambda agent: "never", lease=lease)
+    stats = caller.stats()
+    assert (stats["queue_timeouts"], stats["calls"], stats["failures"], stats["circuit"]) == (1, 0, 0, "closed")
+
+
+def test_hedge_only_goes_out_on_an_idle_agent():
+    used = []
+
+    def fn(agent):
+        used.append(agent)
+        time.sleep(0.3 if len(used) == 1 else 0.01)
+        return agent
+
+    # One agent: the duplicate would only queue behind the primary
+    caller = _caller()
+    assert caller.call(fn, lease=FakeLease("a1")) == "a1"
+    assert (caller.stats()["hedges"], caller.stats()["hedges_skipped"]) == (0, 1)
+
+    used.clear()
+    caller = _caller()
+    assert caller.call(fn, lease=FakeLease("a1", "a2")) == "a2"
+    assert caller.stats()["hedge_wins"] == 1
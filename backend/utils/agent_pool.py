@@ -0,0 +1,261 @@
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import types
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Verifier agents available for concurrent completion checks
+AGENT_POOL_SIZE = int(os.getenv("AGENT_POOL_SIZE", "1"))
+# Where agent ids are remembered between restarts when AGENT_STORE_PATH is unset; an
+# empty AGENT_STORE_PATH disables persistence (read when the store is created)
+DEFAULT_AGENT_STORE_PATH = os.path.join(os.path.dirname(__file__), "..", ".letta_agents.json")
+# Clear an agent's message history after this many messages (0 never); only needed
+# when the server does not support message_buffer_autoclear
+AGENT_RESET_EVERY = int(os.getenv("AGENT_RESET_EVERY", "20"))
+
+
+@dataclass(frozen=True)
+class AgentSpec:
+    """Everything that defines an agent; a change yields a different store key."""
+
+    name: str
+    system: str
+    model: str
+    embedding: str
+    # Output cap for the agent's replies; None leaves the server default
+    max_tokens: Optional[int] = None
+
+    def store_key(self, token: Optional[str]) -> str:
+        # The token is part of the key so ids never leak across accounts (or into tests)
+        material = json.dumps({**asdict(self), "token": hashlib.sha1((token or "").encode("utf-8")).hexdigest()}, sort_keys=True)
+        return hashlib.sha1(material.encode("utf-8")).hexdigest()
+
+
+class AgentIdStore:
+    """Small JSON file mapping agent store keys to lists of agent ids."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "AgentIdStore":
+        """Store at AGENT_STORE_PATH as set now, not when this module was imported."""
+        return cls(os.getenv("AGENT_STORE_PATH", DEFAULT_AGENT_STORE_PATH) or None)
+
+    def _read(self) -> Dict[str, List[str]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as handle:
+                data = json.load(handle)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Failed to read agent ids from {self.path}: {e}")
+            return {}
+
+    def get(self, key: str) -> List[str]:
+        if not self.path:
+            return []
+        with self._lock:
+            return list(self._read().get(key, []))
+
+    def put(self, key: str, agent_ids: List[str]) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            data = self._read()
+            data[key] = list(agent_ids)
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as handle:
+                    json.dump(data, handle, indent=2)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                logger.warning(f"Failed to save agent ids to {self.path}: {e}")
+
+
+class AgentPool:
+    """
+    Pool of interchangeable, stateless Letta agents.
+
+    Agent ids are reused across restarts from the AgentIdStore, so a worker start
+    creates no remote agents once the pool has been filled. Agents are created lazily
+    up to `size` (or ahead of time with warm()); each completion check borrows one
+    with acquire(), so concurrent checks no longer queue behind a single agent's
+    message history. Agents are created with message_buffer_autoclear when the server
+    supports it, and otherwise have their history reset every `reset_every` messages.
+    """
+
+    def __init__(
+        self,
+        client,
+        spec: AgentSpec,
+        size: int = AGENT_POOL_SIZE,
+        token: Optional[str] = None,
+        store: Optional[AgentIdStore] = None,
+        reset_every: int = AGENT_RESET_EVERY,
+    ):
+        self.client = client
+        self.spec = spec
+        self.size = max(1, size)
+        self.reset_every = reset_every
+        self.store = store if store is not None else AgentIdStore.from_env()
+        self._key = spec.store_key(token)
+        self._lock = threading.Lock()
+        self._idle: "queue.Queue[Any]" = queue.Queue()
+        self._agents: List[Any] = []
+        self._uses: Dict[str, int] = {}
+        self._autoclear = False
+        self._creating = 0
+        self.created = 0
+        self.reused = 0
+        self.resets = 0
+
+        for agent_id in self.store.get(self._key)[: self.size]:
+            agent = types.SimpleNamespace(id=agent_id)
+            self._agents.append(agent)
+            self._idle.put(agent)
+            self.reused += 1
+        if self.reused:
+            logger.info(f"Reusing {self.reused} persisted agent(s) for {spec.name}")
+
+    @property
+    def agent_ids(self) -> List[str]:
+        with self._lock:
+            return [agent.id for agent in self._agents]
+
+    def _create(self, index: int) -> Any:
+        name = self.spec.name if index == 0 else f"{self.spec.name} {index + 1}"
+        kwargs = dict(
+            name=name,
+            system=self.spec.system,
+            model=self.spec.model,
+            embedding=self.spec.embedding,
+            tools=[],
+            include_base_tools=False,
+        )
+        optional = {"message_buffer_autoclear": True}
+        if self.spec.max_tokens is not None:
+            optional["max_tokens"] = self.spec.max_tokens
+        try:
+            agent = self.client.agents.create(**optional, **kwargs)
+            self._autoclear = True
+        except TypeError:
+            # Older clients do not accept these options; fall back to periodic resets
+            agent = self.client.agents.create(**kwargs)
+        self.created += 1
+        logger.info(f"Created Letta agent {agent.id} ({name})")
+        return agent
+
+    def _persist(self) -> None:
+        self.store.put(self._key, [agent.id for agent in self._agents])
+
+    def _grow(self) -> Optional[Any]:
+        """Create one more agent if the pool is below size; the remote call runs unlocked."""
+        with self._lock:
+            index = len(self._agents) + self._creating
+            if index >= self.size:
+                return None
+            self._creating += 1
+        try:
+            agent = self._create(index)
+        finally:
+            with self._lock:
+                self._creating -= 1
+        with self._lock:
+            self._agents.append(agent)
+            self._persist()
+        return agent
+
+    def primary(self) -> Any:
+        """The first agent, created if the pool is empty."""
+        with self._lock:
+            if self._agents:
+                return self._agents[0]
+        agent = self._grow()
+        if agent is not None:
+            self._idle.put(agent)
+        with self._lock:
+            return self._agents[0]
+
+    def warm(self) -> int:
+        """Create agents until the pool is full; returns how many were created."""
+        created = 0
+        while True:
+            agent = self._grow()
+            if agent is None:
+                return created
+            self._idle.put(agent)
+            created += 1
+
+    def borrow(self, timeout: Optional[float] = None) -> Any:
+        """
+        Take an agent, creating one while the pool is below size, else waiting for one.
+
+        Raises:
+            queue.Empty: No agent became free within timeout
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        agent = self._grow()
+        if agent is not None:
+            return agent
+        return self._idle.get(timeout=timeout)
+
+    def try_borrow(self) -> Optional[Any]:
+        """An idle agent, or None at once if every agent is busy (nothing is created)."""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return None
+
+    def give_back(self, agent: Any) -> None:
+        """Return an agent from borrow()/try_borrow() to the pool."""
+        if agent in self._agents:
+            self._after_use(agent)
+            self._idle.put(agent)
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None) -> Iterator[Any]:
+        """Borrow an agent for one message exchange."""
+        agent = self.borrow(timeout)
+        try:
+            yield agent
+        finally:
+            self.give_back(agent)
+
+    def _after_use(self, agent: Any) -> None:
+        if self._autoclear or self.reset_every <= 0:
+            return
+        uses = self._uses.get(agent.id, 0) + 1
+        if uses < self.reset_every:
+            self._uses[agent.id] = uses
+            return
+        self._uses[agent.id] = 0
+        reset = getattr(self.client.agents.messages, "reset", None)
+        if reset is None:
+            return
+        try:
+            reset(agent_id=agent.id, add_default_initial_messages=False)
+            self.resets += 1
+        except Exception as e:
+            logger.warning(f"Failed to reset history of agent {agent.id}: {e}")
+
+    def discard(self, agent: Any) -> None:
+        """Drop an agent that no longer exists remotely; a replacement is created on demand."""
+        with self._lock:
+            if agent in self._agents:
+                self._agents.remove(agent)
+                self._uses.pop(agent.id, None)
+                self._persist()
+                logger.warning(f"Discarded Letta agent {agent.id}")
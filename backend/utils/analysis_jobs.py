@@ -0,0 +1,192 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "4"))
+# Jobs allowed to wait for a worker before new submissions are rejected
+ANALYSIS_MAX_PENDING = int(os.getenv("ANALYSIS_MAX_PENDING", "64"))
+# Finished jobs kept around for status polling
+ANALYSIS_JOBS_RETAINED = int(os.getenv("ANALYSIS_JOBS_RETAINED", "1000"))
+
+
+class QueueFullError(Exception):
+    """Raised when the analysis queue has no room for another job."""
+
+
+class AnalysisJob:
+    """A queued screenshot analysis and its outcome."""
+
+    def __init__(self, user_id: Optional[str]):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.status = "queued"
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "user_id": self.user_id,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class AnalysisJobQueue:
+    """
+    Bounded worker pool for screenshot analysis.
+
+    Request threads submit work and return immediately; workers run it and hand the
+    finished job to the result handler (app.py emits it to the user's Socket.IO room).
+    """
+
+    def __init__(
+        self,
+        max_workers: int = ANALYSIS_WORKERS,
+        max_pending: int = ANALYSIS_MAX_PENDING,
+        retained: int = ANALYSIS_JOBS_RETAINED,
+    ):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retained = retained
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis")
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, AnalysisJob]" = OrderedDict()
+        self._in_queue = 0
+        self._running = 0
+        self._result_handler: Optional[Callable[[AnalysisJob], None]] = None
+
+    def set_result_handler(self, handler: Optional[Callable[[AnalysisJob], None]]) -> None:
+        """Register the callback invoked (on a worker thread) when a job finishes."""
+        self._result_handler = handler
+
+    @property
+    def depth(self) -> int:
+        """Jobs queued or running."""
+        with self._lock:
+            return self._in_queue
+
+    @property
+    def queued(self) -> int:
+        """Jobs waiting for a worker."""
+        with self._lock:
+            return self._in_queue - self._running
+
+    def submit(self, user_id: Optional[str], fn: Callable[..., Dict[str, Any]], *args, **kwargs) -> AnalysisJob:
+        """
+        Queue fn(*args, **kwargs) for a worker.
+
+        Raises:
+            QueueFullError: If max_workers + max_pending jobs are already in flight
+        """
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError("Analysis queue is full")
+        return self._launch(self.create(user_id), fn, args, kwargs)
+
+    def create(self, user_id: Optional[str]) -> AnalysisJob:
+        """Register a job (pollable as "queued") without handing it to a worker yet; see start()."""
+        job = AnalysisJob(user_id)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.retained:
+                self._jobs.popitem(last=False)
+        return job
+
+    def start(self, job: AnalysisJob, fn: Callable[..., Dict[str, Any]], *args, **kwargs) -> AnalysisJob:
+        """
+        Queue a job from create() for a worker.
+
+        Raises:
+            QueueFullError: If max_workers + max_pending jobs are already in flight; the
+                job is marked failed
+        """
+        if not self._slots.acquire(blocking=False):
+            self._mark_failed(job, "Analysis queue is full")
+            raise QueueFullError("Analysis queue is full")
+        return self._launch(job, fn, args, kwargs)
+
+    def _launch(self, job: AnalysisJob, fn, args, kwargs) -> AnalysisJob:
+        # Caller holds one of self._slots
+        with self._lock:
+            self._in_queue += 1
+
+        try:
+            self._executor.submit(self._run, job, fn, args, kwargs)
+        except Exception:
+            self._release(job)
+            raise
+        return job
+
+    def resolve(self, job: AnalysisJob, result: Dict[str, Any]) -> None:
+        """Finish a job from create() with a result, without running it, and notify the handler."""
+        job.result = result
+        job.status = "done"
+        job.finished_at = time.time()
+        self._notify(job)
+
+    def fail(self, job: AnalysisJob, error: str) -> None:
+        """Finish a job from create() as failed, without running it, and notify the handler."""
+        if job.status != "failed":
+            self._mark_failed(job, error)
+        self._notify(job)
+
+    def _mark_failed(self, job: AnalysisJob, error: str) -> None:
+        job.error = error
+        job.status = "failed"
+        job.finished_at = time.time()
+
+    def _run(self, job: AnalysisJob, fn, args, kwargs) -> None:
+        job.status = "running"
+        with self._lock:
+            self._running += 1
+        try:
+            job.result = fn(*args, **kwargs)
+            job.status = "done"
+        except Exception as e:
+            logger.error(f"Analysis job {job.id} failed: {e}")
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._running -= 1
+            self._release(job)
+
+        self._notify(job)
+
+    def _notify(self, job: AnalysisJob) -> None:
+        handler = self._result_handler
+        if handler:
+            try:
+                handler(job)
+            except Exception as e:
+                logger.error(f"Result handler failed for job {job.id}: {e}")
+
+    def _release(self, job: AnalysisJob) -> None:
+        with self._lock:
+            self._in_queue -= 1
+        self._slots.release()
+
+    def get(self, job_id: str) -> Optional[AnalysisJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+
+# Global instance for easy import
+analysis_jobs = AnalysisJobQueue()
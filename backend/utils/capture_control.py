@@ -0,0 +1,215 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+from .analysis_jobs import analysis_jobs
+from .frame_coalescer import frame_coalescer
+
+logger = logging.getLogger(__name__)
+
+# Capture interval bounds pushed to the overlay, in seconds
+MIN_CAPTURE_INTERVAL = float(os.getenv("CAPTURE_INTERVAL_MIN", "3"))
+BASE_CAPTURE_INTERVAL = float(os.getenv("CAPTURE_INTERVAL_BASE", "10"))
+MAX_CAPTURE_INTERVAL = float(os.getenv("CAPTURE_INTERVAL_MAX", "60"))
+# Frames a client may send back-to-back above its recommended rate
+CAPTURE_BURST = int(os.getenv("CAPTURE_BURST", "3"))
+# Queue depth (queued + running analyses) at which the interval starts backing off
+QUEUE_DEPTH_SOFT_LIMIT = int(os.getenv("CAPTURE_QUEUE_SOFT_LIMIT", "8"))
+# Users tracked at most; the least recently seen are dropped past this
+CAPTURE_MAX_USERS = int(os.getenv("CAPTURE_MAX_USERS", "10000"))
+# Users that sent no frame for this long are dropped, checked every CAPTURE_SWEEP_SECONDS
+CAPTURE_IDLE_SECONDS = float(os.getenv("CAPTURE_IDLE_SECONDS", "3600"))
+CAPTURE_SWEEP_SECONDS = float(os.getenv("CAPTURE_SWEEP_SECONDS", "300"))
+
+# Smoothing factor for the per-user frame-change rate
+_CHANGE_RATE_ALPHA = 0.3
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> Tuple[bool, float]:
+        """Take one token; returns (allowed, seconds until a token is available)."""
+        now = time.monotonic()
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True, 0.0
+        return False, (1 - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+
+class _UserCapture:
+    __slots__ = ("interval", "change_rate", "bucket", "last_seen")
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.change_rate = 1.0
+        self.bucket = TokenBucket(rate=1.0 / interval, capacity=CAPTURE_BURST)
+        self.last_seen = time.monotonic()
+
+
+class CaptureRateController:
+    """
+    Recommends a screenshot interval per user and enforces it with a token bucket.
+
+    The interval grows with server queue depth and with how rarely the user's screen
+    changes, and returns to the base interval while the user is actively working on a
+    step. The recommendation is pushed to the overlay over Socket.IO whenever it
+    changes noticeably.
+
+    At most max_users users are tracked (least recently seen dropped first), and
+    sweep() drops users idle for max_idle_seconds; listeners registered with
+    add_listener() are told which user was dropped so per-user state kept elsewhere
+    goes with it.
+    """
+
+    def __init__(
+        self,
+        queue_depth: Callable[[], int] = lambda: 0,
+        min_interval: float = MIN_CAPTURE_INTERVAL,
+        base_interval: float = BASE_CAPTURE_INTERVAL,
+        max_interval: float = MAX_CAPTURE_INTERVAL,
+        soft_limit: int = QUEUE_DEPTH_SOFT_LIMIT,
+        max_users: int = CAPTURE_MAX_USERS,
+        max_idle_seconds: float = CAPTURE_IDLE_SECONDS,
+        sweep_seconds: float = CAPTURE_SWEEP_SECONDS,
+    ):
+        self.queue_depth = queue_depth
+        self.min_interval = min_interval
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self.soft_limit = max(1, soft_limit)
+        self.max_users = max(1, max_users)
+        self.max_idle_seconds = max_idle_seconds
+        self.sweep_seconds = sweep_seconds
+        self._lock = threading.Lock()
+        # Least recently seen first
+        self._users: "OrderedDict[str, _UserCapture]" = OrderedDict()
+        self._notify: Optional[Callable[[str, float], None]] = None
+        self._listeners: List[Callable[[str], None]] = []
+
+    def set_notifier(self, notify: Optional[Callable[[str, float], None]]) -> None:
+        """Register the callback that pushes (user_id, interval_seconds) to the client."""
+        self._notify = notify
+
+    def add_listener(self, listener: Callable[[str], None]) -> None:
+        """Register a callback invoked with the user_id of every user dropped by eviction or forget()."""
+        self._listeners.append(listener)
+
+    def _dropped(self, user_ids: List[str]) -> None:
+        for user_id in user_ids:
+            for listener in list(self._listeners):
+                try:
+                    listener(user_id)
+                except Exception as e:
+                    logger.warning(f"Capture eviction listener failed: {e}")
+
+    def _user(self, user_id: str, evicted: Optional[List[str]] = None) -> _UserCapture:
+        # Caller holds self._lock; users pushed out by the bound are appended to evicted
+        entry = self._users.get(user_id)
+        if entry is None:
+            entry = self._users[user_id] = _UserCapture(self.base_interval)
+            while len(self._users) > self.max_users:
+                dropped, _ = self._users.popitem(last=False)
+                if evicted is not None:
+                    evicted.append(dropped)
+        return entry
+
+    def _compute_interval(self, entry: _UserCapture, step_advanced: bool) -> float:
+        # Back off linearly once the analysis queue is past its soft limit
+        load_factor = 1.0 + max(0, self.queue_depth() - self.soft_limit) / self.soft_limit
+        # Idle screens (mostly unchanged frames) get checked less often
+        idle_factor = 1.0 + 2.0 * (1.0 - entry.change_rate)
+        interval = self.base_interval * load_factor * idle_factor
+        if step_advanced:
+            # A fresh step is when the user is most likely to finish something quickly
+            interval = min(interval, self.base_interval)
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    def interval_for(self, user_id: str) -> float:
+        with self._lock:
+            entry = self._users.get(user_id)
+            return entry.interval if entry is not None else self.base_interval
+
+    def allow(self, user_id: str) -> Tuple[bool, float]:
+        """
+        Charge one frame against the user's bucket.
+
+        Returns:
+            Tuple[bool, float]: (allowed, retry_after_seconds)
+        """
+        evicted: List[str] = []
+        with self._lock:
+            entry = self._user(user_id, evicted)
+            entry.last_seen = time.monotonic()
+            self._users.move_to_end(user_id)
+            result = entry.bucket.try_acquire()
+        self._dropped(evicted)
+        return result
+
+    def record_frame(self, user_id: str, changed: bool, step_advanced: bool = False) -> float:
+        """
+        Update the user's change rate after a frame was processed and recompute the
+        recommended interval, notifying the client if it moved by more than 20%.
+
+        Returns:
+            float: The recommended interval in seconds
+        """
+        evicted: List[str] = []
+        with self._lock:
+            entry = self._user(user_id, evicted)
+            entry.change_rate += _CHANGE_RATE_ALPHA * ((1.0 if changed else 0.0) - entry.change_rate)
+            interval = self._compute_interval(entry, step_advanced)
+            moved = abs(interval - entry.interval) > 0.2 * entry.interval
+            if moved:
+                entry.interval = interval
+                entry.bucket.rate = 1.0 / interval
+        self._dropped(evicted)
+        if moved and self._notify:
+            self._notify(user_id, interval)
+        return interval
+
+    def forget(self, user_id: str) -> None:
+        with self._lock:
+            known = self._users.pop(user_id, None) is not None
+        if known:
+            self._dropped([user_id])
+
+    def evict_idle(self, max_idle_seconds: Optional[float] = None) -> int:
+        """Drop users that have not sent a frame recently; returns how many were dropped."""
+        if max_idle_seconds is None:
+            max_idle_seconds = self.max_idle_seconds
+        cutoff = time.monotonic() - max_idle_seconds
+        with self._lock:
+            stale = [uid for uid, entry in self._users.items() if entry.last_seen < cutoff]
+            for uid in stale:
+                del self._users[uid]
+        self._dropped(stale)
+        return len(stale)
+
+    def sweep(self) -> float:
+        """Flow-scheduler transition: evict idle users, then run again after sweep_seconds."""
+        dropped = self.evict_idle()
+        if dropped:
+            logger.info(f"Evicted {dropped} idle capture users")
+        return self.sweep_seconds
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+
+# Global instance for easy import; load = analyses running or waiting (sync and async)
+capture_controller = CaptureRateController(queue_depth=lambda: frame_coalescer.depth + analysis_jobs.queued)
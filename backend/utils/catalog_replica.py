@@ -0,0 +1,258 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .catalog_snapshot import CatalogRows
+
+logger = logging.getLogger(__name__)
+
+# Mirror lesson/step into a local SQLite file and serve catalog reads from it
+CATALOG_REPLICA_ENABLED = os.getenv("CATALOG_REPLICA", "0") == "1"
+CATALOG_REPLICA_PATH = os.getenv("CATALOG_REPLICA_PATH", os.path.join(os.path.dirname(__file__), "..", "catalog_replica.db"))
+# Column used as the incremental sync watermark; it must grow with every write (id, or a trigger-maintained updated_at)
+CATALOG_REPLICA_WATERMARK = os.getenv("CATALOG_REPLICA_WATERMARK", "id")
+# Seconds between incremental syncs
+CATALOG_REPLICA_SYNC_SECONDS = float(os.getenv("CATALOG_REPLICA_SYNC_SECONDS", "30"))
+# Seconds between full resyncs, which also pick up edits and deletes the watermark misses
+CATALOG_REPLICA_FULL_SYNC_SECONDS = float(os.getenv("CATALOG_REPLICA_FULL_SYNC_SECONDS", "3600"))
+CATALOG_REPLICA_PAGE_SIZE = int(os.getenv("CATALOG_REPLICA_PAGE_SIZE", "1000"))
+
+# fetch_page(table, column, after, limit): rows with column > after (all rows if after is None), ordered by column
+FetchPage = Callable[[str, str, Optional[Any], int], List[Dict[str, Any]]]
+
+
+def postgrest_page_fetcher(client) -> FetchPage:
+    """FetchPage over a supabase-py or PostgrestPool client (keyset pagination on column)."""
+    def fetch_page(table: str, column: str, after: Optional[Any], limit: int) -> List[Dict[str, Any]]:
+        query = client.table(table).select("*")
+        if after is not None:
+            query = query.gt(column, after)
+        return query.order(column).limit(limit).execute().data or []
+
+    return fetch_page
+
+
+# Mirrored tables and the columns indexed next to the JSON row
+_TABLES = {
+    "lesson": ("lesson_order",),
+    "step": ("lesson_id", "step_order"),
+}
+
+
+class CatalogReplica:
+    """
+    Local SQLite mirror of the lesson and step tables.
+
+    sync() pulls rows whose watermark column is past the last value seen, one page
+    at a time, and upserts them; every full_sync_seconds (or when requested) it
+    re-reads both tables by id and replaces the mirror in one transaction, which
+    picks up edits and deletes the watermark cannot see. A fetch that fails leaves
+    the mirror as it was. rows() returns the mirror in the lesson?select=*,step(*)
+    shape CatalogSnapshot is built from, so reads keep working while Supabase is
+    slow or unreachable; lag_seconds() tells how stale they may be.
+    """
+
+    def __init__(
+        self,
+        fetch_page: Optional[FetchPage] = None,
+        path: str = CATALOG_REPLICA_PATH,
+        watermark: str = CATALOG_REPLICA_WATERMARK,
+        page_size: int = CATALOG_REPLICA_PAGE_SIZE,
+        full_sync_seconds: float = CATALOG_REPLICA_FULL_SYNC_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.fetch_page = fetch_page
+        self.path = path
+        self.watermark = watermark
+        self.page_size = max(1, page_size)
+        self.full_sync_seconds = full_sync_seconds
+        self.clock = clock
+        # One connection shared by readers and sync(); sync() writes in single transactions
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._full_requested = False
+        self._conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for table, columns in _TABLES.items():
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, "
+                + "".join(f"{column} INTEGER, " for column in columns)
+                + "data TEXT NOT NULL)"
+            )
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_lookup ON {table}({', '.join(columns)})")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sync_state (table_name TEXT PRIMARY KEY, watermark TEXT, "
+            "synced_at REAL, full_synced_at REAL)"
+        )
+        self.syncs = 0
+        self.full_syncs = 0
+        self.failures = 0
+        self.rows_synced = 0
+        self.last_error: Optional[str] = None
+
+    def _state(self, table: str) -> Tuple[Optional[Any], Optional[float], Optional[float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT watermark, synced_at, full_synced_at FROM sync_state WHERE table_name = ?", (table,)
+            ).fetchone()
+        if row is None:
+            return None, None, None
+        return (json.loads(row[0]) if row[0] is not None else None), row[1], row[2]
+
+    def synced_at(self) -> Optional[float]:
+        """When every table was last synced (the oldest of the tables), or None if one never was."""
+        times = [self._state(table)[1] for table in _TABLES]
+        return None if None in times else min(times)
+
+    def lag_seconds(self) -> Optional[float]:
+        """Seconds since the mirror was last known to match the database; None before the first sync."""
+        synced_at = self.synced_at()
+        return max(0.0, self.clock() - synced_at) if synced_at is not None else None
+
+    def request_full_sync(self, lesson_id: Optional[int] = None) -> None:
+        """Make the next sync a full one (signature matches lesson cache listeners)."""
+        self._full_requested = True
+
+    def _fetch_all(self, table: str, column: str, after: Optional[Any]) -> List[Dict[str, Any]]:
+        rows: List[Dict[str, Any]] = []
+        while True:
+            page = self.fetch_page(table, column, after, self.page_size)
+            rows.extend(page)
+            if len(page) < self.page_size:
+                return rows
+            after = page[-1][column]
+
+    def sync(self, full: bool = False) -> int:
+        """
+        Bring the mirror up to date.
+
+        Args:
+            full (bool): Re-read both tables instead of only rows past the watermark;
+                also done when a full sync is due or was requested
+
+        Returns:
+            int: Number of rows written to the mirror
+
+        Raises:
+            Exception: What fetch_page raised; the mirror is left unchanged
+        """
+        if self.fetch_page is None:
+            raise RuntimeError("catalog replica has no source to sync from")
+        with self._sync_lock:
+            now = self.clock()
+            full_synced = [self._state(table)[2] for table in _TABLES]
+            full = (
+                full
+                or self._full_requested
+                or None in full_synced
+                or now - min(full_synced) >= self.full_sync_seconds
+            )
+            self._full_requested = False
+            try:
+                fetched = {}
+                for table in _TABLES:
+                    if full:
+                        fetched[table] = self._fetch_all(table, "id", None)
+                    else:
+                        fetched[table] = self._fetch_all(table, self.watermark, self._state(table)[0])
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                if full:
+                    self._full_requested = True
+                raise
+            written = self._apply(fetched, full, now)
+            self.syncs += 1
+            self.full_syncs += int(full)
+            self.rows_synced += written
+            self.last_error = None
+            if written:
+                logger.info(f"Catalog replica {'full' if full else 'incremental'} sync wrote {written} rows")
+            return written
+
+    def _apply(self, fetched: Dict[str, List[Dict[str, Any]]], full: bool, now: float) -> int:
+        written = 0
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for table, rows in fetched.items():
+                    columns = _TABLES[table]
+                    if full:
+                        self._conn.execute(f"DELETE FROM {table}")
+                    self._conn.executemany(
+                        f"INSERT OR REPLACE INTO {table} (id, {', '.join(columns)}, data) "
+                        f"VALUES (?, {', '.join('?' for _ in columns)}, ?)",
+                        [
+                            (row["id"], *(row.get(column) for column in columns), json.dumps(row, default=str))
+                            for row in rows
+                            if row.get("id") is not None
+                        ],
+                    )
+                    written += len(rows)
+                    previous = self._conn.execute(
+                        "SELECT watermark FROM sync_state WHERE table_name = ?", (table,)
+                    ).fetchone()
+                    watermark = json.loads(previous[0]) if previous and previous[0] is not None else None
+                    if full:
+                        # Restart the watermark from the newest row in the mirror
+                        watermark = None
+                        newest = max((row for row in rows if row.get(self.watermark) is not None),
+                                     key=lambda row: row[self.watermark], default=None)
+                        if newest is not None:
+                            watermark = newest[self.watermark]
+                    elif rows and rows[-1].get(self.watermark) is not None:
+                        watermark = rows[-1][self.watermark]
+                    self._conn.execute(
+                        "INSERT INTO sync_state (table_name, watermark, synced_at, full_synced_at) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT(table_name) DO UPDATE SET watermark = excluded.watermark, "
+                        "synced_at = excluded.synced_at, "
+                        "full_synced_at = COALESCE(excluded.full_synced_at, sync_state.full_synced_at)",
+                        (table, json.dumps(watermark, default=str), now, now if full else None),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return written
+
+    def rows(self) -> CatalogRows:
+        """Every mirrored lesson with its steps embedded under "step"."""
+        with self._lock:
+            lessons = self._conn.execute("SELECT data FROM lesson ORDER BY id").fetchall()
+            steps = self._conn.execute("SELECT lesson_id, data FROM step ORDER BY lesson_id, step_order").fetchall()
+        by_lesson: Dict[int, List[Dict[str, Any]]] = {}
+        for lesson_id, data in steps:
+            by_lesson.setdefault(lesson_id, []).append(json.loads(data))
+        result = []
+        for (data,) in lessons:
+            lesson = json.loads(data)
+            lesson["step"] = by_lesson.get(lesson.get("id"), [])
+            result.append(lesson)
+        return result
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return {table: self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in _TABLES}
+
+    def stats(self) -> Dict[str, Any]:
+        lag = self.lag_seconds()
+        return {
+            "path": self.path,
+            "rows": self.counts(),
+            "watermarks": {table: self._state(table)[0] for table in _TABLES},
+            "lag_seconds": round(lag, 1) if lag is not None else None,
+            "syncs": self.syncs,
+            "full_syncs": self.full_syncs,
+            "rows_synced": self.rows_synced,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
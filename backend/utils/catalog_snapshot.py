@@ -0,0 +1,246 @@
+import logging
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Serve catalog lookups from an in-memory snapshot of every lesson and step
+CATALOG_SNAPSHOT_ENABLED = os.getenv("CATALOG_SNAPSHOT", "1") == "1"
+# Seconds between background refreshes of the snapshot
+CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "300"))
+# Seconds to wait before retrying a failed load
+CATALOG_RETRY_SECONDS = float(os.getenv("CATALOG_RETRY_SECONDS", "30"))
+
+# Rows of lesson?select=*,step(*): lesson columns plus an embedded "step" list
+CatalogRows = List[Dict[str, Any]]
+
+
+class CatalogStep(NamedTuple):
+    name: str
+    description: str
+    finish_criteria: Optional[str]
+
+
+class CatalogSnapshot:
+    """
+    Immutable index over one load of the lesson/step catalog.
+
+    Lookups are dictionary hits: lessons by id and by lesson_order, steps by
+    (lesson_id, step_order). A snapshot is never modified after construction;
+    refreshes build a new one and swap the reference.
+    """
+
+    __slots__ = ("lessons", "lesson_ids_by_order", "steps", "step_orders", "loaded_at")
+
+    def __init__(self, rows: CatalogRows, loaded_at: Optional[float] = None):
+        lessons: Dict[int, Mapping[str, Any]] = {}
+        by_order: Dict[int, int] = {}
+        steps: Dict[Tuple[int, int], CatalogStep] = {}
+        step_orders: Dict[int, Tuple[int, ...]] = {}
+        for row in rows or []:
+            lesson_id = row.get("id")
+            if lesson_id is None:
+                continue
+            embedded = row.get("step")
+            lessons[lesson_id] = MappingProxyType({k: v for k, v in row.items() if k != "step"})
+            if row.get("lesson_order") is not None:
+                by_order[row["lesson_order"]] = lesson_id
+            if not isinstance(embedded, list):
+                # The step relation was not embedded; step lookups fall back to queries
+                continue
+            orders = []
+            for step in embedded:
+                step_order = step.get("step_order")
+                if step_order is None:
+                    continue
+                steps[(lesson_id, step_order)] = CatalogStep(
+                    step.get("name") or "", step.get("description") or "", step.get("finish_criteria")
+                )
+                orders.append(step_order)
+            step_orders[lesson_id] = tuple(sorted(orders))
+        self.lessons = MappingProxyType(lessons)
+        self.lesson_ids_by_order = MappingProxyType(by_order)
+        self.steps = MappingProxyType(steps)
+        self.step_orders = MappingProxyType(step_orders)
+        self.loaded_at = time.time() if loaded_at is None else loaded_at
+
+    def lesson_id_by_order(self, lesson_order: int) -> Optional[int]:
+        return self.lesson_ids_by_order.get(lesson_order)
+
+    def step(self, lesson_id: int, step_order: int) -> Optional[CatalogStep]:
+        return self.steps.get((lesson_id, step_order))
+
+    def lesson_steps(self, lesson_id: int) -> Optional[Dict[int, CatalogStep]]:
+        """Steps of a lesson in order, or None if the snapshot has none for it."""
+        orders = self.step_orders.get(lesson_id)
+        if not orders:
+            return None
+        return {order: self.steps[(lesson_id, order)] for order in orders}
+
+    def changed_lessons(self, other: "CatalogSnapshot") -> Set[int]:
+        """Lessons whose steps differ between this snapshot and another."""
+        return {
+            lesson_id
+            for lesson_id in set(self.step_orders) | set(other.step_orders)
+            if self.lesson_steps(lesson_id) != other.lesson_steps(lesson_id)
+        }
+
+
+class CatalogIndex:
+    """
+    Holds the current CatalogSnapshot and keeps it fresh.
+
+    The first lookup loads the catalog synchronously (one query for everything).
+    After that, a daemon thread rebuilds the snapshot every refresh_seconds, and
+    mark_stale() (wired to lesson cache invalidation) triggers an early rebuild.
+    Readers keep using the previous snapshot until the new one is swapped in; a
+    lookup that misses is answered by the caller's direct query.
+
+    A lesson passed to mark_stale() is reported by is_stale() until a snapshot whose
+    load started after the invalidation is swapped in, so callers can query it
+    directly instead of serving the old rows. When a swap changes a lesson's steps,
+    listeners registered with add_listener() are told which lesson changed.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], CatalogRows],
+        refresh_seconds: float = CATALOG_REFRESH_SECONDS,
+        retry_seconds: float = CATALOG_RETRY_SECONDS,
+        background: bool = True,
+    ):
+        self.loader = loader
+        self.refresh_seconds = refresh_seconds
+        self.retry_seconds = retry_seconds
+        self.background = background
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._load_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._failed_at = 0.0
+        # Invalidations not yet covered by a load: { lesson_id: generation }, and for "all lessons"
+        self._stale_lock = threading.Lock()
+        self._generation = 0
+        self._stale: Dict[int, int] = {}
+        self._stale_all = 0
+        self._listeners: List[Callable[[int], None]] = []
+        self._notifying = threading.local()
+        self.loads = 0
+        self.failures = 0
+
+    def current(self) -> Optional[CatalogSnapshot]:
+        """The current snapshot, loading it on first use; None if the catalog cannot be loaded."""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        if self._failed_at and time.monotonic() - self._failed_at < self.retry_seconds:
+            return None
+        with self._load_lock:
+            if self._snapshot is None:
+                self._load()
+            if self._snapshot is not None and self.background:
+                self._start_refresher()
+        return self._snapshot
+
+    def peek(self) -> Optional[CatalogSnapshot]:
+        """The current snapshot without loading it (for callers that must not block)."""
+        return self._snapshot
+
+    def refresh(self) -> bool:
+        """Rebuild the snapshot now; returns False (keeping the old one) if the load failed."""
+        with self._load_lock:
+            return self._load()
+
+    def _load(self) -> bool:
+        with self._stale_lock:
+            started = self._generation
+        try:
+            snapshot = CatalogSnapshot(self.loader() or [])
+        except Exception as e:
+            self.failures += 1
+            self._failed_at = time.monotonic()
+            logger.warning(f"Failed to load catalog snapshot: {e}")
+            return False
+        previous, self._snapshot = self._snapshot, snapshot
+        with self._stale_lock:
+            # Invalidations that arrived during the load may not be in it; they stay stale
+            self._stale = {lesson_id: gen for lesson_id, gen in self._stale.items() if gen > started}
+            if self._stale_all <= started:
+                self._stale_all = 0
+        self._failed_at = 0.0
+        self.loads += 1
+        logger.info(f"Loaded catalog snapshot: {len(snapshot.lessons)} lessons, {len(snapshot.steps)} steps")
+        if previous is not None:
+            self._notify(sorted(previous.changed_lessons(snapshot)))
+        return True
+
+    def add_listener(self, listener: Callable[[int], None]) -> None:
+        """Register a callback invoked with each lesson whose steps changed in a new snapshot."""
+        self._listeners.append(listener)
+
+    def _notify(self, lesson_ids: List[int]) -> None:
+        self._notifying.active = True
+        try:
+            for lesson_id in lesson_ids:
+                for listener in list(self._listeners):
+                    try:
+                        listener(lesson_id)
+                    except Exception as e:
+                        logger.warning(f"Catalog change listener failed: {e}")
+        finally:
+            self._notifying.active = False
+
+    def notifying(self) -> bool:
+        """True while this thread runs the listeners for a swapped-in snapshot."""
+        return getattr(self._notifying, "active", False)
+
+    def mark_stale(self, lesson_id: Optional[int] = None) -> None:
+        """
+        Record that a lesson (None for all) was written and ask the refresher to rebuild
+        soon (signature matches lesson cache listeners). Calls made by this index's own
+        change listeners are ignored; the new snapshot already has those rows.
+        """
+        if self.notifying():
+            return
+        with self._stale_lock:
+            self._generation += 1
+            if lesson_id is None:
+                self._stale_all = self._generation
+            else:
+                self._stale[lesson_id] = self._generation
+        if self._snapshot is not None:
+            self._wake.set()
+
+    def is_stale(self, lesson_id: Optional[int] = None) -> bool:
+        """Whether the current snapshot may predate a write to the lesson (None: to any lesson)."""
+        with self._stale_lock:
+            if self._stale_all:
+                return True
+            return bool(self._stale) if lesson_id is None else lesson_id in self._stale
+
+    def _start_refresher(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._refresh_loop, name="catalog-refresh", daemon=True)
+        self._thread.start()
+
+    def _refresh_loop(self) -> None:
+        while True:
+            self._wake.wait(self.refresh_seconds)
+            self._wake.clear()
+            self.refresh()
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "loaded": snapshot is not None,
+            "lessons": len(snapshot.lessons) if snapshot else 0,
+            "steps": len(snapshot.steps) if snapshot else 0,
+            "age_seconds": round(time.time() - snapshot.loaded_at, 1) if snapshot else None,
+            "stale_lessons": len(self._stale),
+            "loads": self.loads,
+            "failures": self.failures,
+        }
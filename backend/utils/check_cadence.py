@@ -0,0 +1,271 @@
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Shortest and longest wait between completion checks of one step, in seconds
+CADENCE_MIN_INTERVAL = float(os.getenv("CADENCE_MIN_INTERVAL", "2"))
+CADENCE_MAX_INTERVAL = float(os.getenv("CADENCE_MAX_INTERVAL", "30"))
+# Checks spread over the window where most learners complete a step
+CADENCE_CHECKS_PER_WINDOW = float(os.getenv("CADENCE_CHECKS_PER_WINDOW", "16"))
+# Completions a step needs before its history drives the cadence
+CADENCE_MIN_SAMPLES = int(os.getenv("CADENCE_MIN_SAMPLES", "5"))
+# Steps tracked at once (LRU)
+CADENCE_MAX_STEPS = int(os.getenv("CADENCE_MAX_STEPS", "4096"))
+# JSON file the learned timings are saved to and loaded from; empty keeps them in memory
+CADENCE_STATE_PATH = os.getenv("CADENCE_STATE_PATH", "")
+CADENCE_SAVE_EVERY = int(os.getenv("CADENCE_SAVE_EVERY", "20"))
+
+# Checks are dense between these quantiles of time-to-complete
+CADENCE_WINDOW = (0.1, 0.9)
+
+StepKey = Tuple[int, int]
+
+
+class P2Quantile:
+    """
+    Streaming estimate of one quantile with the P-square algorithm (Jain & Chlamtac):
+    five markers, O(1) memory and time per observation, no stored samples.
+    """
+
+    def __init__(self, q: float):
+        self.q = q
+        self.count = 0
+        # Marker heights, actual positions and desired positions
+        self.heights: List[float] = []
+        self.positions = [1.0, 2.0, 3.0, 4.0, 5.0]
+        self.desired = [1.0, 1 + 2 * q, 1 + 4 * q, 3 + 2 * q, 5.0]
+        self.increments = [0.0, q / 2, q, (1 + q) / 2, 1.0]
+
+    def add(self, x: float) -> None:
+        self.count += 1
+        if self.count <= 5:
+            self.heights.append(x)
+            self.heights.sort()
+            return
+
+        h = self.heights
+        if x < h[0]:
+            h[0] = x
+            k = 0
+        elif x >= h[4]:
+            h[4] = x
+            k = 3
+        else:
+            k = next(i for i in range(4) if h[i] <= x < h[i + 1])
+        for i in range(k + 1, 5):
+            self.positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        for i in (1, 2, 3):
+            d = self.desired[i] - self.positions[i]
+            if (d >= 1 and self.positions[i + 1] - self.positions[i] > 1) or (d <= -1 and self.positions[i - 1] - self.positions[i] < -1):
+                step = 1 if d > 0 else -1
+                height = self._parabolic(i, step)
+                if not h[i - 1] < height < h[i + 1]:
+                    height = self._linear(i, step)
+                h[i] = height
+                self.positions[i] += step
+
+    def _parabolic(self, i: int, d: int) -> float:
+        h, n = self.heights, self.positions
+        return h[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (h[i + 1] - h[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (h[i] - h[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def _linear(self, i: int, d: int) -> float:
+        h, n = self.heights, self.positions
+        return h[i] + d * (h[i + d] - h[i]) / (n[i + d] - n[i])
+
+    def value(self) -> Optional[float]:
+        if not self.heights:
+            return None
+        if self.count <= 5:
+            # Exact quantile of the few samples seen so far
+            return self.heights[min(len(self.heights) - 1, int(round(self.q * (len(self.heights) - 1))))]
+        return self.heights[2]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"q": self.q, "count": self.count, "heights": self.heights, "positions": self.positions, "desired": self.desired}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "P2Quantile":
+        estimator = cls(float(data["q"]))
+        estimator.count = int(data["count"])
+        estimator.heights = [float(v) for v in data["heights"]]
+        estimator.positions = [float(v) for v in data["positions"]]
+        estimator.desired = [float(v) for v in data["desired"]]
+        return estimator
+
+
+class StepTiming:
+    """Time-to-complete distribution of one (lesson, step): streaming low/median/high quantiles."""
+
+    __slots__ = ("low", "median", "high")
+
+    def __init__(self, window: Tuple[float, float] = CADENCE_WINDOW):
+        self.low = P2Quantile(window[0])
+        self.median = P2Quantile(0.5)
+        self.high = P2Quantile(window[1])
+
+    @property
+    def count(self) -> int:
+        return self.median.count
+
+    def add(self, seconds: float) -> None:
+        for estimator in (self.low, self.median, self.high):
+            estimator.add(seconds)
+
+    def quantiles(self) -> Tuple[float, float, float]:
+        return self.low.value(), self.median.value(), self.high.value()
+
+
+class CheckCadence:
+    """
+    Learns how long each (lesson, step) takes to complete and spaces completion checks
+    around it.
+
+    Before a step has CADENCE_MIN_SAMPLES completions the caller's default interval is
+    used. After that, checks are sparse until the low quantile of time-to-complete
+    (waits of up to max_interval), dense between the low and high quantiles (the window
+    is covered by about checks_per_window checks), and back off again once the learner
+    has taken longer than most, so a stuck learner costs few model calls.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = CADENCE_MIN_INTERVAL,
+        max_interval: float = CADENCE_MAX_INTERVAL,
+        checks_per_window: float = CADENCE_CHECKS_PER_WINDOW,
+        min_samples: int = CADENCE_MIN_SAMPLES,
+        max_steps: int = CADENCE_MAX_STEPS,
+        path: Optional[str] = CADENCE_STATE_PATH or None,
+        save_every: int = CADENCE_SAVE_EVERY,
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.checks_per_window = max(1.0, checks_per_window)
+        self.min_samples = min_samples
+        self.max_steps = max_steps
+        self.path = path
+        self.save_every = save_every
+        self._lock = threading.Lock()
+        self._steps: "OrderedDict[StepKey, StepTiming]" = OrderedDict()
+        self._unsaved = 0
+        self.recorded = 0
+        if path:
+            self.load(path)
+
+    def record(self, lesson_id: int, step_order: int, seconds: float) -> None:
+        """Add one observed time-to-complete for a step."""
+        if seconds < 0:
+            return
+        key = (int(lesson_id), int(step_order))
+        with self._lock:
+            timing = self._steps.get(key)
+            if timing is None:
+                timing = self._steps[key] = StepTiming()
+            self._steps.move_to_end(key)
+            timing.add(float(seconds))
+            while len(self._steps) > self.max_steps:
+                self._steps.popitem(last=False)
+            self.recorded += 1
+            self._unsaved += 1
+            should_save = self.path and self._unsaved >= self.save_every
+        if should_save:
+            self.save()
+
+    def quantiles(self, lesson_id: int, step_order: int) -> Optional[Tuple[float, float, float]]:
+        """(low, median, high) time-to-complete, or None until the step has enough history."""
+        with self._lock:
+            timing = self._steps.get((int(lesson_id), int(step_order)))
+            if timing is None or timing.count < self.min_samples:
+                return None
+            return timing.quantiles()
+
+    def next_delay(self, lesson_id: int, step_order: int, elapsed: float, default: float) -> float:
+        """
+        Seconds to wait before the next completion check.
+
+        Args:
+            elapsed: Seconds since the step's popup was shown
+            default: Interval to use while the step has too little history
+
+        Returns:
+            float: Delay before the next check
+        """
+        window = self.quantiles(lesson_id, step_order)
+        if window is None:
+            return default
+        low, _, high = window
+        dense = self._clamp((high - low) / self.checks_per_window)
+        if elapsed < low:
+            # Skip ahead to the start of the window (capped, so early finishers are still seen)
+            return self._clamp(max(low - elapsed, dense))
+        if elapsed <= high:
+            return dense
+        return self._clamp(dense * (1 + (elapsed - high) / max(high - low, self.min_interval)))
+
+    def _clamp(self, delay: float) -> float:
+        return min(self.max_interval, max(self.min_interval, delay))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"steps": len(self._steps), "recorded": self.recorded}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._steps.clear()
+            self._unsaved = 0
+            self.recorded = 0
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        if not path:
+            return
+        with self._lock:
+            data = [
+                {"lesson_id": key[0], "step_order": key[1], "quantiles": [e.to_dict() for e in (t.low, t.median, t.high)]}
+                for key, t in self._steps.items()
+            ]
+            self._unsaved = 0
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as handle:
+                json.dump(data, handle)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Failed to save check cadence to {path}: {e}")
+
+    def load(self, path: str) -> int:
+        """Load saved step timings; returns how many steps were loaded."""
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                data = json.load(handle)
+        except FileNotFoundError:
+            return 0
+        except Exception as e:
+            logger.warning(f"Failed to read check cadence from {path}: {e}")
+            return 0
+        loaded = 0
+        with self._lock:
+            for item in data if isinstance(data, list) else []:
+                try:
+                    timing = StepTiming()
+                    timing.low, timing.median, timing.high = (P2Quantile.from_dict(d) for d in item["quantiles"])
+                    self._steps[(int(item["lesson_id"]), int(item["step_order"]))] = timing
+                    loaded += 1
+                except (KeyError, TypeError, ValueError):
+                    continue
+        logger.info(f"Loaded check cadence for {loaded} step(s) from {path}")
+        return loaded
+
+
+# Global instance for easy import
+check_cadence = CheckCadence()
@@ -0,0 +1,145 @@
+import json
+import logging
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib parser is used without it
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+COURSE_STORE_PATH = os.getenv(
+    "COURSE_STORE_PATH", os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "generated_course.json"))
+)
+# Seconds between checks of the course file's mtime; 0 checks on every lookup
+COURSE_STORE_CHECK_INTERVAL = float(os.getenv("COURSE_STORE_CHECK_INTERVAL", "1"))
+
+# { step_order: { 'name', 'description', 'finish_criteria' } }, as get_lesson_steps_batch returns
+ChapterSteps = Mapping[int, Mapping[str, str]]
+
+
+def _parse_json(raw: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw.decode("utf-8"))
+
+
+class CourseIndex:
+    """Immutable per-chapter index over one version of generated_course.json."""
+
+    __slots__ = ("chapters", "course", "signature")
+
+    def __init__(self, course: List[Dict[str, Any]], signature: Tuple[int, int] = (0, 0)):
+        chapters: Dict[int, ChapterSteps] = {}
+        for lesson in course if isinstance(course, list) else []:
+            chapter = lesson.get("chapter")
+            if chapter is None or chapter in chapters:
+                # The old linear scan returned the first matching chapter
+                continue
+            steps = {}
+            for step in lesson.get("steps", []):
+                step_order = step.get("step")
+                if step_order is None:
+                    continue
+                steps[step_order] = {
+                    "name": step.get("title") or f"Step {step_order}",
+                    "description": step.get("instruction") or "",
+                    "finish_criteria": step.get("finished_criteria") or f"Step {step_order} completion criteria",
+                }
+            # Step dicts are never handed out directly; get_lesson_steps copies them
+            chapters[chapter] = MappingProxyType(steps)
+        self.chapters = MappingProxyType(chapters)
+        self.course = course if isinstance(course, list) else []
+        # (mtime_ns, size) of the file this index was built from
+        self.signature = signature
+
+
+class LocalCourseStore:
+    """
+    generated_course.json indexed by chapter, reloaded when the file changes.
+
+    The file is parsed (with orjson when installed) and indexed once per version.
+    Lookups stat the file at most every check_interval seconds; when its mtime or
+    size changed, a new index is built and swapped in by reference, so readers see
+    either the old or the new course, never a mix. A file that fails to parse (e.g.
+    caught mid-write) keeps the previous index until the next check. on_reload is
+    called after a reload that replaced an earlier index.
+    """
+
+    def __init__(
+        self,
+        path: str = COURSE_STORE_PATH,
+        check_interval: float = COURSE_STORE_CHECK_INTERVAL,
+        on_reload: Optional[Callable[[], None]] = None,
+    ):
+        self.path = path
+        self.check_interval = check_interval
+        self.on_reload = on_reload
+        self._index = CourseIndex([])
+        self._lock = threading.Lock()
+        self._checked_at = float("-inf")
+        self.loads = 0
+        if not self.reload():
+            logger.warning(f"Local course data not loaded from {self.path}")
+
+    def _signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def reload(self, force: bool = False) -> bool:
+        """Re-read the file if it changed (or always with force); returns whether the index was replaced."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            signature = self._signature()
+            if signature is None:
+                return False
+            if not force and signature == self._index.signature:
+                return False
+            try:
+                with open(self.path, "rb") as handle:
+                    course = _parse_json(handle.read())
+            except Exception as error:
+                logger.warning(f"Failed to load local course data: {error}")
+                return False
+            replaced = self.loads > 0
+            self._index = CourseIndex(course, signature)
+            self.loads += 1
+        logger.info(f"Loaded local course data: {len(self._index.chapters)} chapters")
+        if replaced and self.on_reload is not None:
+            try:
+                self.on_reload()
+            except Exception as e:
+                logger.warning(f"Course reload callback failed: {e}")
+        return True
+
+    def _maybe_reload(self) -> None:
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            self.reload()
+
+    @property
+    def index(self) -> CourseIndex:
+        self._maybe_reload()
+        return self._index
+
+    @property
+    def course(self) -> List[Dict[str, Any]]:
+        """The raw course list of the current version."""
+        return self.index.course
+
+    def get_lesson_steps(self, chapter: int) -> Dict[int, Dict[str, str]]:
+        """Steps of one chapter in get_lesson_steps_batch() shape; {} if unknown."""
+        steps = self.index.chapters.get(chapter)
+        if not steps:
+            return {}
+        return {step_order: step.copy() for step_order, step in steps.items()}
+
+    def __len__(self) -> int:
+        return len(self.index.chapters)
@@ -1,11 +1,64 @@
-import json
+import asyncio
+import atexit
 import os
-from typing import Dict, Any, Optional, Tuple
+import threading
+from typing import Dict, Any, List, Optional, Tuple
 from dotenv import load_dotenv
-from supabase import create_client, Client
+
+from .catalog_replica import CATALOG_REPLICA_ENABLED, CATALOG_REPLICA_SYNC_SECONDS, CatalogReplica, postgrest_page_fetcher
+from .catalog_snapshot import CATALOG_REFRESH_SECONDS, CATALOG_SNAPSHOT_ENABLED, CatalogIndex, CatalogRows, CatalogSnapshot
+from .course_store import LocalCourseStore
+from .lesson_cache import lesson_cache
+from .postgrest_pool import DB_HTTP_POOL, DB_TIMEOUT, PostgrestPool, httpx, pool_limits
+from .progress_journal import PROGRESS_JOURNAL_ENABLED, ProgressJournal, ProgressRejected, ProgressRow
 
 load_dotenv()
 
+# Table receiving learner progress upserts, one row per (user_id, lesson_id)
+PROGRESS_TABLE = os.getenv("PROGRESS_TABLE", "user_progress")
+
+
+# Postgres/PostgREST codes for a missing table or column
+_MISSING_SCHEMA_CODES = ("42P01", "42703", "PGRST204", "PGRST205")
+
+
+def is_rejected_write(error: Exception) -> bool:
+    """Whether a PostgREST write failed for good (bad request, missing table or columns) rather than transiently."""
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return 400 <= status < 500 and status not in (408, 429)
+    # supabase-py's APIError carries the PostgREST/Postgres error code instead of the status;
+    # PGRST0xx are connection errors, 22/23/42 are data, constraint and undefined-object errors
+    code = str(getattr(error, "code", "") or "")
+    return code.startswith(("PGRST1", "PGRST2", "PGRST3", "22", "23", "42"))
+
+
+def is_missing_schema(error: Exception) -> bool:
+    """Whether a PostgREST error says the table or one of the written columns does not exist."""
+    if getattr(error, "status_code", None) == 404:
+        return True
+    text = f"{getattr(error, 'code', '')} {error}"
+    return any(code in text for code in _MISSING_SCHEMA_CODES)
+
+
+def create_client(url: str, key: str, options=None):
+    """
+    Create the client used for lesson/step reads.
+
+    By default (DB_HTTP_POOL=1) this is the shared pooled PostgREST client, which has
+    the same table().select().eq()...execute() interface plus execute_async(). With
+    DB_HTTP_POOL=0, or when custom options are given, it is a supabase-py client
+    (imported here because supabase is slow to import).
+    """
+    if options is None and DB_HTTP_POOL and httpx is not None:
+        return PostgrestPool(url, key)
+    from supabase import create_client as supabase_create_client
+
+    if options is None:
+        return supabase_create_client(url, key)
+    return supabase_create_client(url, key, options)
+
+
 class DatabaseContextProvider:
     """Handles database operations and context injection for AI agents using Supabase client."""
     
@@ -13,7 +66,17 @@ class DatabaseContextProvider:
         # Create Supabase client with SSL handling
         url = os.environ.get("SUPABASE_URL")
         key = os.environ.get("SUPABASE_KEY")
-        self.local_course_data = self._load_local_course_data()
+        # Offline/dev fallback; reloaded when lesson_generator rewrites the file
+        self.course_store = LocalCourseStore(on_reload=lesson_cache.invalidate_all)
+        # Whole-catalog snapshot for indexed lookups; misses fall back to direct queries
+        self.catalog: Optional[CatalogIndex] = None
+        # Local SQLite mirror of lesson/step the snapshot is built from (CATALOG_REPLICA=1)
+        self.replica: Optional[CatalogReplica] = None
+        # Write-behind progress journal, opened on first use (see progress_journal.py)
+        self._progress_journal: Optional[ProgressJournal] = None
+        self._progress_lock = threading.Lock()
+        # Why the database refused progress for good; once set, progress is no longer recorded
+        self.progress_rejected: Optional[str] = None
 
         if not url or not key:
             print("Warning: SUPABASE_URL or SUPABASE_KEY not set; using local course data")
@@ -33,7 +96,7 @@ class DatabaseContextProvider:
                 
                 from supabase.lib.client_options import ClientOptions
                 options = ClientOptions()
-                options.client = httpx.Client(verify=False)
+                options.client = httpx.Client(verify=False, limits=pool_limits(), timeout=DB_TIMEOUT)
                 
                 self.sb = create_client(url, key, options)
             except Exception as fallback_error:
@@ -41,36 +104,61 @@ class DatabaseContextProvider:
                 # Create a mock client for testing/fallback
                 self.sb = None
 
-    def _load_local_course_data(self):
-        course_path = os.path.abspath(
-            os.path.join(os.path.dirname(__file__), "..", "generated_course.json")
-        )
-        try:
-            with open(course_path, "r", encoding="utf-8") as handle:
-                return json.load(handle)
-        except Exception as error:
-            print(f"Warning: failed to load local course data: {error}")
-            return []
+        if self.sb is not None and CATALOG_SNAPSHOT_ENABLED:
+            refresh_seconds = CATALOG_REFRESH_SECONDS
+            if CATALOG_REPLICA_ENABLED:
+                self.replica = CatalogReplica(postgrest_page_fetcher(self.sb))
+                # Edited or deleted rows are only seen by a full resync
+                lesson_cache.add_listener(self._request_full_replica_sync)
+                refresh_seconds = CATALOG_REPLICA_SYNC_SECONDS
+            self.catalog = CatalogIndex(self._load_catalog_rows, refresh_seconds=refresh_seconds)
+            # Lesson writes invalidate the lesson cache; invalidated lessons are read directly
+            # until a rebuilt snapshot has them
+            lesson_cache.add_listener(self.catalog.mark_stale)
+            # Rows changed outside the write paths show up in a refresh; drop what was cached from the old ones
+            self.catalog.add_listener(lesson_cache.invalidate)
 
-    def _get_local_lesson_steps(self, lesson_id: int) -> Dict[int, Dict[str, str]]:
-        if not self.local_course_data:
-            return {}
+    def _request_full_replica_sync(self, lesson_id: Optional[int] = None) -> None:
+        # Invalidations raised by a snapshot swap came from the replica itself
+        if self.catalog is not None and self.catalog.notifying():
+            return
+        self.replica.request_full_sync(lesson_id)
 
-        for lesson in self.local_course_data:
-            if lesson.get("chapter") == lesson_id:
-                steps = {}
-                for step in lesson.get("steps", []):
-                    step_order = step.get("step")
-                    if step_order is None:
-                        continue
-                    steps[step_order] = {
-                        "name": step.get("title") or f"Step {step_order}",
-                        "description": step.get("instruction") or "",
-                        "finish_criteria": step.get("finished_criteria")
-                        or f"Step {step_order} completion criteria",
-                    }
-                return steps
-        return {}
+    def _load_catalog_rows(self) -> CatalogRows:
+        """
+        Every lesson with its steps embedded: in one query, or from the local replica
+        after syncing it. At startup a replica synced by an earlier run is served as
+        it is, and a failed sync serves the last synced rows, so catalog reads do not
+        wait on Supabase.
+        """
+        if self.replica is None:
+            resp = self.sb.table("lesson").select("*,step(*)").execute()
+            return resp.data or []
+        if self.replica.synced_at() is None:
+            # Nothing to serve yet; the first sync has to succeed
+            self.replica.sync()
+        elif self.catalog is not None and self.catalog.loads > 0:
+            try:
+                self.replica.sync()
+            except Exception as e:
+                print(f"Warning: catalog replica sync failed; serving rows {self.replica.lag_seconds():.0f}s old: {e}")
+        return self.replica.rows()
+
+    def _snapshot(self, lesson_id: Optional[int] = None, load: bool = True) -> Optional[CatalogSnapshot]:
+        """
+        The catalog snapshot to answer from, or None when there is none or it may predate
+        a write to the lesson (to any lesson if lesson_id is None); callers then query
+        directly. With load=False a missing snapshot is not loaded (for async callers).
+        """
+        if self.catalog is None:
+            return None
+        snapshot = self.catalog.current() if load else self.catalog.peek()
+        if snapshot is None or self.catalog.is_stale(lesson_id):
+            return None
+        return snapshot
+
+    def _get_local_lesson_steps(self, lesson_id: int) -> Dict[int, Dict[str, str]]:
+        return self.course_store.get_lesson_steps(lesson_id)
     
     def get_user_context(self, user_id: str) -> Dict[str, Any]:
         """Retrieve user-specific context from database."""
@@ -102,19 +190,35 @@ class DatabaseContextProvider:
         try:
             if self.sb is None:
                 return None
-            resp = (
-                self.sb
-                .table("lesson")
-                .select("id")
-                .eq("lesson_order", lesson_order)
-                .limit(1)
-                .execute()
-            )
+            snapshot = self._snapshot()
+            lesson_id = snapshot.lesson_id_by_order(lesson_order) if snapshot else None
+            if lesson_id is not None:
+                return lesson_id
+            resp = self._lesson_by_order_query(lesson_order).execute()
             data = resp.data or []
             return data[0]["id"] if data else None
         except Exception as e:
             print(f"Error querying lesson by order {lesson_order}: {e}")
             return None
+
+    async def get_lesson_id_by_order_async(self, lesson_order: int) -> Optional[int]:
+        """Async variant of get_lesson_id_by_order."""
+        try:
+            if self.sb is None:
+                return None
+            snapshot = self._snapshot(load=False)
+            lesson_id = snapshot.lesson_id_by_order(lesson_order) if snapshot else None
+            if lesson_id is not None:
+                return lesson_id
+            resp = await self._execute_async(self._lesson_by_order_query(lesson_order))
+            data = resp.data or []
+            return data[0]["id"] if data else None
+        except Exception as e:
+            print(f"Error querying lesson by order {lesson_order}: {e}")
+            return None
+
+    def _lesson_by_order_query(self, lesson_order: int):
+        return self.sb.table("lesson").select("id").eq("lesson_order", lesson_order).limit(1)
     
     def get_step_context(self, step_id: str) -> str:
         """Get context for a specific learning step."""
@@ -134,33 +238,74 @@ class DatabaseContextProvider:
         try:
             if self.sb is None:
                 return self._get_local_lesson_steps(lesson_id)
-            resp = (
-                self.sb
-                .table("step")
-                .select("step_order,name,description,finish_criteria")
-                .eq("lesson_id", lesson_id)
-                .order("step_order")
-                .execute()
-            )
-            results = resp.data or []
-            lesson_data: Dict[int, Dict[str, str]] = {}
-            for row in results:
-                step_order = row["step_order"]
-                name = row["name"]
-                description = row["description"]
-                finish_criteria = row.get("finish_criteria")
-                lesson_data[step_order] = {
-                    "name": name,
-                    "description": description,
-                    "finish_criteria": finish_criteria if finish_criteria else f"Step {step_order} completion criteria",
-                }
+            lesson_data = self._lesson_steps_from_snapshot(self._snapshot(lesson_id), lesson_id)
             if lesson_data:
-                print(f"Loaded {len(lesson_data)} steps for lesson {lesson_id}")
                 return lesson_data
+            resp = self._lesson_steps_query(lesson_id).execute()
+            return self._lesson_steps_from_rows(lesson_id, resp.data or [])
+        except Exception as e:
+            print(f"Error loading lesson steps for lesson {lesson_id}: {e}")
             return self._get_local_lesson_steps(lesson_id)
+
+    async def get_lesson_steps_batch_async(self, lesson_id: int) -> Dict[int, Dict[str, str]]:
+        """Async variant of get_lesson_steps_batch; shares the pooled connections."""
+        try:
+            if self.sb is None:
+                return self._get_local_lesson_steps(lesson_id)
+            lesson_data = self._lesson_steps_from_snapshot(self._snapshot(lesson_id, load=False), lesson_id)
+            if lesson_data:
+                return lesson_data
+            resp = await self._execute_async(self._lesson_steps_query(lesson_id))
+            return self._lesson_steps_from_rows(lesson_id, resp.data or [])
         except Exception as e:
             print(f"Error loading lesson steps for lesson {lesson_id}: {e}")
             return self._get_local_lesson_steps(lesson_id)
+
+    def _lesson_steps_query(self, lesson_id: int):
+        return (
+            self.sb
+            .table("step")
+            .select("step_order,name,description,finish_criteria")
+            .eq("lesson_id", lesson_id)
+            .order("step_order")
+        )
+
+    def _lesson_steps_from_snapshot(self, snapshot: Optional[CatalogSnapshot], lesson_id: int) -> Dict[int, Dict[str, str]]:
+        steps = snapshot.lesson_steps(lesson_id) if snapshot else None
+        if not steps:
+            return {}
+        return {
+            step_order: {
+                "name": step.name,
+                "description": step.description,
+                "finish_criteria": step.finish_criteria or f"Step {step_order} completion criteria",
+            }
+            for step_order, step in steps.items()
+        }
+
+    def _lesson_steps_from_rows(self, lesson_id: int, results: List[Dict[str, Any]]) -> Dict[int, Dict[str, str]]:
+        lesson_data: Dict[int, Dict[str, str]] = {}
+        for row in results:
+            step_order = row["step_order"]
+            name = row["name"]
+            description = row["description"]
+            finish_criteria = row.get("finish_criteria")
+            lesson_data[step_order] = {
+                "name": name,
+                "description": description,
+                "finish_criteria": finish_criteria if finish_criteria else f"Step {step_order} completion criteria",
+            }
+        if lesson_data:
+            print(f"Loaded {len(lesson_data)} steps for lesson {lesson_id}")
+            return lesson_data
+        return self._get_local_lesson_steps(lesson_id)
+
+    async def _execute_async(self, query):
+        """Await a query; supabase-py builders without execute_async run on a worker thread."""
+        execute_async = getattr(query, "execute_async", None)
+        if execute_async is not None:
+            return await execute_async()
+        return await asyncio.to_thread(query.execute)
     
     def get_step_by_order_and_lesson(self, step_order: int, lesson_id: int) -> Tuple[str, str]:
         """
@@ -176,6 +321,10 @@ class DatabaseContextProvider:
         try:
             if self.sb is None:
                 return "", ""
+            snapshot = self._snapshot(lesson_id)
+            step = snapshot.step(lesson_id, step_order) if snapshot else None
+            if step is not None:
+                return step.name, step.description
             resp = (
                 self.sb
                 .table("step")
@@ -197,7 +346,8 @@ class DatabaseContextProvider:
     def get_step_by_order_and_lesson_order(self, step_order: int, lesson_order: int) -> Tuple[str, str]:
         """
         Get step name and description by step order and lesson order.
-        This is a convenience method that first finds the lesson by order, then the step.
+        This is a convenience method that first finds the lesson by order, then the step;
+        with a loaded catalog snapshot both are dictionary lookups.
         
         Args:
             step_order (int): The step order number to query
@@ -216,10 +366,79 @@ class DatabaseContextProvider:
             print(f"Error querying step by order {step_order} and lesson order {lesson_order}: {e}")
             return "", ""
     
-    def update_user_progress(self, user_id: str, step_id: str, progress_data: Dict[str, Any]) -> bool:
-        """Update user progress in database."""
-        # TODO: Implement database update
-        return True
+    @property
+    def progress_journal(self) -> ProgressJournal:
+        """The progress journal; opening it flushes events left over from a previous run."""
+        journal = self._progress_journal
+        if journal is None:
+            with self._progress_lock:
+                journal = self._progress_journal
+                if journal is None:
+                    journal = ProgressJournal(self.upsert_progress_rows)
+                    # Write what is pending on a clean exit; a crash is covered by the journal file
+                    atexit.register(journal.close)
+                    self._progress_journal = journal
+        return journal
+
+    def update_user_progress(self, user_id: str, lesson_id: int, step_order: int, completed: bool = False) -> bool:
+        """
+        Record a learner's current step. With PROGRESS_JOURNAL=1 the event is
+        journaled locally and written in the next batched upsert; otherwise it is
+        upserted immediately. Once the database has rejected progress for good
+        (see upsert_progress_rows) nothing is recorded.
+
+        Args:
+            user_id (str): The learner
+            lesson_id (int): The lesson being taken
+            step_order (int): The step the learner is on now
+            completed (bool): Whether the lesson was finished
+
+        Returns:
+            bool: Whether the event was journaled or written
+        """
+        if self.progress_rejected is not None:
+            return False
+        try:
+            if PROGRESS_JOURNAL_ENABLED:
+                self.progress_journal.record(user_id, lesson_id, step_order, completed)
+            else:
+                self.upsert_progress_rows([{
+                    "user_id": str(user_id),
+                    "lesson_id": lesson_id,
+                    "step_order": step_order,
+                    "completed": completed,
+                }])
+            return True
+        except ProgressRejected:
+            # Already reported by upsert_progress_rows
+            return False
+        except Exception as e:
+            print(f"Error recording progress for user {user_id}: {e}")
+            return False
+
+    def upsert_progress_rows(self, rows: List[ProgressRow]) -> None:
+        """
+        Upsert progress rows in one request.
+
+        Raises:
+            ProgressRejected: The database refused the write for good; when PROGRESS_TABLE
+                or one of its columns does not exist, progress recording is switched off
+            Exception: A transient failure; the journal keeps the rows and retries
+        """
+        if self.sb is None or not rows:
+            # Offline mode has nowhere to persist progress
+            return
+        try:
+            self.sb.table(PROGRESS_TABLE).upsert(rows, on_conflict="user_id,lesson_id").execute()
+        except Exception as e:
+            if not is_rejected_write(e):
+                raise
+            if is_missing_schema(e):
+                if self.progress_rejected is None:
+                    print(f"Error: {PROGRESS_TABLE} is missing or out of date (see utils/README.md); "
+                          f"no longer recording progress: {e}")
+                self.progress_rejected = str(e)
+            raise ProgressRejected(str(e)) from e
     
     def get_relevant_context(self, context_type: str, identifier: str) -> str:
         """Generic method to get context based on type and identifier."""
@@ -260,6 +479,10 @@ class DatabaseContextProvider:
         try:
             if self.sb is None:
                 return f"Step {step_order} completion criteria"
+            snapshot = self._snapshot(lesson_id)
+            step = snapshot.step(lesson_id, step_order) if snapshot else None
+            if step is not None:
+                return step.finish_criteria or f"Step {step_order} completion criteria"
             resp = (
                 self.sb
                 .table("step")
@@ -279,8 +502,54 @@ class DatabaseContextProvider:
             return f"Step {step_order} completion criteria"
     
     def close_connection(self):
-        """No-op for Supabase client."""
+        """Flush journaled progress and close pooled HTTP connections and the catalog replica."""
+        if self._progress_journal is not None:
+            self._progress_journal.close()
+            self._progress_journal = None
+        if self.replica is not None:
+            self.replica.close()
+            self.replica = None
+        close = getattr(self.sb, "close", None)
+        if close is not None:
+            close()
         return None
 
-# Global instance for easy import
-db_context = DatabaseContextProvider()
+class LazyDatabaseContext:
+    """
+    Stand-in for the DatabaseContextProvider singleton that builds it on first use.
+
+    Attribute reads and writes are forwarded to the real provider, so callers (and
+    tests that monkeypatch its methods) use it exactly like the provider itself.
+    """
+
+    def __init__(self, factory=DatabaseContextProvider):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_instance", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    @property
+    def initialized(self) -> bool:
+        return self._instance is not None
+
+    def initialize(self) -> DatabaseContextProvider:
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                instance = self._instance
+                if instance is None:
+                    instance = self._factory()
+                    object.__setattr__(self, "_instance", instance)
+        return instance
+
+    def __getattr__(self, name):
+        return getattr(self.initialize(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.initialize(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self.initialize(), name)
+
+
+# Global instance for easy import; the Supabase client is created on first use
+db_context = LazyDatabaseContext()
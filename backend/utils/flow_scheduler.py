@@ -0,0 +1,145 @@
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+FLOW_WORKERS = int(os.getenv("FLOW_WORKERS", "8"))
+
+
+class ScheduledFlow:
+    """Handle for one learner's flow registered with the scheduler."""
+
+    def __init__(self, user_id: Optional[str], transition: Callable[[], Optional[float]], on_done: Optional[Callable[[], None]]):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.transition = transition
+        self.on_done = on_done
+        self.cancelled = False
+        self.finished = False
+
+
+class FlowScheduler:
+    """
+    Timer-driven scheduler for learner flows.
+
+    Each flow is a state machine exposed as a transition callable that performs one
+    step (send popup, run a completion check, ...) and returns the delay in seconds
+    until its next step, or None when it is finished. Waiting flows cost one heap
+    entry instead of a sleeping thread; due transitions run on a bounded worker pool.
+    """
+
+    def __init__(self, max_workers: int = FLOW_WORKERS):
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[float, int, ScheduledFlow]] = []
+        self._counter = itertools.count()
+        self._flows: Dict[str, ScheduledFlow] = {}
+        self._by_user: Dict[str, Set[str]] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="flow")
+        self._timer: Optional[threading.Thread] = None
+
+    @property
+    def active(self) -> int:
+        with self._cond:
+            return len(self._flows)
+
+    def schedule(
+        self,
+        transition: Callable[[], Optional[float]],
+        user_id: Optional[str] = None,
+        on_done: Optional[Callable[[], None]] = None,
+        delay: float = 0.0,
+    ) -> ScheduledFlow:
+        """
+        Register a flow whose first transition runs after `delay` seconds.
+
+        Args:
+            transition (callable): Performs one step; returns seconds until the next, or None when done
+            user_id (str): Owner, so the flow can be cancelled when the user disconnects
+            on_done (callable): Called once after the final transition (not on cancellation)
+            delay (float): Seconds before the first transition
+
+        Returns:
+            ScheduledFlow: Handle usable with cancel()
+        """
+        flow = ScheduledFlow(user_id, transition, on_done)
+        with self._cond:
+            self._flows[flow.id] = flow
+            if user_id is not None:
+                self._by_user.setdefault(user_id, set()).add(flow.id)
+            self._push(flow, delay)
+            if self._timer is None or not self._timer.is_alive():
+                self._timer = threading.Thread(target=self._timer_loop, name="flow-timer", daemon=True)
+                self._timer.start()
+        return flow
+
+    def _push(self, flow: ScheduledFlow, delay: float) -> None:
+        heapq.heappush(self._heap, (time.monotonic() + max(0.0, delay), next(self._counter), flow))
+        self._cond.notify()
+
+    def _forget(self, flow: ScheduledFlow) -> None:
+        self._flows.pop(flow.id, None)
+        if flow.user_id is not None:
+            ids = self._by_user.get(flow.user_id)
+            if ids is not None:
+                ids.discard(flow.id)
+                if not ids:
+                    del self._by_user[flow.user_id]
+
+    def cancel(self, flow_id: str) -> bool:
+        """Cancel a flow; its pending timer entry is discarded lazily."""
+        with self._cond:
+            flow = self._flows.get(flow_id)
+            if flow is None:
+                return False
+            flow.cancelled = True
+            self._forget(flow)
+            return True
+
+    def cancel_user(self, user_id: str) -> int:
+        """Cancel every flow owned by a user (e.g. on disconnect); returns how many were cancelled."""
+        with self._cond:
+            ids = list(self._by_user.get(user_id, ()))
+        return sum(self.cancel(flow_id) for flow_id in ids)
+
+    def _timer_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+                    self._cond.wait(timeout)
+                _, _, flow = heapq.heappop(self._heap)
+            if not flow.cancelled:
+                self._executor.submit(self._run, flow)
+
+    def _run(self, flow: ScheduledFlow) -> None:
+        try:
+            delay = flow.transition()
+        except Exception as e:
+            logger.error(f"Flow {flow.id} for user {flow.user_id} failed: {e}")
+            delay = None
+
+        with self._cond:
+            if flow.cancelled:
+                return
+            if delay is not None:
+                self._push(flow, delay)
+                return
+            flow.finished = True
+            self._forget(flow)
+
+        if flow.on_done:
+            try:
+                flow.on_done()
+            except Exception as e:
+                logger.error(f"Flow {flow.id} completion callback failed: {e}")
+
+
+# Global instance for easy import
+flow_scheduler = FlowScheduler()
@@ -0,0 +1,199 @@
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Ticket:
+    __slots__ = ("superseded", "start", "drop", "fail")
+
+    def __init__(
+        self,
+        start: Optional[Callable[[], None]] = None,
+        drop: Optional[Callable[[], None]] = None,
+        fail: Optional[Callable[[Exception], None]] = None,
+    ):
+        self.superseded = False
+        # Set for frames parked by defer(); a frame waiting in run() has none of them
+        self.start = start
+        self.drop = drop
+        self.fail = fail
+
+
+class _UserSlot:
+    __slots__ = ("in_flight", "pending")
+
+    def __init__(self):
+        self.in_flight = False
+        self.pending: Optional[_Ticket] = None
+
+
+def superseded_result() -> Dict[str, Any]:
+    """Result reported for a frame replaced by a newer one before it was analyzed."""
+    return {"status": "superseded", "completed": False, "superseded": True}
+
+
+class LatestFrameCoalescer:
+    """
+    Per-user latest-frame-wins gate around screenshot analysis.
+
+    At most one analysis runs per user, and at most one frame waits behind it. A frame
+    that arrives while another is already waiting replaces it; the replaced caller is
+    released immediately with a superseded result. Work per user therefore stays O(1)
+    regardless of how fast the overlay captures.
+
+    run() holds the caller's thread while its frame waits. defer() is the variant for
+    queued analysis: a waiting frame is only recorded, and is started by done() once
+    the analysis ahead of it finishes, so it never occupies a worker while it waits.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._slots: Dict[str, _UserSlot] = {}
+        self.superseded_count = 0
+
+    def run(self, user_id: str, fn: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Run fn for this user's frame once it is the newest frame and no analysis is in flight.
+
+        Args:
+            user_id (str): User the frame belongs to
+            fn (callable): Analysis to run; its return value is passed through
+
+        Returns:
+            dict: fn's result, or a "superseded" status if a newer frame for the same
+            user arrived while this one was waiting
+        """
+        ticket = None
+        with self._cond:
+            slot = self._slots.setdefault(user_id, _UserSlot())
+            if slot.in_flight or slot.pending is not None:
+                ticket = _Ticket()
+                replaced = self._replace_pending(slot, ticket)
+            else:
+                slot.in_flight = True
+        if ticket is not None:
+            self._drop(replaced)
+            with self._cond:
+                while slot.in_flight and not ticket.superseded:
+                    self._cond.wait()
+                if ticket.superseded:
+                    logger.info(f"Dropped superseded frame for user {user_id}")
+                    return superseded_result()
+                slot.pending = None
+                slot.in_flight = True
+
+        try:
+            return fn()
+        finally:
+            self.done(user_id)
+
+    def defer(
+        self,
+        user_id: str,
+        start: Callable[[], None],
+        drop: Callable[[], None],
+        fail: Optional[Callable[[Exception], None]] = None,
+    ) -> None:
+        """
+        Admit a frame for queued analysis without blocking.
+
+        If nothing is in flight for the user, start() is called now; otherwise the frame
+        becomes the user's pending frame and start() is called by done() when the
+        analysis ahead of it finishes. A pending frame replaced by a newer one is
+        released through its drop() instead, and one whose start() raises when done()
+        calls it is reported through fail(error). The analysis start() launches must
+        call done(user_id) when it finishes.
+
+        Args:
+            user_id (str): User the frame belongs to
+            start (callable): Launches the analysis (e.g. submits it to a job queue)
+            drop (callable): Reports the frame as superseded
+            fail (callable): Reports a deferred frame that could not be started
+
+        Raises:
+            Exception: Whatever start() raised when called immediately; the user's
+                slot is released first
+        """
+        with self._cond:
+            slot = self._slots.setdefault(user_id, _UserSlot())
+            if slot.in_flight or slot.pending is not None:
+                replaced = self._replace_pending(slot, _Ticket(start, drop, fail))
+                start = None
+            else:
+                replaced = None
+                slot.in_flight = True
+        self._drop(replaced)
+        if start is None:
+            return
+        try:
+            start()
+        except Exception:
+            self.done(user_id)
+            raise
+
+    def done(self, user_id: str) -> None:
+        """Mark the user's in-flight analysis finished and start the deferred frame behind it, if any."""
+        while True:
+            with self._cond:
+                slot = self._slots.get(user_id)
+                if slot is None:
+                    return
+                ticket = slot.pending
+                if ticket is not None and ticket.start is not None:
+                    # Hand the slot straight to the deferred frame
+                    slot.pending = None
+                else:
+                    slot.in_flight = False
+                    if slot.pending is None:
+                        self._slots.pop(user_id, None)
+                    self._cond.notify_all()
+                    return
+            try:
+                ticket.start()
+                return
+            except Exception as e:
+                logger.error(f"Failed to start deferred frame for user {user_id}: {e}")
+                self._fail(ticket, e)
+
+    def _replace_pending(self, slot: _UserSlot, ticket: _Ticket) -> Optional[_Ticket]:
+        # Caller holds self._cond; returns the replaced deferred frame for _drop()
+        replaced = slot.pending
+        if replaced is not None:
+            replaced.superseded = True
+            self.superseded_count += 1
+        slot.pending = ticket
+        self._cond.notify_all()
+        return replaced if replaced is not None and replaced.drop is not None else None
+
+    def _fail(self, ticket: _Ticket, error: Exception) -> None:
+        if ticket.fail is None:
+            return
+        try:
+            ticket.fail(error)
+        except Exception as e:
+            logger.error(f"Failed to report deferred frame that did not start: {e}")
+
+    def _drop(self, ticket: Optional[_Ticket]) -> None:
+        if ticket is None:
+            return
+        try:
+            ticket.drop()
+        except Exception as e:
+            logger.error(f"Failed to report superseded frame: {e}")
+
+    @property
+    def depth(self) -> int:
+        """Analyses in flight plus frames waiting behind them, across all users."""
+        with self._cond:
+            return sum(slot.in_flight + (slot.pending is not None) for slot in self._slots.values())
+
+    def clear(self) -> None:
+        with self._cond:
+            self._slots.clear()
+            self.superseded_count = 0
+
+
+# Global instance for easy import
+frame_coalescer = LatestFrameCoalescer()
@@ -0,0 +1,137 @@
+import base64
+import binascii
+import hashlib
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple, Union
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; fall back to exact byte hashing
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Users whose last frame is remembered; the least recently active are dropped past this
+FRAME_DEDUP_MAX_USERS = int(os.getenv("FRAME_DEDUP_MAX_USERS", "10000"))
+
+
+def decode_image_bytes(image: Union[str, bytes, bytearray, memoryview]) -> bytes:
+    """Return raw image bytes from either a base64 string or a bytes-like payload."""
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return bytes(image)
+    if not image:
+        return b""
+    # Tolerate data URLs ("data:image/png;base64,....")
+    if image.startswith("data:") and "," in image:
+        image = image.split(",", 1)[1]
+    try:
+        return base64.b64decode(image)
+    except (binascii.Error, ValueError):
+        return image.encode("utf-8")
+
+
+def compute_fingerprint(image: Union[str, bytes, bytearray, memoryview]) -> Optional[str]:
+    """
+    Compute a content hash (SHA-256) of a screenshot's decoded pixels.
+
+    Frames with identical pixels hash to the same value even when the encoder
+    produced different bytes; any pixel change, however small (a new layer label, a
+    frame drawn on the canvas), gives a different hash. Perceptual hashes are not
+    used: at screen scale they cannot see the small edits lessons ask for. Without
+    Pillow, or for payloads Pillow cannot decode, the raw bytes are hashed instead.
+
+    Args:
+        image: Base64 string or raw bytes of the screenshot
+
+    Returns:
+        Optional[str]: Hex digest, or None for an empty payload
+    """
+    raw = decode_image_bytes(image)
+    if not raw:
+        return None
+
+    if Image is not None:
+        try:
+            with Image.open(io.BytesIO(raw)) as img:
+                # Normalize the pixel format so RGB and RGBA/palette encodings of one screen match
+                pixels = img.convert("RGBA")
+                digest = hashlib.sha256(f"{pixels.width}x{pixels.height}:".encode("ascii"))
+                digest.update(pixels.tobytes())
+            return digest.hexdigest()
+        except Exception as e:
+            logger.debug(f"Pixel hash unavailable, using byte digest: {e}")
+
+    return hashlib.sha256(raw).hexdigest()
+
+
+class FrameDeduplicator:
+    """
+    Remembers the last analyzed frame per user so exact repeats can reuse its verdict.
+
+    Only frames whose pixels are identical to the last analyzed one match; any change
+    is analyzed. Entries are scoped to a context (e.g. lesson and step) because a
+    verdict is only valid for the finish criteria it was computed against. At most
+    max_users users are remembered, least recently active dropped first.
+    """
+
+    def __init__(self, max_users: int = FRAME_DEDUP_MAX_USERS):
+        self.max_users = max(1, max_users)
+        self._lock = threading.Lock()
+        # { user_id: (context, fingerprint, verdict) }, least recently remembered first
+        self._last: "OrderedDict[str, Tuple[Tuple, str, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, user_id: str, context: Tuple, fingerprint: Optional[str]) -> Optional[str]:
+        """
+        Return the previous verdict if this frame is identical to the user's last analyzed frame.
+
+        Args:
+            user_id (str): User the frame belongs to
+            context (tuple): Scope the verdict is valid for, e.g. (lesson_id, step_order)
+            fingerprint (str): Fingerprint of the incoming frame
+
+        Returns:
+            Optional[str]: The reused verdict, or None if the frame must be analyzed
+        """
+        if fingerprint is None:
+            return None
+        with self._lock:
+            entry = self._last.get(user_id)
+            if entry and entry[0] == context and entry[1] == fingerprint:
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            return None
+
+    def remember(self, user_id: str, context: Tuple, fingerprint: Optional[str], verdict: str) -> None:
+        """Record the verdict computed for a user's frame."""
+        if fingerprint is None:
+            return
+        with self._lock:
+            self._last[user_id] = (context, fingerprint, verdict)
+            self._last.move_to_end(user_id)
+            while len(self._last) > self.max_users:
+                self._last.popitem(last=False)
+
+    def forget(self, user_id: str) -> None:
+        """Drop the remembered frame for a user."""
+        with self._lock:
+            self._last.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._last.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._last)
+
+
+# Global instance for easy import
+frame_deduplicator = FrameDeduplicator()
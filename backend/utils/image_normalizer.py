@@ -0,0 +1,196 @@
+import io
+import logging
+import os
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+from .frame_fingerprint import decode_image_bytes
+from .screenshot_ingest import ImagePayload
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; frames are forwarded unchanged without it
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Normalization settings (overridable per call)
+MAX_EDGE = int(os.getenv("SCREENSHOT_MAX_EDGE", "1568"))
+GRAYSCALE = os.getenv("SCREENSHOT_GRAYSCALE", "0") == "1"
+OUTPUT_FORMAT = os.getenv("SCREENSHOT_FORMAT", "JPEG").upper()
+BYTE_BUDGET = int(os.getenv("SCREENSHOT_BYTE_BUDGET", str(300 * 1024)))
+NORMALIZE_WORKERS = int(os.getenv("SCREENSHOT_NORMALIZE_WORKERS", "2"))
+
+QUALITY_LADDER = (85, 75, 65, 50, 40)
+MAX_DOWNSCALE_ROUNDS = 3
+
+_MEDIA_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+_COLOR_WORDS = re.compile(
+    r"\b(colou?rs?|red|green|blue|yellow|orange|purple|pink|black|white|gr[ae]y|fill|gradient|hex|#[0-9a-f]{3,6})\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class NormalizedImage:
+    """Result of normalizing a screenshot for the vision call."""
+
+    data: bytes
+    media_type: str
+    original_bytes: int
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - len(self.data)
+
+
+class NormalizationStats:
+    """Running totals of bytes in/out across normalized frames."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def record(self, result: NormalizedImage) -> None:
+        with self._lock:
+            self.frames += 1
+            self.bytes_in += result.original_bytes
+            self.bytes_out += len(result.data)
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_in - self.bytes_out
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "frames": self.frames,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "bytes_saved": self.bytes_in - self.bytes_out,
+            }
+
+
+normalization_stats = NormalizationStats()
+_executor = ThreadPoolExecutor(max_workers=NORMALIZE_WORKERS, thread_name_prefix="image-normalize")
+
+
+def sniff_media_type(raw: bytes) -> str:
+    """Best-effort media type from magic bytes; defaults to PNG (the overlay's capture format)."""
+    if raw.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if raw[:4] == b"RIFF" and raw[8:12] == b"WEBP":
+        return "image/webp"
+    if raw[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    return "image/png"
+
+
+def grayscale_allowed(finish_criteria: Optional[str]) -> bool:
+    """Grayscale is only safe when the finish criteria do not talk about colors."""
+    return not _COLOR_WORDS.search(finish_criteria or "")
+
+
+def _encode(img, image_format: str, quality: int) -> bytes:
+    buf = io.BytesIO()
+    if image_format == "PNG":
+        img.save(buf, format="PNG", optimize=True)
+    elif image_format == "WEBP":
+        img.save(buf, format="WEBP", quality=quality, method=4)
+    else:
+        img.save(buf, format="JPEG", quality=quality, optimize=True)
+    return buf.getvalue()
+
+
+def normalize_image(
+    image: ImagePayload,
+    max_edge: Optional[int] = None,
+    grayscale: Optional[bool] = None,
+    image_format: Optional[str] = None,
+    byte_budget: Optional[int] = None,
+) -> NormalizedImage:
+    """
+    Decode, downscale and re-encode a screenshot to fit a byte budget.
+
+    The image is scaled so its longest edge is at most max_edge, optionally converted
+    to grayscale, then encoded at decreasing quality (and, if needed, smaller sizes)
+    until it fits byte_budget. If the re-encoded frame would be larger than the
+    original, or the frame cannot be decoded, the original bytes are returned with
+    their sniffed media type.
+
+    Args:
+        image: Base64 string or raw image bytes
+        max_edge (int): Longest edge in pixels after downscaling
+        grayscale (bool): Convert to 8-bit grayscale
+        image_format (str): "JPEG" or "WEBP"
+        byte_budget (int): Target encoded size in bytes
+
+    Returns:
+        NormalizedImage: Encoded bytes, media type and size accounting
+    """
+    raw = decode_image_bytes(image)
+    max_edge = max_edge or MAX_EDGE
+    grayscale = GRAYSCALE if grayscale is None else grayscale
+    image_format = (image_format or OUTPUT_FORMAT).upper()
+    byte_budget = byte_budget or BYTE_BUDGET
+
+    passthrough = NormalizedImage(data=raw, media_type=sniff_media_type(raw), original_bytes=len(raw))
+    if Image is None or not raw or image_format not in _MEDIA_TYPES:
+        return passthrough
+
+    try:
+        with Image.open(io.BytesIO(raw)) as src:
+            src.draft("L" if grayscale else "RGB", (max_edge, max_edge))
+            if grayscale:
+                img = src.convert("L")
+            elif src.mode in ("RGBA", "LA", "P"):
+                # Flatten transparency onto white; JPEG has no alpha channel
+                rgba = src.convert("RGBA")
+                img = Image.new("RGB", rgba.size, (255, 255, 255))
+                img.paste(rgba, mask=rgba.getchannel("A"))
+            else:
+                img = src.convert("RGB")
+
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS, reducing_gap=3.0)
+
+        data = b""
+        for _ in range(MAX_DOWNSCALE_ROUNDS + 1):
+            for quality in QUALITY_LADDER:
+                data = _encode(img, image_format, quality)
+                if len(data) <= byte_budget:
+                    break
+            if len(data) <= byte_budget:
+                break
+            img = img.resize((max(1, img.width * 3 // 4), max(1, img.height * 3 // 4)), Image.LANCZOS)
+    except Exception as e:
+        logger.warning(f"Image normalization failed; forwarding original frame: {e}")
+        return passthrough
+
+    if len(data) >= len(raw):
+        result = passthrough
+    else:
+        result = NormalizedImage(
+            data=data,
+            media_type=_MEDIA_TYPES[image_format],
+            original_bytes=len(raw),
+            width=img.width,
+            height=img.height,
+        )
+    normalization_stats.record(result)
+    logger.info(
+        f"Normalized frame {len(raw)} -> {len(result.data)} bytes "
+        f"(saved {result.bytes_saved}, {result.media_type})"
+    )
+    return result
+
+
+def submit_normalization(image: ImagePayload, **kwargs) -> "Future[NormalizedImage]":
+    """Start normalize_image on the shared worker pool; callers do other work and wait on the future only when they need the bytes."""
+    return _executor.submit(normalize_image, image, **kwargs)
@@ -1,12 +1,31 @@
+import importlib
 import os
 import logging
+import threading
 import time
-from typing import Dict, Optional, Union
+from typing import Callable, Dict, List, Optional, Union
 from datetime import datetime
 
 from dotenv import load_dotenv
-import letta_client
+from .agent_pool import AgentPool, AgentSpec
+from .capture_control import capture_controller
+from .check_cadence import check_cadence
 from .database_context import db_context
+from .flow_scheduler import flow_scheduler
+from .frame_fingerprint import compute_fingerprint, frame_deduplicator
+from .image_normalizer import GRAYSCALE, grayscale_allowed, submit_normalization
+from .lesson_cache import lesson_cache
+from .local_verifier import LOCAL_VERIFIER_ENABLED, local_verifier_chain
+from .popup_bus import popup_bus
+from .progress_journal import PROGRESS_JOURNAL_ENABLED
+from .screenshot_ingest import ImagePayload, to_base64
+from .step_payloads import StepPayload, step_payloads
+from .tile_diff import tile_change_detector
+from .user_state_store import UserStateStore, create_user_state_store
+from .verdict_batcher import VerdictBatcher, VerdictRequest
+from .verdict_cache import make_key, verdict_cache
+from .verdict_stream import VERDICT_MAX_TOKENS, VERDICT_STREAMING, Verdict, consume_verdict_stream
+from .verifier_resilience import CircuitOpenError, VerifierTimeout, verifier_guard
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -15,43 +34,62 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 LETTA_API_KEY = os.getenv("LETTA_API_KEY")
-client = None
+# Seconds between completion checks in learning flows, until a step has completion history
+FLOW_CHECK_INTERVAL = float(os.getenv("FLOW_CHECK_INTERVAL", "10"))
 
-if not LETTA_API_KEY:
-    logger.warning("LETTA_API_KEY not set; screenshot analysis will return NO by default.")
-else:
-    try:
-        client = letta_client.Letta(
-            token=LETTA_API_KEY
-        )
-    except Exception as e:
-        logger.warning(f"Failed to initialize Lettuce client: {e}")
-        client = None
+# letta_client, client, verifier_pool and task_completion_agent are created on first use
+# by _ensure_letta() (importing letta_client and creating agents is slow); reading them
+# as module attributes, e.g. learning_agent.client, triggers initialization.
+_letta_lock = threading.Lock()
+_letta_ready = False
+_LAZY_LETTA_ATTRS = ("letta_client", "client", "verifier_pool", "task_completion_agent")
 
 # In-memory caches/state
 # lesson_cache: { lesson_id: { step_order: { 'name', 'description', 'finish_criteria' } } }
-lesson_cache: Dict[int, Dict[int, Dict[str, str]]] = {}
+# Bounded LRU+TTL; lesson write paths invalidate it (see lesson_cache.py). Verdicts
+# remembered for unchanged frames were judged against the old criteria, so drop them too.
+lesson_cache.add_listener(lambda lesson_id: frame_deduplicator.clear())
+lesson_cache.add_listener(step_payloads.forget)
+# Per-user frame state goes when the capture controller drops an idle user
+capture_controller.add_listener(frame_deduplicator.forget)
+capture_controller.add_listener(tile_change_detector.forget)
 
 # user_state: { user_id: { 'lesson_id': int, 'step_order': int, 'popup_sent_for_step': bool } }
-user_state: Dict[str, Dict[str, Union[int, bool]]] = {}
+# Backend chosen by USER_STATE_BACKEND (memory, sqlite or redis); see user_state_store.py
+user_state: UserStateStore = create_user_state_store()
+
+
+def _load_lesson_steps(lesson_id: int) -> Dict[int, Dict[str, str]]:
+    logger.info(f"Loading all lesson steps in batch for lesson {lesson_id}...")
+    return db_context.get_lesson_steps_batch(lesson_id)
 
 
 def _ensure_lesson_loaded(lesson_id: int) -> Optional[Dict[int, Dict[str, str]]]:
     """Load all steps for a lesson into memory if not already cached."""
     try:
-        if lesson_id not in lesson_cache:
-            logger.info(f"Loading all lesson steps in batch for lesson {lesson_id}...")
-            lesson_cache[lesson_id] = db_context.get_lesson_steps_batch(lesson_id)
-        return lesson_cache[lesson_id]
+        return lesson_cache.get_or_load(lesson_id, _load_lesson_steps)
     except Exception as e:
         logger.error(f"Failed to load lesson {lesson_id}: {e}")
         return None
 
 
-def handle_screenshot_event(user_id: str, lesson_id: int, step_order: int, base64_image: str) -> Dict[str, Union[str, int]]:
+def _send_step_popup(user_id: str, lesson_id: int, payload: StepPayload, base64_image: ImagePayload) -> bool:
+    """Send the step's popup unless it was already sent; returns whether this call sent it."""
+    if not user_state.claim_popup(user_id, lesson_id, payload.step_order):
+        return False
+    try:
+        generate_and_send_popup_message(base64_image, payload.popup_message, user_id)
+    except Exception:
+        user_state.release_popup(user_id)
+        raise
+    return True
+
+
+def handle_screenshot_event(user_id: str, lesson_id: int, step_order: int, base64_image: ImagePayload) -> Dict[str, Union[str, int]]:
     """
     Event-driven handler: called whenever a new screenshot arrives.
     Uses in-memory lesson data; sends popup once per step, then checks completion on subsequent screenshots.
+    The screenshot may be a base64 string or raw bytes; it is passed through without copying.
     """
     try:
         # Ensure lesson data is cached
@@ -60,35 +98,60 @@ def handle_screenshot_event(user_id: str, lesson_id: int, step_order: int, base6
             logger.warning(f"Lesson {lesson_id} or step {step_order} not found")
             return {"completed": False, "error": "Lesson or step not found"}
 
-        # Update user state
-        state = user_state.setdefault(user_id, {"lesson_id": lesson_id, "step_order": step_order, "popup_sent_for_step": False})
-        state["lesson_id"] = lesson_id
-        state["step_order"] = step_order
-
-        step_info = lesson_data[step_order]
-        step_description = step_info["description"]
-        finish_criteria = step_info["finish_criteria"]
+        # Per-step payloads are prebuilt once per lesson load
+        payloads = step_payloads.get(lesson_id, lesson_data)
+        payload = payloads[step_order]
+        finish_criteria = payload.finish_criteria
 
-        # If popup not yet sent for this step, generate and send it now, then return
-        if not state.get("popup_sent_for_step"):
-            popup_message = generate_and_send_popup_message(base64_image, step_description, user_id)
-            state["popup_sent_for_step"] = True
+        # Update user state; if popup not yet sent for this step, generate and send it now, then return
+        if _send_step_popup(user_id, lesson_id, payload, base64_image):
             return {"completed": False, "step_order": step_order}
 
-        # Otherwise, check completion using this latest screenshot
-        completion_result = analyze_screenshot(base64_image, finish_criteria, lesson_id)
+        # Otherwise, check completion using this latest screenshot. Frames that look the
+        # same as the last analyzed one for this step reuse its verdict instead of a model call.
+        fingerprint = compute_fingerprint(base64_image)
+        dedup_context = (lesson_id, step_order)
+        completion_result = frame_deduplicator.lookup(user_id, dedup_context, fingerprint)
+        elapsed = None
+        if completion_result is None:
+            # Model checks are spaced around this step's typical completion time (see check_cadence.py);
+            # elapsed is the middle of the interval the step was completed in (see claim_check)
+            due, elapsed = user_state.claim_check(
+                user_id, step_order, lambda seconds: check_cadence.next_delay(lesson_id, step_order, seconds, 0.0),
+            )
+            if not due:
+                return {"completed": False, "step_order": step_order, "deferred": True}
+            # Localized edits are verified from a crop of the changed region
+            analysis_image = tile_change_detector.select_analysis_image(user_id, dedup_context, base64_image)
+            completion_result = analyze_screenshot(analysis_image, finish_criteria, lesson_id, payload=payload)
+            # Only whole-frame verdicts are replayed for identical frames: a NO from a crop
+            # may miss criteria outside it, so the next identical frame is checked whole
+            if analysis_image is base64_image and completion_result.strip().upper() in ("YES", "NO"):
+                frame_deduplicator.remember(user_id, dedup_context, fingerprint, completion_result)
+        else:
+            logger.info(f"Frame unchanged for user {user_id}; reusing verdict {completion_result}")
+            if completion_result.strip().upper() != "YES":
+                return {"completed": False, "step_order": step_order, "deduplicated": True}
         is_completed = completion_result.strip().upper() == "YES"
         
         if is_completed:
-            next_step_order = step_order + 1
-            if next_step_order in lesson_data:
-                # Advance to next step; reset popup flag
-                state["step_order"] = next_step_order
-                state["popup_sent_for_step"] = False
-                return {"completed": True, "next_step_order": next_step_order}
+            if elapsed is not None:
+                check_cadence.record(lesson_id, step_order, elapsed)
+            next_step_order = payload.next_step_order
+            if next_step_order is not None:
+                # Advance to next step and send its popup right away instead of on the next frame
+                popup_sent = False
+                if user_state.advance_step(user_id, step_order, next_step_order):
+                    # Written to user_progress, in batches with PROGRESS_JOURNAL=1 (see progress_journal.py)
+                    db_context.update_user_progress(user_id, lesson_id, next_step_order)
+                    popup_sent = _send_step_popup(user_id, lesson_id, payloads[next_step_order], base64_image)
+                return {"completed": True, "next_step_order": next_step_order, "popup_sent": popup_sent}
             else:
                 # Lesson complete
+                db_context.update_user_progress(user_id, lesson_id, step_order, completed=True)
                 user_state.pop(user_id, None)
+                frame_deduplicator.forget(user_id)
+                tile_change_detector.forget(user_id)
                 return {"completed": True, "lesson_completed": True}
 
         # Not completed; wait for another screenshot
@@ -110,29 +173,194 @@ OUTPUT FORMAT:
 - Do not provide explanations, reasoning, or additional text
 - Be precise: only say "YES" if the screenshot exactly matches the finish criteria"""
 
-task_completion_agent = None
+TASK_COMPLETION_MODEL = "openai/gpt-4o"
+
+TASK_COMPLETION_AGENT_SPEC = AgentSpec(
+    name="Task Completion Decider",
+    system=SYSTEM_PROMPT,
+    model=TASK_COMPLETION_MODEL,
+    embedding="openai/text-embedding-3-small",
+    max_tokens=VERDICT_MAX_TOKENS,
+)
+
+
+def _ensure_letta() -> None:
+    """Import letta_client, create the client and the verifier agent pool (once)."""
+    global _letta_ready, letta_client, client, verifier_pool, task_completion_agent
+    if _letta_ready:
+        return
+    with _letta_lock:
+        if _letta_ready:
+            return
+        letta_client = importlib.import_module("letta_client")
+        client = None
+        if not LETTA_API_KEY:
+            logger.warning("LETTA_API_KEY not set; screenshot analysis will return NO by default.")
+        else:
+            try:
+                client = letta_client.Letta(
+                    token=LETTA_API_KEY
+                )
+            except Exception as e:
+                logger.warning(f"Failed to initialize Lettuce client: {e}")
+                client = None
+
+        # Verifier agents are pooled and their ids persisted, so restarts reuse them (AGENT_POOL_SIZE)
+        verifier_pool = None
+        task_completion_agent = None
+        if client:
+            try:
+                verifier_pool = AgentPool(client, TASK_COMPLETION_AGENT_SPEC, token=LETTA_API_KEY)
+                task_completion_agent = verifier_pool.primary()
+                if verifier_pool.size > 1:
+                    # Fill the rest of the pool off the request path
+                    threading.Thread(target=verifier_pool.warm, name="agent-pool-warm", daemon=True).start()
+                logger.info("Successfully created Lettuce task completion agent")
+            except Exception as e:
+                logger.warning(f"Failed to create Lettuce task agent: {e}")
+                verifier_pool = None
+                task_completion_agent = None
+        _letta_ready = True
+
+
+def __getattr__(name: str):
+    if name in _LAZY_LETTA_ATTRS:
+        _ensure_letta()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def warm_up() -> None:
+    """Initialize Letta and the database context ahead of the first request."""
+    _ensure_letta()
+    db_context.initialize()
+    if PROGRESS_JOURNAL_ENABLED:
+        # Opening the journal flushes progress a previous run did not get to write
+        db_context.progress_journal
+
+
+def _send_verdict_message(content: list, early_stop: bool = True, agent=None) -> Verdict:
+    """
+    Send one user message to a pooled task completion agent.
 
-if client:
+    The reply is streamed when the client supports it and VERDICT_STREAMING is on; with
+    early_stop the stream is cut at the first unambiguous YES/NO. Otherwise the full
+    response is awaited and its first content taken. An agent already borrowed from
+    verifier_pool may be passed in; otherwise one is borrowed for the exchange.
+    """
+    _ensure_letta()
+    if agent is None:
+        with verifier_pool.acquire() as agent:
+            return _send_verdict_message(content, early_stop, agent)
+    started_at = time.perf_counter()
+    messages = [letta_client.MessageCreate(role="user", content=content)]
+    create_stream = getattr(client.agents.messages, "create_stream", None) if VERDICT_STREAMING else None
     try:
-        task_completion_agent = client.agents.create(
-            name="Task Completion Decider",
-            system=SYSTEM_PROMPT,
-            model="openai/gpt-4o",
-            embedding="openai/text-embedding-3-small",
-            tools=[],
-            include_base_tools=False
+        if create_stream is not None:
+            stream = create_stream(agent_id=agent.id, messages=messages, stream_tokens=True)
+            return consume_verdict_stream(stream, started_at, early_stop=early_stop)
+        response = client.agents.messages.create(
+            agent_id=agent.id,
+            messages=messages,
         )
-        logger.info("Successfully created Lettuce task completion agent")
     except Exception as e:
-        logger.warning(f"Failed to create Lettuce task agent: {e}")
-        task_completion_agent = None
+        if getattr(e, "status_code", None) == 404:
+            # Persisted agent was deleted remotely; the pool creates a replacement
+            verifier_pool.discard(agent)
+        raise
+    latency_ms = (time.perf_counter() - started_at) * 1000
+    for message in response.messages or []:
+        if hasattr(message, 'content') and message.content:
+            if not early_stop:
+                return Verdict(None, str(message.content), "model", latency_ms)
+            return Verdict.from_text(str(message.content), "model", latency_ms)
+    return Verdict(None, "", "model", latency_ms)
+
+
+def _image_content(request: VerdictRequest):
+    return letta_client.ImageContent(
+        source={
+            "type": "base64",
+            "media_type": request.media_type,
+            "data": request.image,
+        }
+    )
+
+
+def _send_single_check(request: VerdictRequest, agent=None) -> Verdict:
+    """Completion check for one screenshot, on the given pooled agent if one is passed."""
+    _ensure_letta()
+    TextContent = letta_client.TextContent
+    return _send_verdict_message([
+        _image_content(request),
+        TextContent(
+            text=f"FINISH CRITERIA: {request.finish_criteria}\n\nIs the task completed? Answer YES or NO."
+        ),
+    ], agent=agent)
+
+
+def _send_batch_check(requests: List[VerdictRequest]) -> Optional[str]:
+    """Completion check for several independent screenshots in one message, answered per image."""
+    _ensure_letta()
+    TextContent = letta_client.TextContent
+    content = [
+        TextContent(
+            text=f"You will see {len(requests)} independent screenshots, each with its own finish criteria. "
+            "Judge each one separately."
+        )
+    ]
+    for index, request in enumerate(requests, start=1):
+        content.append(TextContent(text=f"IMAGE {index}"))
+        content.append(_image_content(request))
+        content.append(TextContent(text=f"IMAGE {index} FINISH CRITERIA: {request.finish_criteria}"))
+    content.append(
+        TextContent(
+            text="For every image, answer on its own line as '<number>: YES' or '<number>: NO', "
+            f"for numbers 1 to {len(requests)}. No other text."
+        )
+    )
+    return _send_verdict_message(content, early_stop=False).text or None
+
 
+verdict_batcher = VerdictBatcher(
+    send_single=lambda request: _send_single_check(request).text or None,
+    send_batch=_send_batch_check,
+)
 
-def analyze_screenshot(base64_image: str, finish_criteria: str, lesson_id: Optional[str] = None) -> str:
-    """Analyze screenshot to determine if task completion criteria are met."""
+
+def analyze_screenshot(
+    base64_image: ImagePayload,
+    finish_criteria: str,
+    lesson_id: Optional[str] = None,
+    payload: Optional[StepPayload] = None,
+) -> str:
+    """Analyze screenshot (base64 string or raw bytes) to determine if task completion criteria are met."""
+    return check_completion(base64_image, finish_criteria, lesson_id, payload=payload).text
+
+
+def check_completion(
+    base64_image: ImagePayload,
+    finish_criteria: str,
+    lesson_id: Optional[str] = None,
+    payload: Optional[StepPayload] = None,
+) -> Verdict:
+    """
+    Decide whether a screenshot meets the finish criteria.
+
+    payload is the step's prebuilt StepPayload (see step_payloads.py); when given, its
+    criteria hash, expected OCR text and grayscale flag are used instead of being
+    derived from finish_criteria again.
+
+    Returns:
+        Verdict: decision ("YES"/"NO", or None if undetermined), where it came from
+        (cache, local, stream, model, batch, fallback, timeout, circuit_open, unavailable,
+        error), latency and output tokens
+    """
+    started_at = time.perf_counter()
+    _ensure_letta()
     if not client or not task_completion_agent:
         logger.warning("Screenshot analysis unavailable; returning NO.")
-        return "NO"
+        return Verdict("NO", "NO", "unavailable")
 
     MessageCreate = getattr(letta_client, "MessageCreate", None)
     TextContent = getattr(letta_client, "TextContent", None)
@@ -140,7 +368,40 @@ def analyze_screenshot(base64_image: str, finish_criteria: str, lesson_id: Optio
 
     if not MessageCreate or not TextContent or not ImageContent:
         logger.warning("Letta message types unavailable; returning NO.")
-        return "NO"
+        return Verdict("NO", "NO", "unavailable")
+
+    # Downscale/re-encode for the model on the normalization pool while the cache, the
+    # local verifiers and the context lookup run here; only the model path waits for it
+    normalization = submit_normalization(
+        base64_image,
+        grayscale=GRAYSCALE and (payload.grayscale_ok if payload is not None else grayscale_allowed(finish_criteria)),
+    )
+
+    # Identical screens checked against the same criteria share one verdict, across users
+    cache_key = None
+    fingerprint = compute_fingerprint(base64_image)
+    if fingerprint is not None:
+        cache_key = make_key(
+            fingerprint, finish_criteria, TASK_COMPLETION_MODEL,
+            criteria_key=payload.criteria_key if payload is not None else None,
+        )
+        cached = verdict_cache.get(cache_key)
+        if cached is not None:
+            normalization.cancel()
+            logger.info(f"Verdict cache hit: {cached}")
+            return Verdict.from_text(cached, "cache", (time.perf_counter() - started_at) * 1000)
+
+    # Cheap CPU-only checks (blank screen, OCR of expected text) answer confidently when they can;
+    # a weaker local verdict is kept in case the model is unavailable
+    fallback = None
+    if LOCAL_VERIFIER_ENABLED:
+        local_verdict, fallback = local_verifier_chain.evaluate(
+            base64_image, finish_criteria, expected_text=payload.expected_text if payload is not None else None,
+        )
+        if local_verdict is not None:
+            normalization.cancel()
+            logger.info(f"Local verifier {local_verdict.verifier} decided {local_verdict.decision}: {local_verdict.detail}")
+            return Verdict(local_verdict.decision, local_verdict.decision, "local", (time.perf_counter() - started_at) * 1000)
 
     try:
         # Get context from database
@@ -152,39 +413,49 @@ def analyze_screenshot(base64_image: str, finish_criteria: str, lesson_id: Optio
         
         prompt = SYSTEM_PROMPT + context
 
-        response = client.agents.messages.create(
-            agent_id=task_completion_agent.id,
-            messages=[
-                MessageCreate(
-                    role="user",
-                    content=[
-                        ImageContent(
-                            source={
-                                "type": "base64",
-                                "media_type": "image/jpeg",
-                                "data": base64_image,
-                            }
-                        ),
-                        TextContent(
-                            text=f"FINISH CRITERIA: {finish_criteria}\n\nIs the task completed? Answer YES or NO."
-                        )
-                    ],
-                )
-            ],
-        )
+        # Labels the real media type of the downscaled image
+        normalized = normalization.result()
+        image_data = to_base64(normalized.data)
 
-        # Extract the response content
-        if response.messages:
-            for message in response.messages:
-                if hasattr(message, 'content') and message.content:
-                    logger.info(f"Agent response: {message.content}")
-                    return str(message.content)
+        # Deadline, hedged duplicate and circuit breaker around the provider (see verifier_resilience.py)
+        if verdict_batcher.enabled:
+            # Concurrent checks from many users may be folded into one multi-image request
+            def batch_check() -> Verdict:
+                answer = verdict_batcher.submit(image_data, normalized.media_type, finish_criteria).result()
+                return Verdict.from_text(answer, "batch")
+
+            verdict = verifier_guard.call(batch_check)
+        else:
+            # Each attempt holds its own agent; waiting for one is not charged to the provider
+            request = VerdictRequest(image_data, normalized.media_type, finish_criteria)
+            verdict = verifier_guard.call(lambda agent: _send_single_check(request, agent), lease=verifier_pool)
+        verdict.latency_ms = (time.perf_counter() - started_at) * 1000
+
+        if verdict.text:
+            logger.info(
+                f"Agent response: {verdict.text} ({verdict.source}, {verdict.latency_ms:.0f} ms, "
+                f"{verdict.output_tokens} tokens{', stopped early' if verdict.early_stopped else ''})"
+            )
+            if cache_key is not None and verdict.decision is not None:
+                verdict_cache.put(cache_key, verdict.decision)
+            return verdict
         
         logger.warning("No response received from agent")
-        return "No response received from agent"
+        verdict.text = "No response received from agent"
+        return verdict
+    except (CircuitOpenError, VerifierTimeout) as e:
+        logger.warning(f"Vision verifier unavailable: {e}")
+        latency_ms = (time.perf_counter() - started_at) * 1000
+        if fallback is not None:
+            verifier_guard.record_fallback()
+            logger.info(f"Falling back to local verifier {fallback.verifier}: {fallback.decision}")
+            return Verdict(fallback.decision, fallback.decision, "fallback", latency_ms)
+        if isinstance(e, VerifierTimeout):
+            return Verdict(None, "TIMEOUT", "timeout", latency_ms)
+        return Verdict(None, "UNAVAILABLE", "circuit_open", latency_ms)
     except Exception as e:
         logger.error(f"Error analyzing screenshot: {e}")
-        return "ERROR"
+        return Verdict(None, "ERROR", "error", (time.perf_counter() - started_at) * 1000)
 
 
 def generate_and_send_popup_message(base64_image: str, step_description: str, user_id: Optional[str] = None) -> str:
@@ -212,7 +483,11 @@ def generate_and_send_popup_message(base64_image: str, step_description: str, us
 
 def send_popup_via_websocket(message: str, user_id: Optional[str] = None) -> bool:
     """
-    Send popup message to frontend via WebSocket API.
+    Send popup message to frontend via WebSocket.
+
+    Inside the server process the popup goes straight to socketio.emit through the
+    popup bus. The loopback HTTP call to /api/send-popup is only used when the bus is
+    unbound (e.g. the agent runs in a separate script).
     
     Args:
         message (str): Popup message to send
@@ -222,11 +497,6 @@ def send_popup_via_websocket(message: str, user_id: Optional[str] = None) -> boo
         bool: True if successful, False otherwise
     """
     try:
-        import requests
-        
-        # WebSocket API endpoint (adjust URL as needed)
-        websocket_api_url = "http://localhost:5000/api/send-popup"
-        
         payload = {
             "message": message,
             "type": "popup",
@@ -235,6 +505,19 @@ def send_popup_via_websocket(message: str, user_id: Optional[str] = None) -> boo
         
         if user_id:
             payload["user_id"] = user_id
+
+        if popup_bus.bound:
+            sent = popup_bus.publish("popup_message", {"user_id": user_id, **payload}, room=user_id)
+            if sent:
+                logger.info(f"Popup sent successfully via WebSocket: {message[:50]}...")
+            else:
+                logger.error("Failed to send popup via WebSocket")
+            return sent
+
+        import requests
+        
+        # WebSocket API endpoint (adjust URL as needed)
+        websocket_api_url = "http://localhost:5000/api/send-popup"
         
         # Send to WebSocket API
         response = requests.post(websocket_api_url, json=payload, timeout=10)
@@ -251,13 +534,184 @@ def send_popup_via_websocket(message: str, user_id: Optional[str] = None) -> boo
         return False
 
 
-def execute_learning_flow(lesson_id: int, step_order: int, base64_image: str, user_id: Optional[str] = None) -> Dict[str, Union[str, int]]:
+class LearnerFlow:
+    """
+    One learner's progress through a lesson as an explicit state machine.
+
+    States: "popup" (send the current step's popup), "check" (run a completion check
+    on the latest frame), "done" (result holds the final status dict).
+    """
+
+    def __init__(
+        self,
+        lesson_data: Dict[int, Dict[str, str]],
+        lesson_id: int,
+        step_order: int,
+        frame_source: Callable[[], ImagePayload],
+        user_id: Optional[str] = None,
+    ):
+        self.lesson_data = lesson_data
+        self.lesson_id = lesson_id
+        self.step_order = step_order
+        self.frame_source = frame_source
+        self.user_id = user_id
+        self.state = "popup"
+        self.result: Optional[Dict[str, Union[str, int]]] = None
+        # time.monotonic() when the current step's popup was sent
+        self.step_started_at = time.monotonic()
+
+    def check_delay(self) -> float:
+        """Delay before the next completion check of the current step."""
+        elapsed = time.monotonic() - self.step_started_at
+        return check_cadence.next_delay(self.lesson_id, self.step_order, elapsed, FLOW_CHECK_INTERVAL)
+
+
+def advance_learning_flow(flow: LearnerFlow) -> Optional[float]:
+    """
+    Perform the flow's next transition.
+
+    Returns:
+        Optional[float]: Seconds until the next transition is due, or None once the flow
+        has finished (flow.result is then set)
+    """
+    try:
+        lesson_data = flow.lesson_data
+        lesson_id = flow.lesson_id
+        step_order = flow.step_order
+        user_id = flow.user_id
+
+        if step_order not in lesson_data:
+            logger.warning(f"Step {step_order} not found in lesson data - END")
+            flow.state = "done"
+            flow.result = {"status": "end", "message": f"Step {step_order} not found"}
+            return None
+
+        step_info = lesson_data[step_order]
+
+        if flow.state == "popup":
+            logger.info(f"Found step: {step_info['name']}")
+            logger.info(f"Step description: {step_info['description']}")
+            logger.info(f"Finish criteria: {step_info['finish_criteria']}")
+
+            # Generate popup and send via WebSocket (only once per step/user)
+            if user_id:
+                if user_state.claim_popup(user_id, lesson_id, step_order):
+                    logger.info("Generating popup message and sending via WebSocket...")
+                    try:
+                        popup_message = generate_and_send_popup_message(flow.frame_source(), step_info['description'], user_id)
+                    except Exception:
+                        user_state.release_popup(user_id)
+                        raise
+                    logger.info(f"Generated and sent popup: {popup_message}")
+            else:
+                logger.info("Generating popup message and sending via WebSocket...")
+                popup_message = generate_and_send_popup_message(flow.frame_source(), step_info['description'])
+                logger.info(f"Generated and sent popup: {popup_message}")
+
+            flow.state = "check"
+            flow.step_started_at = time.monotonic()
+            delay = flow.check_delay()
+            logger.info(f"Waiting {delay:g} seconds...")
+            return delay
+
+        # state == "check": feed in the latest screenshot and finish criteria (cached data, no DB call)
+        logger.info(f"Checking completion for Step {step_order}...")
+        completion_result = analyze_screenshot(flow.frame_source(), step_info['finish_criteria'], lesson_id)
+        logger.info(f"Completion result: {completion_result}")
+
+        if completion_result.strip().upper() != "YES":
+            delay = flow.check_delay()
+            logger.info(f"Step {step_order} not completed. Waiting {delay:g} seconds and checking again...")
+            return delay
+
+        check_cadence.record(lesson_id, step_order, time.monotonic() - flow.step_started_at)
+        next_step_order = step_order + 1
+        logger.info(f"Step {step_order} completed! Moving to step {next_step_order}")
+        if next_step_order in lesson_data:
+            # Reset popup state for next step and loop back
+            if user_id and user_id in user_state:
+                if user_state.advance_step(user_id, step_order, next_step_order):
+                    db_context.update_user_progress(user_id, lesson_id, next_step_order)
+            logger.info(f"Looping back to start with Step {next_step_order}")
+            flow.step_order = next_step_order
+            flow.state = "popup"
+            return 0.0
+
+        logger.info("Lesson completed!")
+        if user_id:
+            db_context.update_user_progress(user_id, lesson_id, step_order, completed=True)
+        flow.state = "done"
+        flow.result = {
+            "status": "lesson_completed",
+            "message": f"Step {step_order} completed! Lesson {lesson_id} is finished!",
+            "popup_message": "Congratulations! You have completed this lesson."
+        }
+        return None
+    except Exception as e:
+        logger.error(f"Error in learning flow: {e}")
+        flow.state = "done"
+        flow.result = {"status": "error", "message": f"Internal error: {str(e)}"}
+        return None
+
+
+def _run_flow_blocking(flow: LearnerFlow) -> Dict[str, Union[str, int]]:
+    """Drive a flow to completion on the calling thread."""
+    while True:
+        delay = advance_learning_flow(flow)
+        if delay is None:
+            return flow.result
+        if delay > 0:
+            time.sleep(delay)
+
+
+def start_learning_flow(
+    lesson_id: int,
+    step_order: int,
+    frame_source: Callable[[], ImagePayload],
+    user_id: Optional[str] = None,
+    on_complete: Optional[Callable[[Dict[str, Union[str, int]]], None]] = None,
+) -> Optional[str]:
+    """
+    Run a learner's flow on the shared FlowScheduler instead of a dedicated thread.
+
+    Waiting between checks costs a timer entry, not a sleeping thread, so one process
+    can host thousands of concurrent learners. Flows owned by a user are cancelled
+    with flow_scheduler.cancel_user(user_id) (app.py does this on disconnect).
+
+    Args:
+        lesson_id (int): Current lesson ID
+        step_order (int): Step to start from
+        frame_source (callable): Returns the learner's latest screenshot when a check runs
+        user_id (str): Optional user ID for targeted messaging and cancellation
+        on_complete (callable): Receives the final result dict
+
+    Returns:
+        Optional[str]: Flow id, or None if the lesson could not be loaded
+    """
+    lesson_data = _ensure_lesson_loaded(lesson_id)
+    if not lesson_data:
+        logger.warning(f"No lesson data found for lesson {lesson_id}")
+        return None
+
+    flow = LearnerFlow(lesson_data, lesson_id, step_order, frame_source, user_id)
+    handle = flow_scheduler.schedule(
+        lambda: advance_learning_flow(flow),
+        user_id=user_id,
+        on_done=(lambda: on_complete(flow.result)) if on_complete else None,
+    )
+    return handle.id
+
+
+def execute_learning_flow(lesson_id: int, step_order: int, base64_image: ImagePayload, user_id: Optional[str] = None) -> Dict[str, Union[str, int]]:
     """
     Execute the complete learning flow as specified with optimized batch loading.
     
     Flow:
     Start -> Load ALL lesson data in one query -> Generate popup -> Wait 10s -> 
     Check completion -> If YES: update state +1, loop back -> If NO: wait 10s, loop back
+
+    Blocks the calling thread until the lesson ends; use start_learning_flow to run
+    the same state machine on the scheduler instead.
     
     Args:
         lesson_id (int): Current lesson ID (state variable)
@@ -272,93 +726,23 @@ def execute_learning_flow(lesson_id: int, step_order: int, base64_image: str, us
         logger.info(f"Starting learning flow for Lesson ID {lesson_id}, Step {step_order}")
         
         # PERFORMANCE OPTIMIZATION: Ensure ALL lesson data is loaded (cached)
-        if lesson_id not in lesson_cache:
-            logger.info("Loading all lesson steps in batch...")
-            lesson_cache[lesson_id] = db_context.get_lesson_steps_batch(lesson_id)
-        lesson_data = lesson_cache[lesson_id]
+        lesson_data = lesson_cache.get_or_load(lesson_id, _load_lesson_steps)
         
         if not lesson_data:
             logger.warning("No lesson data found - END")
             return {"status": "end", "message": "No lesson data found"}
-        
-        if step_order not in lesson_data:
-            logger.warning(f"Step {step_order} not found in lesson data - END")
-            return {"status": "end", "message": f"Step {step_order} not found"}
-        
-        # Get step information from cached data (no more database calls!)
-        step_info = lesson_data[step_order]
-        step_name = step_info['name']
-        step_description = step_info['description']
-        finish_criteria = step_info['finish_criteria']
-        
-        logger.info(f"Found step: {step_name}")
-        logger.info(f"Step description: {step_description}")
-        logger.info(f"Finish criteria: {finish_criteria}")
-        
-        # Generate popup and send via WebSocket (only once per step/user)
-        if user_id:
-            state = user_state.setdefault(user_id, {"lesson_id": lesson_id, "step_order": step_order, "popup_sent_for_step": False})
-            state["lesson_id"] = lesson_id
-            state["step_order"] = step_order
-            if not state.get("popup_sent_for_step"):
-                logger.info("Generating popup message and sending via WebSocket...")
-                popup_message = generate_and_send_popup_message(base64_image, step_description, user_id)
-                logger.info(f"Generated and sent popup: {popup_message}")
-                state["popup_sent_for_step"] = True
-        else:
-            logger.info("Generating popup message and sending via WebSocket...")
-            popup_message = generate_and_send_popup_message(base64_image, step_description)
-            logger.info(f"Generated and sent popup: {popup_message}")
-        
-        # Wait 10 seconds
-        logger.info("Waiting 10 seconds...")
-        time.sleep(10)
-        
-        # Main completion check loop (using cached data)
-        while True:
-            logger.info(f"Checking completion for Step {step_order}...")
-            
-            # Feed in SS and finish criteria (no database call needed!)
-            completion_result = analyze_screenshot(base64_image, finish_criteria, lesson_id)
-            logger.info(f"Completion result: {completion_result}")
-            
-            if completion_result.strip().upper() == "YES":
-                # YES: Update state to +1 step and return to start
-                logger.info(f"Step {step_order} completed! Moving to step {step_order + 1}")
-                
-                # Update state (increment step)
-                next_step_order = step_order + 1
-                
-                # Check if next step exists (using cached data - no database call!)
-                if next_step_order in lesson_data:
-                    # Reset popup state for next step and loop back
-                    if user_id and user_id in user_state:
-                        user_state[user_id]["popup_sent_for_step"] = False
-                    logger.info(f"Looping back to start with Step {next_step_order}")
-                    return execute_learning_flow_with_data(lesson_data, lesson_id, next_step_order, base64_image, user_id)
-                else:
-                    # No more steps - lesson completed
-                    logger.info("Lesson completed!")
-                    return {
-                        "status": "lesson_completed", 
-                        "message": f"Step {step_order} completed! Lesson {lesson_id} is finished!",
-                        "popup_message": "Congratulations! You have completed this lesson."
-                    }
-            
-            else:
-                # NO: Wait 10 seconds and loop back to completion check
-                logger.info(f"Step {step_order} not completed. Waiting 10 seconds and checking again...")
-                time.sleep(10)
-                # Loop continues automatically
+
+        flow = LearnerFlow(lesson_data, lesson_id, step_order, lambda: base64_image, user_id)
+        return _run_flow_blocking(flow)
     except Exception as e:
         logger.error(f"Error in execute_learning_flow: {e}")
         return {"status": "error", "message": f"Internal error: {str(e)}"}
 
 
-def execute_learning_flow_with_data(lesson_data: Dict[int, Dict[str, str]], lesson_id: int, step_order: int, base64_image: str, user_id: Optional[str] = None) -> Dict[str, Union[str, int]]:
+def execute_learning_flow_with_data(lesson_data: Dict[int, Dict[str, str]], lesson_id: int, step_order: int, base64_image: ImagePayload, user_id: Optional[str] = None) -> Dict[str, Union[str, int]]:
     """
     Execute learning flow using pre-loaded lesson data for maximum performance.
-    This function is called recursively and uses cached data instead of database queries.
+    Uses cached data instead of database queries and iterates over steps without recursion.
     
     Args:
         lesson_data (dict): Pre-loaded lesson data from get_lesson_steps_batch()
@@ -370,77 +754,6 @@ def execute_learning_flow_with_data(lesson_data: Dict[int, Dict[str, str]], less
     Returns:
         dict: Result containing status and any messages
     """
-    try:
-        logger.info(f"Continuing learning flow for Lesson ID {lesson_id}, Step {step_order}")
-        
-        if step_order not in lesson_data:
-            logger.warning(f"Step {step_order} not found in lesson data - END")
-            return {"status": "end", "message": f"Step {step_order} not found"}
-        
-        # Get step information from cached data (no database calls!)
-        step_info = lesson_data[step_order]
-        step_name = step_info['name']
-        step_description = step_info['description']
-        finish_criteria = step_info['finish_criteria']
-        
-        logger.info(f"Found step: {step_name}")
-        logger.info(f"Step description: {step_description}")
-        
-        # Generate popup and send via WebSocket (only once per step/user)
-        if user_id:
-            state = user_state.setdefault(user_id, {"lesson_id": lesson_id, "step_order": step_order, "popup_sent_for_step": False})
-            state["lesson_id"] = lesson_id
-            state["step_order"] = step_order
-            if not state.get("popup_sent_for_step"):
-                logger.info("Generating popup message and sending via WebSocket...")
-                popup_message = generate_and_send_popup_message(base64_image, step_description, user_id)
-                logger.info(f"Generated and sent popup: {popup_message}")
-                state["popup_sent_for_step"] = True
-        else:
-            logger.info("Generating popup message and sending via WebSocket...")
-            popup_message = generate_and_send_popup_message(base64_image, step_description)
-            logger.info(f"Generated and sent popup: {popup_message}")
-        
-        # Wait 10 seconds
-        logger.info("Waiting 10 seconds...")
-        time.sleep(10)
-        
-        # Main completion check loop (using cached data)
-        while True:
-            logger.info(f"Checking completion for Step {step_order}...")
-            
-            # Feed in SS and finish criteria (no database call needed!)
-            completion_result = analyze_screenshot(base64_image, finish_criteria, lesson_id)
-            logger.info(f"Completion result: {completion_result}")
-            
-            if completion_result.strip().upper() == "YES":
-                # YES: Update state to +1 step and return to start
-                logger.info(f"Step {step_order} completed! Moving to step {step_order + 1}")
-                
-                # Update state (increment step)
-                next_step_order = step_order + 1
-                
-                # Check if next step exists (using cached data - no database call!)
-                if next_step_order in lesson_data:
-                    # Reset popup state for next step and loop back
-                    if user_id and user_id in user_state:
-                        user_state[user_id]["popup_sent_for_step"] = False
-                    logger.info(f"Looping back to start with Step {next_step_order}")
-                    return execute_learning_flow_with_data(lesson_data, lesson_id, next_step_order, base64_image, user_id)
-                else:
-                    # No more steps - lesson completed
-                    logger.info("Lesson completed!")
-                    return {
-                        "status": "lesson_completed", 
-                        "message": f"Step {step_order} completed! Lesson {lesson_id} is finished!",
-                        "popup_message": "Congratulations! You have completed this lesson."
-                    }
-            
-            else:
-                # NO: Wait 10 seconds and loop back to completion check
-                logger.info(f"Step {step_order} not completed. Waiting 10 seconds and checking again...")
-                time.sleep(10)
-                # Loop continues automatically
-    except Exception as e:
-        logger.error(f"Error in execute_learning_flow_with_data: {e}")
-        return {"status": "error", "message": f"Internal error: {str(e)}"}
+    logger.info(f"Continuing learning flow for Lesson ID {lesson_id}, Step {step_order}")
+    flow = LearnerFlow(lesson_data, lesson_id, step_order, lambda: base64_image, user_id)
+    return _run_flow_blocking(flow)
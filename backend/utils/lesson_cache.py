@@ -0,0 +1,159 @@
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LESSON_CACHE_SIZE = int(os.getenv("LESSON_CACHE_SIZE", "256"))
+LESSON_CACHE_TTL = float(os.getenv("LESSON_CACHE_TTL", "600"))
+
+# { step_order: { 'name', 'description', 'finish_criteria' } }
+LessonSteps = Dict[int, Dict[str, str]]
+
+
+class LessonCache:
+    """
+    Bounded LRU+TTL cache of get_lesson_steps_batch() results.
+
+    Every lesson has a version stamp that changes on invalidate(). A load that started
+    before an invalidation is returned to its caller but not cached, so a write racing
+    a read can never leave stale steps behind. Lesson write paths call invalidate()
+    (or invalidate_all()); listeners registered with add_listener() are told which
+    lesson changed (None for all of them).
+    """
+
+    def __init__(self, max_lessons: int = LESSON_CACHE_SIZE, ttl: float = LESSON_CACHE_TTL):
+        self.max_lessons = max_lessons
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # { lesson_id: (steps, version, expires_at) }
+        self._entries: "OrderedDict[int, Tuple[LessonSteps, int, float]]" = OrderedDict()
+        self._versions: Dict[int, int] = {}
+        self._epoch = 0
+        self._counter = itertools.count(1)
+        self._listeners: List[Callable[[Optional[int]], None]] = []
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def version(self, lesson_id: int) -> Tuple[int, int]:
+        """Current version stamp of a lesson; changes whenever it is invalidated."""
+        with self._lock:
+            return self._epoch, self._versions.get(lesson_id, 0)
+
+    def get(self, lesson_id: int) -> Optional[LessonSteps]:
+        with self._lock:
+            entry = self._entries.get(lesson_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[2] <= time.monotonic():
+                del self._entries[lesson_id]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(lesson_id)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, lesson_id: int, steps: LessonSteps, version: Optional[Tuple[int, int]] = None) -> bool:
+        """
+        Cache a lesson's steps.
+
+        Args:
+            version: Stamp taken (via version()) before the steps were read; the put is
+                dropped if the lesson was invalidated since
+
+        Returns:
+            bool: Whether the steps were cached
+        """
+        with self._lock:
+            current = (self._epoch, self._versions.get(lesson_id, 0))
+            if version is not None and version != current:
+                return False
+            self._entries[lesson_id] = (steps, current[1], time.monotonic() + self.ttl)
+            self._entries.move_to_end(lesson_id)
+            while len(self._entries) > self.max_lessons:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def get_or_load(self, lesson_id: int, loader: Callable[[int], LessonSteps]) -> LessonSteps:
+        """Return cached steps, loading (and caching non-empty results) on a miss."""
+        steps = self.get(lesson_id)
+        if steps is not None:
+            return steps
+        version = self.version(lesson_id)
+        steps = loader(lesson_id)
+        # Empty results usually mean the lesson is not written yet; do not pin them
+        if steps:
+            self.put(lesson_id, steps, version)
+        return steps
+
+    def add_listener(self, listener: Callable[[Optional[int]], None]) -> None:
+        self._listeners.append(listener)
+
+    def _notify(self, lesson_id: Optional[int]) -> None:
+        for listener in list(self._listeners):
+            try:
+                listener(lesson_id)
+            except Exception as e:
+                logger.warning(f"Lesson invalidation listener failed: {e}")
+
+    def invalidate(self, lesson_id: int) -> None:
+        """Drop a lesson after its lesson row or steps were written."""
+        with self._lock:
+            self._entries.pop(lesson_id, None)
+            self._versions[lesson_id] = next(self._counter)
+            self.invalidations += 1
+        logger.info(f"Invalidated cached steps for lesson {lesson_id}")
+        self._notify(lesson_id)
+
+    def invalidate_all(self) -> None:
+        """Drop every lesson, e.g. after a bulk course upload."""
+        with self._lock:
+            self._entries.clear()
+            self._epoch += 1
+            self.invalidations += 1
+        logger.info("Invalidated all cached lesson steps")
+        self._notify(None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._epoch += 1
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.expirations = 0
+            self.invalidations = 0
+
+    def __contains__(self, lesson_id: int) -> bool:
+        with self._lock:
+            entry = self._entries.get(lesson_id)
+            return entry is not None and entry[2] > time.monotonic()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+# Global instance for easy import
+lesson_cache = LessonCache()
@@ -0,0 +1,220 @@
+import io
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .frame_fingerprint import decode_image_bytes
+from .screenshot_ingest import ImagePayload
+
+try:
+    from PIL import Image, ImageStat
+except ImportError:  # Pillow is optional; image-based checks stay uncertain without it
+    Image = None
+    ImageStat = None
+
+try:
+    import pytesseract
+except ImportError:  # OCR is optional; needs the tesseract binary as well
+    pytesseract = None
+
+logger = logging.getLogger(__name__)
+
+LOCAL_VERIFIER_ENABLED = os.getenv("LOCAL_VERIFIER_ENABLED", "1") == "1"
+# Verdicts below this confidence fall through to the vision model
+LOCAL_VERIFIER_MIN_CONFIDENCE = float(os.getenv("LOCAL_VERIFIER_MIN_CONFIDENCE", "0.85"))
+# Weaker verdicts still used when the vision model is unavailable (circuit open or timed out)
+LOCAL_VERIFIER_FALLBACK_CONFIDENCE = float(os.getenv("LOCAL_VERIFIER_FALLBACK_CONFIDENCE", "0.5"))
+
+_QUOTED_RE = re.compile(r"\"([^\"]{2,60})\"|(?:^|\s)'([^']{2,60})'")
+_NAMED_RE = re.compile(r"\b(?:named|called|titled|labell?ed)\s+[\"']?((?:[A-Z0-9][\w\-]*)(?:\s+[A-Z0-9][\w\-]*){0,3})")
+_UI_LABEL_RE = re.compile(r"\b((?:[A-Z][\w\-]*)(?:\s+[A-Z][\w\-]*){0,2})\s+(?:tab|button|menu|panel|dialog)\b")
+_NON_WORD_RE = re.compile(r"[^a-z0-9]+")
+
+
+@dataclass
+class LocalVerdict:
+    """Outcome of a local check; decision is None when the verifier is not sure."""
+
+    decision: Optional[str]
+    confidence: float
+    verifier: str
+    detail: str = ""
+
+
+class LocalVerifier:
+    """
+    Interface for CPU-only checks that run before the vision model.
+
+    Subclasses implement verify(); returning an uncertain verdict (decision None)
+    hands the frame to the next verifier and, ultimately, to the model. expected_text
+    is extract_expected_text(finish_criteria) when the caller has it precomputed.
+    """
+
+    name = "base"
+
+    def verify(self, image: ImagePayload, finish_criteria: str, expected_text: Optional[Sequence[str]] = None) -> LocalVerdict:
+        return LocalVerdict(None, 0.0, self.name)
+
+
+def _open_image(image: ImagePayload):
+    return Image.open(io.BytesIO(decode_image_bytes(image)))
+
+
+class BlankScreenVerifier(LocalVerifier):
+    """
+    Template check: a near-uniform frame (blank, black or loading screen) cannot satisfy
+    any of our visual finish criteria, so it is a confident NO.
+    """
+
+    name = "blank_screen"
+
+    def __init__(self, max_stddev: float = 2.0):
+        self.max_stddev = max_stddev
+
+    def verify(self, image: ImagePayload, finish_criteria: str, expected_text: Optional[Sequence[str]] = None) -> LocalVerdict:
+        if Image is None:
+            return LocalVerdict(None, 0.0, self.name, "Pillow unavailable")
+        try:
+            with _open_image(image) as img:
+                img.draft("L", (128, 128))
+                thumb = img.convert("L").resize((64, 36), Image.BOX)
+        except Exception:
+            return LocalVerdict(None, 0.0, self.name, "undecodable frame")
+        stddev = ImageStat.Stat(thumb).stddev[0]
+        if stddev <= self.max_stddev:
+            return LocalVerdict("NO", 0.95, self.name, f"uniform frame (stddev {stddev:.1f})")
+        return LocalVerdict(None, 0.0, self.name)
+
+
+def extract_expected_text(finish_criteria: str) -> List[str]:
+    """
+    Pull literal on-screen text out of finish criteria: quoted strings, names after
+    "named/called/titled/labeled", and capitalized labels before tab/button/menu/panel/dialog.
+    """
+    phrases = []
+    for double, single in _QUOTED_RE.findall(finish_criteria or ""):
+        phrases.append(double or single)
+    phrases += _NAMED_RE.findall(finish_criteria or "")
+    phrases += _UI_LABEL_RE.findall(finish_criteria or "")
+    seen = set()
+    unique = []
+    for phrase in phrases:
+        key = _normalize_text(phrase)
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(phrase.strip())
+    return unique
+
+
+def _normalize_text(text: str) -> str:
+    return _NON_WORD_RE.sub(" ", (text or "").lower()).strip()
+
+
+class OcrTextVerifier(LocalVerifier):
+    """
+    Confirms criteria that name on-screen text by OCR-ing the frame.
+
+    Only a positive match is trusted (YES when every expected phrase is found); OCR
+    misses are too common to conclude NO, so those frames fall through to the model.
+    """
+
+    name = "ocr_text"
+
+    def __init__(self, ocr: Optional[Callable[[object], str]] = None):
+        if ocr is None and pytesseract is not None:
+            ocr = pytesseract.image_to_string
+        self.ocr = ocr
+
+    def verify(self, image: ImagePayload, finish_criteria: str, expected_text: Optional[Sequence[str]] = None) -> LocalVerdict:
+        expected = list(expected_text) if expected_text is not None else extract_expected_text(finish_criteria)
+        if not expected:
+            return LocalVerdict(None, 0.0, self.name, "no literal text in criteria")
+        if self.ocr is None or Image is None:
+            return LocalVerdict(None, 0.0, self.name, "OCR unavailable")
+        try:
+            with _open_image(image) as img:
+                text = _normalize_text(self.ocr(img.convert("L")))
+        except Exception as e:
+            return LocalVerdict(None, 0.0, self.name, f"OCR failed: {e}")
+
+        haystack = f" {text} "
+        missing = [p for p in expected if f" {_normalize_text(p)} " not in haystack]
+        if not missing:
+            return LocalVerdict("YES", 0.9, self.name, f"found {expected}")
+        return LocalVerdict(None, 0.0, self.name, f"missing {missing}")
+
+
+class LocalVerifierChain:
+    """
+    Runs verifiers in order and returns the first verdict at or above min_confidence.
+    Keeps per-verifier decision counts and cumulative latency.
+    """
+
+    def __init__(self, verifiers: List[LocalVerifier], min_confidence: float = LOCAL_VERIFIER_MIN_CONFIDENCE):
+        self.verifiers = list(verifiers)
+        self.min_confidence = min_confidence
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def register(self, verifier: LocalVerifier, first: bool = False) -> None:
+        """Add a verifier to the chain (at the front with first=True)."""
+        if first:
+            self.verifiers.insert(0, verifier)
+        else:
+            self.verifiers.append(verifier)
+
+    def _record(self, name: str, decided: bool, elapsed: float) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(name, {"calls": 0, "decided": 0, "seconds": 0.0})
+            stats["calls"] += 1
+            stats["decided"] += int(decided)
+            stats["seconds"] += elapsed
+
+    def verify(
+        self, image: ImagePayload, finish_criteria: str, expected_text: Optional[Sequence[str]] = None,
+    ) -> Optional[LocalVerdict]:
+        """Return a confident local verdict, or None to fall back to the vision model."""
+        return self.evaluate(image, finish_criteria, expected_text=expected_text)[0]
+
+    def evaluate(
+        self,
+        image: ImagePayload,
+        finish_criteria: str,
+        fallback_confidence: float = LOCAL_VERIFIER_FALLBACK_CONFIDENCE,
+        expected_text: Optional[Sequence[str]] = None,
+    ) -> Tuple[Optional[LocalVerdict], Optional[LocalVerdict]]:
+        """
+        Run the chain once for both uses of a local verdict.
+
+        Returns:
+            Tuple: (the first confident verdict or None, the most confident decided
+            verdict at or above fallback_confidence, kept for when the model is unavailable)
+        """
+        fallback = None
+        for verifier in self.verifiers:
+            start = time.perf_counter()
+            try:
+                verdict = verifier.verify(image, finish_criteria, expected_text)
+            except Exception as e:
+                logger.warning(f"Local verifier {verifier.name} failed: {e}")
+                verdict = LocalVerdict(None, 0.0, verifier.name)
+            confident = verdict.decision is not None and verdict.confidence >= self.min_confidence
+            self._record(verifier.name, confident, time.perf_counter() - start)
+            if confident:
+                return verdict, verdict
+            if verdict.decision is not None and verdict.confidence >= fallback_confidence:
+                if fallback is None or verdict.confidence > fallback.confidence:
+                    fallback = verdict
+        return None, fallback
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {name: dict(values) for name, values in self._stats.items()}
+
+
+# Global instance for easy import
+local_verifier_chain = LocalVerifierChain([BlankScreenVerifier(), OcrTextVerifier()])
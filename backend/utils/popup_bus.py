@@ -0,0 +1,161 @@
+import json
+import logging
+import os
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import redis
+except ImportError:  # redis is optional; only needed for POPUP_BUS_TRANSPORT=redis
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# none (single process) | redis (fan out to every worker)
+POPUP_BUS_TRANSPORT = os.getenv("POPUP_BUS_TRANSPORT", "none").lower()
+POPUP_BUS_REDIS_URL = os.getenv("POPUP_BUS_REDIS_URL", "redis://localhost:6379/0")
+POPUP_BUS_CHANNEL = os.getenv("POPUP_BUS_CHANNEL", "mentra:socket-events")
+
+# emit(event, data, room=None), e.g. socketio.emit
+EmitFn = Callable[..., Any]
+
+
+class PubSubTransport(ABC):
+    """Interface for fanning bus messages out to every worker process."""
+
+    @abstractmethod
+    def publish(self, channel: str, message: str) -> None:
+        """Send a message to every subscriber of the channel, in any process."""
+
+    @abstractmethod
+    def subscribe(self, channel: str, callback: Callable[[str], None]) -> None:
+        """Call callback with every message published to the channel."""
+
+
+class LocalPubSub(PubSubTransport):
+    """
+    In-process transport: every bus subscribed to the same LocalPubSub receives every
+    message. Stands in for a broker in tests and single-host experiments.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, List[Callable[[str], None]]] = {}
+
+    def publish(self, channel: str, message: str) -> None:
+        with self._lock:
+            callbacks = list(self._subscribers.get(channel, ()))
+        for callback in callbacks:
+            callback(message)
+
+    def subscribe(self, channel: str, callback: Callable[[str], None]) -> None:
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(callback)
+
+
+class RedisPubSub(PubSubTransport):
+    """Redis PUBLISH/SUBSCRIBE transport; each subscription is served by a daemon thread."""
+
+    def __init__(self, client):
+        self.client = client
+        self._threads = []
+
+    def publish(self, channel: str, message: str) -> None:
+        self.client.publish(channel, message)
+
+    def subscribe(self, channel: str, callback: Callable[[str], None]) -> None:
+        def handler(item):
+            data = item.get("data")
+            callback(data.decode("utf-8") if isinstance(data, bytes) else data)
+
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{channel: handler})
+        self._threads.append(pubsub.run_in_thread(sleep_time=0.5, daemon=True))
+
+
+class PopupBus:
+    """
+    Delivers Socket.IO events (popups, capture intervals, job results) from anywhere in
+    the process without a loopback HTTP request.
+
+    app.py binds socketio.emit at startup. Without a transport, publish() calls it
+    directly. With a transport, the event goes through the broker and every worker
+    (this one included) emits it to its own connected clients, so a popup reaches
+    the user whichever worker holds their socket.
+    """
+
+    def __init__(self, transport: Optional[PubSubTransport] = None, channel: str = POPUP_BUS_CHANNEL):
+        self.channel = channel
+        self.transport: Optional[PubSubTransport] = None
+        self._emit: Optional[EmitFn] = None
+        self.published = 0
+        self.delivered = 0
+        if transport is not None:
+            self.set_transport(transport)
+
+    @property
+    def bound(self) -> bool:
+        """Whether an emitter is attached (i.e. we are running inside the Socket.IO server)."""
+        return self._emit is not None
+
+    def bind(self, emit: Optional[EmitFn]) -> None:
+        self._emit = emit
+
+    def set_transport(self, transport: Optional[PubSubTransport]) -> None:
+        self.transport = transport
+        if transport is not None:
+            transport.subscribe(self.channel, self._on_message)
+
+    def publish(self, event: str, data: Dict[str, Any], room: Optional[str] = None) -> bool:
+        """
+        Emit `event` to `room` (or every client when room is None).
+
+        Returns:
+            bool: False if nothing could deliver it (no emitter and no transport)
+        """
+        self.published += 1
+        if self.transport is not None:
+            self.transport.publish(self.channel, json.dumps({"event": event, "data": data, "room": room}))
+            return True
+        return self._deliver(event, data, room)
+
+    def _on_message(self, message: str) -> None:
+        try:
+            envelope = json.loads(message)
+        except ValueError:
+            logger.warning("Dropping malformed popup bus message")
+            return
+        self._deliver(envelope.get("event"), envelope.get("data"), envelope.get("room"))
+
+    def _deliver(self, event: str, data: Dict[str, Any], room: Optional[str]) -> bool:
+        emit = self._emit
+        if emit is None:
+            return False
+        try:
+            if room:
+                emit(event, data, room=room)
+            else:
+                emit(event, data)
+        except Exception as e:
+            logger.error(f"Failed to emit {event}: {e}")
+            return False
+        self.delivered += 1
+        return True
+
+
+def create_popup_bus(transport: str = POPUP_BUS_TRANSPORT) -> PopupBus:
+    """Build the bus selected by POPUP_BUS_TRANSPORT, falling back to in-process only."""
+    if transport == "redis":
+        if redis is None:
+            logger.warning("POPUP_BUS_TRANSPORT=redis but the redis package is not installed; emitting in-process only")
+        else:
+            return PopupBus(RedisPubSub(redis.Redis.from_url(POPUP_BUS_REDIS_URL)))
+    elif transport != "none":
+        logger.warning(f"Unknown POPUP_BUS_TRANSPORT {transport!r}; emitting in-process only")
+    return PopupBus()
+
+
+# Global instance for easy import; app.py binds socketio.emit to it
+popup_bus = create_popup_bus()
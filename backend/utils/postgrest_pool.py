@@ -0,0 +1,245 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Dict, List, Optional, Tuple, TypeVar
+
+try:
+    import httpx
+except ImportError:  # httpx is optional here; without it the provider uses supabase-py
+    httpx = None
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:  # HTTP/2 needs the h2 package (httpx[http2])
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Read lessons/steps through the shared pooled client instead of supabase-py
+DB_HTTP_POOL = os.getenv("DB_HTTP_POOL", "1") == "1"
+DB_HTTP2 = os.getenv("DB_HTTP2", "1") == "1"
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "32"))
+DB_MAX_KEEPALIVE = int(os.getenv("DB_MAX_KEEPALIVE", "16"))
+# Seconds an idle keep-alive connection is kept open
+DB_KEEPALIVE_EXPIRY = float(os.getenv("DB_KEEPALIVE_EXPIRY", "60"))
+DB_TIMEOUT = float(os.getenv("DB_TIMEOUT", "10"))
+DB_VERIFY_SSL = os.getenv("DB_VERIFY_SSL", "1") == "1"
+
+T = TypeVar("T")
+
+
+def pool_limits() -> "httpx.Limits":
+    """Connection pool limits shared by every database HTTP client."""
+    return httpx.Limits(
+        max_connections=DB_MAX_CONNECTIONS,
+        max_keepalive_connections=DB_MAX_KEEPALIVE,
+        keepalive_expiry=DB_KEEPALIVE_EXPIRY,
+    )
+
+
+class PostgrestError(Exception):
+    """PostgREST answered with a non-2xx status."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"PostgREST {status_code}: {message}")
+        self.status_code = status_code
+
+
+@dataclass
+class QueryResult:
+    """Query response; matches the .data attribute of supabase-py's APIResponse."""
+
+    data: List[Dict[str, Any]] = field(default_factory=list)
+
+
+class PostgrestQuery:
+    """
+    Query builder with the subset of the supabase-py interface the database context
+    uses: table(...).select(...).eq(...).gt(...).order(...).limit(...).execute(), plus
+    table(...).upsert(rows, on_conflict=...).execute() for batched progress writes.
+    """
+
+    def __init__(self, pool: "PostgrestPool", table: str):
+        self.pool = pool
+        self.table = table
+        self._params: List[Tuple[str, str]] = []
+        self._method = "GET"
+        self._body: Optional[Any] = None
+        self._headers: Dict[str, str] = {}
+
+    def select(self, columns: str) -> "PostgrestQuery":
+        self._params.append(("select", columns))
+        return self
+
+    def eq(self, column: str, value: Any) -> "PostgrestQuery":
+        self._params.append((column, f"eq.{value}"))
+        return self
+
+    def gt(self, column: str, value: Any) -> "PostgrestQuery":
+        self._params.append((column, f"gt.{value}"))
+        return self
+
+    def order(self, column: str, desc: bool = False) -> "PostgrestQuery":
+        self._params.append(("order", f"{column}.{'desc' if desc else 'asc'}"))
+        return self
+
+    def limit(self, count: int) -> "PostgrestQuery":
+        self._params.append(("limit", str(count)))
+        return self
+
+    def upsert(self, rows: List[Dict[str, Any]], on_conflict: Optional[str] = None) -> "PostgrestQuery":
+        """Insert rows, updating the existing row on a conflict of the on_conflict columns."""
+        self._method = "POST"
+        self._body = rows
+        self._headers = {"Prefer": "resolution=merge-duplicates,return=minimal"}
+        if on_conflict:
+            self._params.append(("on_conflict", on_conflict))
+        return self
+
+    @property
+    def params(self) -> List[Tuple[str, str]]:
+        return list(self._params)
+
+    def _request(self) -> Awaitable[QueryResult]:
+        return self.pool.fetch(self.table, self._params, self._method, self._body, self._headers)
+
+    def execute(self) -> QueryResult:
+        return self.pool.run(self._request())
+
+    async def execute_async(self) -> QueryResult:
+        return await self.pool.run_async(self._request())
+
+
+class PostgrestPool:
+    """
+    Shared PostgREST client: one httpx.AsyncClient (HTTP/2 when available, keep-alive,
+    bounded pool) driven by a private event loop on a daemon thread.
+
+    Synchronous callers block on execute() while their request is multiplexed with
+    everyone else's on the pooled connections; async callers await execute_async()
+    from any event loop. The loop and client are created on first use.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        key: str,
+        http2: bool = DB_HTTP2,
+        timeout: float = DB_TIMEOUT,
+        verify: bool = DB_VERIFY_SSL,
+        limits: Optional["httpx.Limits"] = None,
+        transport: Optional[Any] = None,
+    ):
+        if httpx is None:
+            raise RuntimeError("httpx is required for the pooled PostgREST client")
+        self.base_url = f"{url.rstrip('/')}/rest/v1"
+        self.headers = {"apikey": key, "Authorization": f"Bearer {key}", "Accept": "application/json"}
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.timeout = timeout
+        self.verify = verify
+        self.limits = limits if limits is not None else pool_limits()
+        self.transport = transport
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._client: Optional["httpx.AsyncClient"] = None
+        self.requests = 0
+        self.errors = 0
+        self.total_ms = 0.0
+
+    def table(self, name: str) -> PostgrestQuery:
+        return PostgrestQuery(self, name)
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        loop = self._loop
+        if loop is not None:
+            return loop
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="postgrest-pool", daemon=True)
+                thread.start()
+                self._thread = thread
+                self._loop = loop
+            return self._loop
+
+    def _get_client(self) -> "httpx.AsyncClient":
+        # Only called on the pool loop, so no lock is needed
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                http2=self.http2,
+                limits=self.limits,
+                timeout=self.timeout,
+                verify=self.verify,
+                transport=self.transport,
+            )
+        return self._client
+
+    async def fetch(
+        self,
+        table: str,
+        params: List[Tuple[str, str]],
+        method: str = "GET",
+        body: Optional[Any] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> QueryResult:
+        """Request /rest/v1/<table> on the pool loop (GET unless a write passes its method and body)."""
+        started_at = time.perf_counter()
+        try:
+            response = await self._get_client().request(method, f"/{table}", params=params, json=body, headers=headers)
+            if response.status_code >= 300:
+                raise PostgrestError(response.status_code, response.text[:200])
+            # Writes with return=minimal answer with an empty body
+            return QueryResult(response.json() if response.content else [])
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.requests += 1
+            self.total_ms += (time.perf_counter() - started_at) * 1000
+
+    def run(self, coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+        """Run a coroutine on the pool loop and wait for it (sync facade)."""
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        return future.result(self.timeout * 2 if timeout is None else timeout)
+
+    async def run_async(self, coro: Awaitable[T]) -> T:
+        """Await a coroutine on the pool loop from any event loop."""
+        loop = self._ensure_loop()
+        if asyncio.get_running_loop() is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / self.requests, 2) if self.requests else None,
+            "http2": self.http2,
+        }
+
+    def close(self) -> None:
+        """Close pooled connections and stop the loop thread."""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        client, self._client = self._client, None
+        if client is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(client.aclose(), loop).result(self.timeout)
+            except Exception as e:
+                logger.warning(f"Failed to close PostgREST connections: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        if self._thread is not None:
+            self._thread.join(self.timeout)
+            self._thread = None
+        if not loop.is_running():
+            loop.close()
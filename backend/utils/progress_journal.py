@@ -0,0 +1,242 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Journal step advances locally and write them to the database in batches; off until
+# the user_progress table exists (see utils/README.md)
+PROGRESS_JOURNAL_ENABLED = os.getenv("PROGRESS_JOURNAL", "0") == "1"
+# SQLite file holding progress not yet written to the database; ":memory:" keeps it in RAM
+PROGRESS_JOURNAL_PATH = os.getenv("PROGRESS_JOURNAL_PATH", os.path.join(os.path.dirname(__file__), "..", "progress_journal.db"))
+# Flush once this many events are pending, or this many seconds after the last flush
+PROGRESS_FLUSH_ROWS = int(os.getenv("PROGRESS_FLUSH_ROWS", "200"))
+PROGRESS_FLUSH_SECONDS = float(os.getenv("PROGRESS_FLUSH_SECONDS", "2"))
+# Seconds to wait after a failed flush before trying again
+PROGRESS_RETRY_SECONDS = float(os.getenv("PROGRESS_RETRY_SECONDS", "10"))
+# Most events kept while the database is unreachable; older ones are dropped past this
+PROGRESS_JOURNAL_MAX_EVENTS = int(os.getenv("PROGRESS_JOURNAL_MAX_EVENTS", "50000"))
+
+# Rows handed to the writer: {'user_id', 'lesson_id', 'step_order', 'completed', 'updated_at'}
+ProgressRow = Dict[str, Any]
+
+
+class ProgressRejected(Exception):
+    """The database refused a batch for good (missing table or columns); retrying cannot help."""
+
+
+def coalesce_events(events: List[Tuple[str, int, int, int, float]]) -> List[ProgressRow]:
+    """
+    Reduce journal events (in journal order) to the latest one per (user_id, lesson_id).
+
+    Returns:
+        List[ProgressRow]: One upsert row per user and lesson
+    """
+    latest: Dict[Tuple[str, int], ProgressRow] = {}
+    for user_id, lesson_id, step_order, completed, recorded_at in events:
+        latest[(user_id, lesson_id)] = {
+            "user_id": user_id,
+            "lesson_id": lesson_id,
+            "step_order": step_order,
+            "completed": bool(completed),
+            "updated_at": datetime.fromtimestamp(recorded_at, timezone.utc).isoformat(),
+        }
+    return list(latest.values())
+
+
+class ProgressJournal:
+    """
+    Write-behind journal for learner progress.
+
+    record() appends the event to a local SQLite table (WAL, one short INSERT) and
+    returns; the request path never waits on the database. A daemon thread flushes
+    pending events once flush_rows have accumulated or flush_seconds have passed:
+    events are coalesced to the latest step per user and lesson, handed to `writer`
+    as one batched upsert, and deleted from the journal only after the writer
+    returned. A failed flush keeps the events and is retried after retry_seconds;
+    a batch the writer rejects with ProgressRejected is dropped instead. At most
+    max_events are kept: past that, superseded events are compacted away and then
+    the oldest are dropped.
+
+    Events left in the journal file by a crash or restart are flushed when the
+    journal is next opened.
+    """
+
+    def __init__(
+        self,
+        writer: Callable[[List[ProgressRow]], Any],
+        path: str = PROGRESS_JOURNAL_PATH,
+        flush_rows: int = PROGRESS_FLUSH_ROWS,
+        flush_seconds: float = PROGRESS_FLUSH_SECONDS,
+        retry_seconds: float = PROGRESS_RETRY_SECONDS,
+        max_events: int = PROGRESS_JOURNAL_MAX_EVENTS,
+        background: bool = True,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.writer = writer
+        self.path = path
+        self.flush_rows = max(1, flush_rows)
+        self.flush_seconds = flush_seconds
+        self.retry_seconds = retry_seconds
+        self.max_events = max(1, max_events)
+        self.background = background
+        self.clock = clock
+        # One connection shared by record() and the flusher; SQLite calls are short
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS progress_journal ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, lesson_id INTEGER NOT NULL, "
+            "step_order INTEGER NOT NULL, completed INTEGER NOT NULL, recorded_at REAL NOT NULL)"
+        )
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._failed_at = 0.0
+        self.recorded = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.failures = 0
+        self.rejected = 0
+        self.dropped = 0
+        self._pending = self._conn.execute("SELECT COUNT(*) FROM progress_journal").fetchone()[0]
+        self.recovered = self._pending
+        if self.recovered:
+            logger.info(f"Progress journal has {self.recovered} unflushed events from a previous run")
+            if background:
+                self._start_flusher()
+                self._wake.set()
+
+    def record(self, user_id: str, lesson_id: int, step_order: int, completed: bool = False) -> None:
+        """Journal one progress event; it reaches the database with the next flush."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO progress_journal (user_id, lesson_id, step_order, completed, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (str(user_id), int(lesson_id), int(step_order), int(bool(completed)), self.clock()),
+            )
+            self.recorded += 1
+            self._pending += 1
+            if self._pending > self.max_events:
+                self._trim()
+            pending = self._pending
+        if self.background:
+            self._start_flusher()
+            if pending >= self.flush_rows:
+                self._wake.set()
+
+    def _trim(self) -> None:
+        # Caller holds _lock. Only the latest event per user and lesson is ever written,
+        # so compact first; drop the oldest events only if that is not enough.
+        removed = self._conn.execute(
+            "DELETE FROM progress_journal WHERE seq NOT IN "
+            "(SELECT MAX(seq) FROM progress_journal GROUP BY user_id, lesson_id)"
+        ).rowcount
+        self._pending -= removed
+        excess = self._pending - self.max_events
+        if excess > 0:
+            # Leave some headroom so the next few records do not trim again
+            excess += self.max_events // 10
+            dropped = self._conn.execute(
+                "DELETE FROM progress_journal WHERE seq IN "
+                "(SELECT seq FROM progress_journal ORDER BY seq LIMIT ?)",
+                (excess,),
+            ).rowcount
+            self._pending -= dropped
+            self.dropped += dropped
+            logger.warning(f"Progress journal is full; dropped the {dropped} oldest events")
+
+    def pending(self) -> int:
+        """Events journaled but not yet written to the database."""
+        return self._pending
+
+    def flush(self) -> int:
+        """
+        Write all pending events now.
+
+        Returns:
+            int: Number of upsert rows written (0 if nothing was pending or the write failed)
+        """
+        with self._flush_lock:
+            with self._lock:
+                events = self._conn.execute(
+                    "SELECT seq, user_id, lesson_id, step_order, completed, recorded_at "
+                    "FROM progress_journal ORDER BY seq"
+                ).fetchall()
+            if not events:
+                return 0
+            last_seq = events[-1][0]
+            rows = coalesce_events([event[1:] for event in events])
+            try:
+                self.writer(rows)
+            except ProgressRejected as e:
+                self.rejected += len(rows)
+                logger.error(f"Database rejected {len(rows)} progress rows; dropping them: {e}")
+                self._delete_through(last_seq)
+                return 0
+            except Exception as e:
+                self.failures += 1
+                self._failed_at = time.monotonic()
+                logger.warning(f"Failed to flush {len(rows)} progress rows; keeping them in the journal: {e}")
+                return 0
+            self._delete_through(last_seq)
+            self.flushes += 1
+            self.rows_written += len(rows)
+            return len(rows)
+
+    def _delete_through(self, last_seq: int) -> None:
+        with self._lock:
+            # Events recorded while the writer ran have higher seqs and stay pending
+            deleted = self._conn.execute("DELETE FROM progress_journal WHERE seq <= ?", (last_seq,)).rowcount
+            self._pending -= deleted
+        self._failed_at = 0.0
+
+    def _start_flusher(self) -> None:
+        if self._thread is not None or self._stopped.is_set():
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._flush_loop, name="progress-flush", daemon=True)
+                self._thread.start()
+
+    def _flush_loop(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            if self._stopped.is_set():
+                return
+            if self._failed_at and time.monotonic() - self._failed_at < self.retry_seconds:
+                continue
+            self.flush()
+
+    def close(self) -> None:
+        """Stop the flusher and write what is pending; unwritten events stay in the journal."""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._wake.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(self.flush_seconds + 1)
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self.pending(),
+            "recorded": self.recorded,
+            "recovered": self.recovered,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "dropped": self.dropped,
+        }
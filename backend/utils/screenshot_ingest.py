@@ -0,0 +1,128 @@
+import base64
+import os
+from typing import Any, Dict, Optional, Tuple, Union
+
+from werkzeug.exceptions import RequestEntityTooLarge
+
+# Body content types accepted as a raw screenshot upload
+RAW_IMAGE_MIMETYPES = ("application/octet-stream",)
+READ_CHUNK_SIZE = 256 * 1024
+# Largest request body accepted (also used as Flask's MAX_CONTENT_LENGTH); a base64 JSON
+# frame is a third larger than the image itself
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(32 * 1024 * 1024)))
+
+ImagePayload = Union[str, bytes, bytearray, memoryview]
+
+
+def is_raw_image_mimetype(mimetype: Optional[str]) -> bool:
+    """True for request bodies that carry the screenshot bytes directly."""
+    if not mimetype:
+        return False
+    return mimetype.startswith("image/") or mimetype in RAW_IMAGE_MIMETYPES
+
+
+def read_stream_into_buffer(
+    stream,
+    content_length: Optional[int] = None,
+    chunk_size: int = READ_CHUNK_SIZE,
+    max_bytes: Optional[int] = MAX_UPLOAD_BYTES,
+) -> bytearray:
+    """
+    Read an upload stream into a single buffer without intermediate copies.
+
+    When the content length is known the buffer is allocated once and filled in
+    place with readinto; otherwise chunks are appended as they arrive. The length
+    is claimed by the client, so it is checked against max_bytes before anything
+    is allocated.
+
+    Args:
+        stream: File-like object (e.g. werkzeug's request.stream)
+        content_length (int): Expected body size, if known
+        chunk_size (int): Read size for streams of unknown length
+        max_bytes (int): Largest body accepted; None for no limit
+
+    Returns:
+        bytearray: The uploaded bytes
+
+    Raises:
+        RequestEntityTooLarge: The body is (or claims to be) larger than max_bytes
+    """
+    if content_length and max_bytes is not None and content_length > max_bytes:
+        raise RequestEntityTooLarge(f"Upload of {content_length} bytes exceeds the {max_bytes} byte limit")
+
+    if content_length:
+        buffer = bytearray(content_length)
+        view = memoryview(buffer)
+        filled = 0
+        readinto = getattr(stream, "readinto", None)
+        while filled < content_length:
+            if readinto is not None:
+                count = readinto(view[filled:])
+            else:
+                chunk = stream.read(min(chunk_size, content_length - filled))
+                count = len(chunk)
+                view[filled:filled + count] = chunk
+            if not count:
+                break
+            filled += count
+        view.release()
+        if filled < content_length:
+            del buffer[filled:]
+        return buffer
+
+    buffer = bytearray()
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        buffer += chunk
+        if max_bytes is not None and len(buffer) > max_bytes:
+            raise RequestEntityTooLarge(f"Upload exceeds the {max_bytes} byte limit")
+    return buffer
+
+
+def read_screenshot_request(request) -> Tuple[Optional[ImagePayload], Dict[str, Any]]:
+    """
+    Extract the screenshot and its fields from a /screenshot request.
+
+    Supported encodings:
+    - application/json: {"image": "<base64>", ...} (original format)
+    - multipart/form-data: an "image" file part plus form fields
+    - image/* or application/octet-stream: raw bytes in the body, fields in the query string
+
+    Returns:
+        Tuple[Optional[ImagePayload], dict]: (image, fields); image is None if missing
+    """
+    mimetype = request.mimetype
+
+    if is_raw_image_mimetype(mimetype):
+        image = read_stream_into_buffer(request.stream, request.content_length)
+        return (image or None), request.args.to_dict()
+
+    if mimetype == "multipart/form-data":
+        fields = request.args.to_dict()
+        fields.update(request.form.to_dict())
+        upload = request.files.get("image")
+        if upload is None:
+            return None, fields
+        image = read_stream_into_buffer(upload.stream, upload.content_length or None)
+        return (image or None), fields
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return None, {}
+    return data.pop("image", None), data
+
+
+def to_base64(image: ImagePayload) -> str:
+    """Encode an image payload for the vision API, passing base64 strings through untouched."""
+    if isinstance(image, str):
+        return image
+    return base64.b64encode(image).decode("ascii")
+
+
+def parse_bool(value: Any) -> bool:
+    """Interpret form/query-string flags ("1", "true", "yes") as well as JSON booleans."""
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
@@ -0,0 +1,93 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from .image_normalizer import grayscale_allowed
+from .lesson_cache import LESSON_CACHE_SIZE, LessonSteps
+from .local_verifier import extract_expected_text
+from .verdict_cache import criteria_hash
+
+STEP_PAYLOAD_CACHE_SIZE = int(os.getenv("STEP_PAYLOAD_CACHE_SIZE", str(LESSON_CACHE_SIZE)))
+
+
+class StepPayload(NamedTuple):
+    """Everything the screenshot path needs for one step, computed once per lesson load."""
+
+    step_order: int
+    name: str
+    popup_message: str
+    finish_criteria: str
+    criteria_key: str
+    expected_text: Tuple[str, ...]
+    grayscale_ok: bool
+    next_step_order: Optional[int]
+
+
+def build_step_payloads(lesson_data: LessonSteps) -> Dict[int, StepPayload]:
+    """
+    Prebuild per-step payloads for a lesson.
+
+    The criteria hash, expected OCR text and grayscale check are derived here once
+    and handed to check_completion, so frames of a step do not recompute them.
+    """
+    orders = sorted(lesson_data)
+    payloads = {}
+    for index, step_order in enumerate(orders):
+        step = lesson_data[step_order]
+        criteria = step.get("finish_criteria") or ""
+        payloads[step_order] = StepPayload(
+            step_order=step_order,
+            name=step.get("name") or "",
+            popup_message=(step.get("description") or "").strip(),
+            finish_criteria=criteria,
+            criteria_key=criteria_hash(criteria),
+            expected_text=tuple(extract_expected_text(criteria)),
+            grayscale_ok=grayscale_allowed(criteria),
+            next_step_order=step_order + 1 if step_order + 1 in lesson_data else None,
+        )
+    return payloads
+
+
+class StepPayloadCache:
+    """
+    Per-lesson payloads, rebuilt whenever the lesson's steps object changes (the
+    lesson cache hands out a new dict after invalidation or expiry). LRU-bounded.
+    """
+
+    def __init__(self, max_lessons: int = STEP_PAYLOAD_CACHE_SIZE):
+        self.max_lessons = max_lessons
+        self._lock = threading.Lock()
+        # { lesson_id: (source steps dict, payloads) }
+        self._entries: "OrderedDict[int, Tuple[LessonSteps, Dict[int, StepPayload]]]" = OrderedDict()
+        self.builds = 0
+
+    def get(self, lesson_id: int, lesson_data: LessonSteps) -> Dict[int, StepPayload]:
+        with self._lock:
+            entry = self._entries.get(lesson_id)
+            if entry is not None and entry[0] is lesson_data:
+                self._entries.move_to_end(lesson_id)
+                return entry[1]
+        payloads = build_step_payloads(lesson_data)
+        with self._lock:
+            self._entries[lesson_id] = (lesson_data, payloads)
+            self._entries.move_to_end(lesson_id)
+            while len(self._entries) > self.max_lessons:
+                self._entries.popitem(last=False)
+            self.builds += 1
+        return payloads
+
+    def forget(self, lesson_id: Optional[int] = None) -> None:
+        with self._lock:
+            if lesson_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(lesson_id, None)
+
+    def clear(self) -> None:
+        self.forget(None)
+        self.builds = 0
+
+
+# Global instance for easy import
+step_payloads = StepPayloadCache()
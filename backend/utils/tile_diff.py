@@ -0,0 +1,187 @@
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from .frame_fingerprint import decode_image_bytes
+from .screenshot_ingest import ImagePayload
+
+try:
+    from PIL import Image, ImageChops
+except ImportError:  # Pillow is optional; without it whole frames are always sent
+    Image = None
+    ImageChops = None
+
+logger = logging.getLogger(__name__)
+
+TILE_COLS = int(os.getenv("TILE_DIFF_COLS", "16"))
+TILE_ROWS = int(os.getenv("TILE_DIFF_ROWS", "9"))
+# Mean absolute grayscale difference (0-255) above which a tile counts as changed
+TILE_CHANGE_THRESHOLD = int(os.getenv("TILE_DIFF_THRESHOLD", "6"))
+# Crop only when the changed region (with context) covers at most this share of the frame
+MAX_CROP_AREA = float(os.getenv("TILE_DIFF_MAX_AREA", "0.4"))
+# Tiles of surrounding context added on every side of the changed region
+CONTEXT_TILES = int(os.getenv("TILE_DIFF_CONTEXT_TILES", "1"))
+# Send a whole frame at least this often so cross-panel criteria are still seen together
+FULL_FRAME_EVERY = int(os.getenv("TILE_DIFF_FULL_FRAME_EVERY", "5"))
+# Users whose last thumbnail is kept; the least recently active are dropped past this
+TILE_DIFF_MAX_USERS = int(os.getenv("TILE_DIFF_MAX_USERS", "10000"))
+
+# Pixels per tile side in the comparison thumbnail
+_SAMPLES_PER_TILE = 8
+
+
+@dataclass
+class ChangedRegion:
+    """Bounding box (in full-resolution pixels) of the tiles that changed since the last frame."""
+
+    box: Tuple[int, int, int, int]
+    changed_tiles: int
+    total_tiles: int
+    frame_size: Tuple[int, int]
+
+    @property
+    def area_fraction(self) -> float:
+        width, height = self.frame_size
+        left, top, right, bottom = self.box
+        return ((right - left) * (bottom - top)) / float(width * height)
+
+
+class TileChangeDetector:
+    """
+    Keeps the last frame per user as a small grayscale thumbnail and reports which
+    part of the screen changed, so localized edits can be verified from a crop. At
+    most max_users thumbnails are kept, least recently active dropped first.
+    """
+
+    def __init__(
+        self,
+        cols: int = TILE_COLS,
+        rows: int = TILE_ROWS,
+        threshold: int = TILE_CHANGE_THRESHOLD,
+        max_area: float = MAX_CROP_AREA,
+        context_tiles: int = CONTEXT_TILES,
+        full_frame_every: int = FULL_FRAME_EVERY,
+        max_users: int = TILE_DIFF_MAX_USERS,
+    ):
+        self.cols = cols
+        self.rows = rows
+        self.threshold = threshold
+        self.max_area = max_area
+        self.context_tiles = context_tiles
+        self.full_frame_every = full_frame_every
+        self.max_users = max(1, max_users)
+        self._lock = threading.Lock()
+        # { user_id: (context, frame_size, thumbnail, crops_since_full_frame) }, least recently seen first
+        self._last: "OrderedDict[str, Tuple[Tuple, Tuple[int, int], Image.Image, int]]" = OrderedDict()
+
+    def _thumbnail(self, img) -> "Image.Image":
+        size = (self.cols * _SAMPLES_PER_TILE, self.rows * _SAMPLES_PER_TILE)
+        return img.convert("L").resize(size, Image.BOX)
+
+    def diff(self, user_id: str, context: Tuple, img) -> Optional[ChangedRegion]:
+        """
+        Compare a decoded frame with the user's previous frame and remember it.
+
+        Args:
+            user_id (str): User the frame belongs to
+            context (tuple): Scope of the comparison, e.g. (lesson_id, step_order)
+            img (PIL.Image.Image): Decoded current frame
+
+        Returns:
+            Optional[ChangedRegion]: The region to crop, or None when the whole frame
+            should be analyzed (no baseline, step changed, change too large or too
+            spread out, or a periodic full frame is due)
+        """
+        thumb = self._thumbnail(img)
+        with self._lock:
+            previous = self._last.get(user_id)
+            crops = previous[3] if previous else 0
+            self._last[user_id] = (context, img.size, thumb, 0)
+            self._last.move_to_end(user_id)
+            while len(self._last) > self.max_users:
+                self._last.popitem(last=False)
+
+        if not previous or previous[0] != context or previous[1] != img.size:
+            return None
+        if crops + 1 >= self.full_frame_every:
+            return None
+
+        # Average the per-pixel difference over each tile in a single resize
+        per_tile = ImageChops.difference(previous[2], thumb).resize((self.cols, self.rows), Image.BOX)
+        changed = [
+            (index % self.cols, index // self.cols)
+            for index, value in enumerate(per_tile.tobytes())
+            if value > self.threshold
+        ]
+        if not changed:
+            return None
+
+        min_col = max(0, min(c for c, _ in changed) - self.context_tiles)
+        max_col = min(self.cols - 1, max(c for c, _ in changed) + self.context_tiles)
+        min_row = max(0, min(r for _, r in changed) - self.context_tiles)
+        max_row = min(self.rows - 1, max(r for _, r in changed) + self.context_tiles)
+
+        width, height = img.size
+        region = ChangedRegion(
+            box=(
+                min_col * width // self.cols,
+                min_row * height // self.rows,
+                (max_col + 1) * width // self.cols,
+                (max_row + 1) * height // self.rows,
+            ),
+            changed_tiles=len(changed),
+            total_tiles=self.cols * self.rows,
+            frame_size=img.size,
+        )
+        if region.area_fraction > self.max_area:
+            return None
+
+        with self._lock:
+            entry = self._last.get(user_id)
+            if entry and entry[2] is thumb:
+                self._last[user_id] = (entry[0], entry[1], entry[2], crops + 1)
+        return region
+
+    def select_analysis_image(self, user_id: str, context: Tuple, image: ImagePayload) -> ImagePayload:
+        """
+        Return the image to send to the verifier: a PNG crop of the changed region with
+        surrounding context when the change is localized, otherwise the original frame.
+        """
+        if Image is None:
+            return image
+        try:
+            with Image.open(io.BytesIO(decode_image_bytes(image))) as img:
+                img.load()
+                region = self.diff(user_id, context, img)
+                if region is None:
+                    return image
+                crop = img.crop(region.box)
+            buf = io.BytesIO()
+            crop.save(buf, format="PNG", compress_level=1)
+            logger.info(
+                f"Sending changed region {region.box} for user {user_id} "
+                f"({region.changed_tiles}/{region.total_tiles} tiles, {region.area_fraction:.0%} of frame)"
+            )
+            return buf.getvalue()
+        except Exception as e:
+            logger.debug(f"Tile diff unavailable, sending whole frame: {e}")
+            return image
+
+    def forget(self, user_id: str) -> None:
+        with self._lock:
+            self._last.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._last.clear()
+
+    def __len__(self) -> int:
+        return len(self._last)
+
+
+# Global instance for easy import
+tile_change_detector = TileChangeDetector()
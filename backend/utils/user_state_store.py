@@ -0,0 +1,411 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import redis
+    from redis.exceptions import WatchError
+except ImportError:  # redis is optional; only needed for USER_STATE_BACKEND=redis
+    redis = None
+
+    class WatchError(Exception):
+        """Raised by a Redis pipeline when a watched key changed before EXEC."""
+
+logger = logging.getLogger(__name__)
+
+# memory | sqlite | redis
+USER_STATE_BACKEND = os.getenv("USER_STATE_BACKEND", "memory").lower()
+# Users idle for longer than this are evicted, in seconds
+USER_STATE_TTL = float(os.getenv("USER_STATE_TTL", str(6 * 3600)))
+USER_STATE_SHARDS = int(os.getenv("USER_STATE_SHARDS", "16"))
+USER_STATE_SQLITE_PATH = os.getenv("USER_STATE_SQLITE_PATH", os.path.join(os.path.dirname(__file__), "..", "user_state.db"))
+USER_STATE_REDIS_URL = os.getenv("USER_STATE_REDIS_URL", "redis://localhost:6379/0")
+
+UserState = Dict[str, Any]
+
+
+class UserStateStore(ABC):
+    """
+    Per-user progression state: {'lesson_id': int, 'step_order': int, 'popup_sent_for_step': bool},
+    plus 'step_started_at' / 'next_check_at' / 'changed_at' (epoch seconds) once the step's
+    popup was sent.
+
+    Backends implement get/update/pop/clear/evict_idle; update() is an atomic
+    read-modify-write for one user, and the step operations below are built on it so
+    concurrent screenshots (or several workers sharing a backend) cannot double-send a
+    popup or skip a step. Values handed out are copies; mutate state through update().
+    """
+
+    @abstractmethod
+    def get(self, user_id: str, default: Optional[UserState] = None) -> Optional[UserState]:
+        """A copy of the user's state, or default if there is none."""
+
+    @abstractmethod
+    def update(self, user_id: str, fn: Callable[[UserState], Any]) -> Any:
+        """
+        Atomically apply fn to the user's state (an empty dict if none) and store it.
+
+        Returns:
+            Whatever fn returned
+        """
+
+    @abstractmethod
+    def pop(self, user_id: str, default: Optional[UserState] = None) -> Optional[UserState]:
+        """Remove and return the user's state, or default if there is none."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Drop every user."""
+
+    @abstractmethod
+    def evict_idle(self) -> int:
+        """Drop users idle for longer than the TTL; returns how many were dropped."""
+
+    def __getitem__(self, user_id: str) -> UserState:
+        state = self.get(user_id)
+        if state is None:
+            raise KeyError(user_id)
+        return state
+
+    def __contains__(self, user_id: str) -> bool:
+        return self.get(user_id) is not None
+
+    def claim_popup(self, user_id: str, lesson_id: int, step_order: int) -> bool:
+        """
+        Record the user's current lesson/step and claim the popup for it.
+
+        Returns:
+            bool: True if the popup for this step has not been sent yet and the caller
+            should send it (only one concurrent caller gets True)
+        """
+        def apply(state: UserState) -> bool:
+            state["lesson_id"] = lesson_id
+            state["step_order"] = step_order
+            if state.get("popup_sent_for_step"):
+                return False
+            state["popup_sent_for_step"] = True
+            state["step_started_at"] = time.time()
+            state.pop("next_check_at", None)
+            state.pop("changed_at", None)
+            return True
+
+        return self.update(user_id, apply)
+
+    def release_popup(self, user_id: str) -> None:
+        """Undo claim_popup when sending the popup failed, so the next frame retries."""
+        self.update(user_id, lambda state: state.__setitem__("popup_sent_for_step", False))
+
+    def set_step(self, user_id: str, lesson_id: int, step_order: int, popup_sent: bool = False) -> None:
+        """Overwrite the user's current lesson/step."""
+        def apply(state: UserState) -> None:
+            state.update(lesson_id=lesson_id, step_order=step_order, popup_sent_for_step=popup_sent)
+            state.pop("next_check_at", None)
+            state.pop("changed_at", None)
+            if popup_sent:
+                state["step_started_at"] = time.time()
+            else:
+                state.pop("step_started_at", None)
+
+        self.update(user_id, apply)
+
+    def claim_check(self, user_id: str, step_order: int, delay_for: Callable[[float], float]) -> Tuple[bool, Optional[float]]:
+        """
+        Decide whether a completion check of the user's current step is due, and if so
+        schedule the next one delay_for(elapsed) seconds from now.
+
+        Call it only for frames that differ from the last analyzed one; a frame that
+        is not due is remembered as the earliest change since the last check.
+
+        Returns:
+            Tuple[bool, Optional[float]]: (due, estimated seconds from the step's popup to
+            completion, or None when unknown); only one concurrent caller gets due=True
+            per slot. A YES here means the step was completed at or after the earliest
+            changed frame since the previous check and no later than now, so the
+            estimate is the middle of that interval, not the time the check ran.
+        """
+        def apply(state: UserState) -> Tuple[bool, Optional[float]]:
+            if state.get("step_order") != step_order or "step_started_at" not in state:
+                return True, None
+            now = time.time()
+            # Completion shows up in a changed frame, so it is no earlier than the first
+            # changed frame since the last check; cursor moves and typing change frames
+            # too, so it may be as late as this one
+            changed_at = state.get("changed_at", now)
+            if now < state.get("next_check_at", 0):
+                state["changed_at"] = changed_at
+                return False, None
+            state.pop("changed_at", None)
+            state["next_check_at"] = now + delay_for(now - state["step_started_at"])
+            return True, (changed_at + now) / 2 - state["step_started_at"]
+
+        return self.update(user_id, apply)
+
+    def advance_step(self, user_id: str, from_step: int, to_step: int) -> bool:
+        """
+        Move the user from `from_step` to `to_step` and reset the popup flag.
+
+        Returns:
+            bool: False if the user was no longer on `from_step` (another frame already advanced)
+        """
+        def apply(state: UserState) -> bool:
+            if state.get("step_order") != from_step:
+                return False
+            state["step_order"] = to_step
+            state["popup_sent_for_step"] = False
+            state.pop("step_started_at", None)
+            state.pop("next_check_at", None)
+            state.pop("changed_at", None)
+            return True
+
+        return self.update(user_id, apply)
+
+
+class _Shard:
+    __slots__ = ("lock", "entries", "ops")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # user_id -> (state, last_seen)
+        self.entries: Dict[str, Tuple[UserState, float]] = {}
+        self.ops = 0
+
+
+class InMemoryUserStateStore(UserStateStore):
+    """
+    Process-local backend: users are spread over lock-striped shards so threads
+    handling different users do not contend. Idle users are swept opportunistically.
+    """
+
+    _SWEEP_EVERY = 256
+
+    def __init__(self, ttl: float = USER_STATE_TTL, shards: int = USER_STATE_SHARDS, clock: Callable[[], float] = time.time):
+        self.ttl = ttl
+        self.clock = clock
+        self._shards = [_Shard() for _ in range(max(1, shards))]
+
+    def _shard(self, user_id: str) -> _Shard:
+        return self._shards[zlib.crc32(str(user_id).encode("utf-8")) % len(self._shards)]
+
+    def _expired(self, last_seen: float, now: float) -> bool:
+        return self.ttl > 0 and now - last_seen > self.ttl
+
+    def _sweep(self, shard: _Shard, now: float) -> int:
+        stale = [uid for uid, (_, seen) in shard.entries.items() if self._expired(seen, now)]
+        for uid in stale:
+            del shard.entries[uid]
+        return len(stale)
+
+    def get(self, user_id: str, default: Optional[UserState] = None) -> Optional[UserState]:
+        shard = self._shard(user_id)
+        now = self.clock()
+        with shard.lock:
+            entry = shard.entries.get(user_id)
+            if entry is None:
+                return default
+            if self._expired(entry[1], now):
+                del shard.entries[user_id]
+                return default
+            return dict(entry[0])
+
+    def update(self, user_id: str, fn: Callable[[UserState], Any]) -> Any:
+        shard = self._shard(user_id)
+        now = self.clock()
+        with shard.lock:
+            shard.ops += 1
+            if shard.ops % self._SWEEP_EVERY == 0:
+                self._sweep(shard, now)
+            entry = shard.entries.get(user_id)
+            state = dict(entry[0]) if entry and not self._expired(entry[1], now) else {}
+            result = fn(state)
+            shard.entries[user_id] = (state, now)
+            return result
+
+    def pop(self, user_id: str, default: Optional[UserState] = None) -> Optional[UserState]:
+        shard = self._shard(user_id)
+        with shard.lock:
+            entry = shard.entries.pop(user_id, None)
+        return entry[0] if entry else default
+
+    def clear(self) -> None:
+        for shard in self._shards:
+            with shard.lock:
+                shard.entries.clear()
+
+    def evict_idle(self) -> int:
+        now = self.clock()
+        dropped = 0
+        for shard in self._shards:
+            with shard.lock:
+                dropped += self._sweep(shard, now)
+        return dropped
+
+    def __len__(self) -> int:
+        return sum(len(shard.entries) for shard in self._shards)
+
+
+class SQLiteUserStateStore(UserStateStore):
+    """
+    SQLite backend for several worker processes on one host. update() runs inside a
+    BEGIN IMMEDIATE transaction, so the read-modify-write is atomic across processes.
+    """
+
+    def __init__(self, path: str = USER_STATE_SQLITE_PATH, ttl: float = USER_STATE_TTL, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.ttl = ttl
+        self.clock = clock
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS user_state ("
+                "user_id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS user_state_updated_at ON user_state(updated_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _cutoff(self) -> float:
+        return self.clock() - self.ttl if self.ttl > 0 else float("-inf")
+
+    def get(self, user_id: str, default: Optional[UserState] = None) -> Optional[UserState]:
+        row = self._connect().execute(
+            "SELECT state FROM user_state WHERE user_id = ? AND updated_at >= ?",
+            (user_id, self._cutoff()),
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def update(self, user_id: str, fn: Callable[[UserState], Any]) -> Any:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT state FROM user_state WHERE user_id = ? AND updated_at >= ?",
+                (user_id, self._cutoff()),
+            ).fetchone()
+            state = json.loads(row[0]) if row else {}
+            result = fn(state)
+            conn.execute(
+                "INSERT INTO user_state (user_id, state, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+                (user_id, json.dumps(state), self.clock()),
+            )
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def pop(self, user_id: str, default: Optional[UserState] = None) -> Optional[UserState]:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT state FROM user_state WHERE user_id = ?", (user_id,)).fetchone()
+            conn.execute("DELETE FROM user_state WHERE user_id = ?", (user_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return json.loads(row[0]) if row else default
+
+    def clear(self) -> None:
+        self._connect().execute("DELETE FROM user_state")
+
+    def evict_idle(self) -> int:
+        if self.ttl <= 0:
+            return 0
+        return self._connect().execute("DELETE FROM user_state WHERE updated_at < ?", (self._cutoff(),)).rowcount
+
+
+class RedisUserStateStore(UserStateStore):
+    """
+    Redis backend for workers on several hosts. Each user is one JSON value whose key
+    expiry implements the idle TTL; update() uses WATCH/MULTI/EXEC and retries when
+    another worker changed the user in between.
+    """
+
+    def __init__(self, client, ttl: float = USER_STATE_TTL, prefix: str = "mentra:user_state:", max_retries: int = 20):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.max_retries = max_retries
+
+    def _key(self, user_id: str) -> str:
+        return f"{self.prefix}{user_id}"
+
+    def _expiry(self) -> Optional[int]:
+        return max(1, int(self.ttl)) if self.ttl > 0 else None
+
+    @staticmethod
+    def _decode(raw) -> Optional[UserState]:
+        if raw is None:
+            return None
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8")
+        return json.loads(raw)
+
+    def get(self, user_id: str, default: Optional[UserState] = None) -> Optional[UserState]:
+        state = self._decode(self.client.get(self._key(user_id)))
+        return default if state is None else state
+
+    def update(self, user_id: str, fn: Callable[[UserState], Any]) -> Any:
+        key = self._key(user_id)
+        for _ in range(self.max_retries):
+            with self.client.pipeline() as pipe:
+                try:
+                    pipe.watch(key)
+                    state = self._decode(pipe.get(key)) or {}
+                    result = fn(state)
+                    pipe.multi()
+                    pipe.set(key, json.dumps(state), ex=self._expiry())
+                    pipe.execute()
+                    return result
+                except WatchError:
+                    continue
+        raise RuntimeError(f"Could not update state for user {user_id}: too much contention")
+
+    def pop(self, user_id: str, default: Optional[UserState] = None) -> Optional[UserState]:
+        key = self._key(user_id)
+        with self.client.pipeline() as pipe:
+            pipe.get(key)
+            pipe.delete(key)
+            raw, _ = pipe.execute()
+        state = self._decode(raw)
+        return default if state is None else state
+
+    def _keys(self) -> Iterator:
+        return self.client.scan_iter(match=f"{self.prefix}*")
+
+    def clear(self) -> None:
+        keys: List = list(self._keys())
+        if keys:
+            self.client.delete(*keys)
+
+    def evict_idle(self) -> int:
+        # Redis expires idle users itself
+        return 0
+
+
+def create_user_state_store(backend: str = USER_STATE_BACKEND) -> UserStateStore:
+    """Build the store selected by USER_STATE_BACKEND, falling back to memory."""
+    if backend == "sqlite":
+        return SQLiteUserStateStore()
+    if backend == "redis":
+        if redis is None:
+            logger.warning("USER_STATE_BACKEND=redis but the redis package is not installed; using memory")
+        else:
+            return RedisUserStateStore(redis.Redis.from_url(USER_STATE_REDIS_URL))
+    elif backend != "memory":
+        logger.warning(f"Unknown USER_STATE_BACKEND {backend!r}; using memory")
+    return InMemoryUserStateStore()
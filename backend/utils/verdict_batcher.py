@@ -0,0 +1,148 @@
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Collection window for cross-user batches; 0 disables batching
+VERDICT_BATCH_WINDOW_MS = float(os.getenv("VERDICT_BATCH_WINDOW_MS", "0"))
+VERDICT_BATCH_MAX_ITEMS = int(os.getenv("VERDICT_BATCH_MAX_ITEMS", "8"))
+# Batched requests in flight at once; further batches keep collecting until one finishes
+VERDICT_BATCH_WORKERS = int(os.getenv("VERDICT_BATCH_WORKERS", "4"))
+
+_ANSWER_RE = re.compile(r"(?:image\s*)?(\d+)\s*[:.)\-]\s*(YES|NO)\b", re.IGNORECASE)
+
+
+@dataclass
+class VerdictRequest:
+    """One completion check waiting for a verdict."""
+
+    image: str
+    media_type: str
+    finish_criteria: str
+    future: "Future[Optional[str]]" = field(default_factory=Future)
+
+
+def parse_batch_verdicts(text: str, count: int) -> Optional[List[str]]:
+    """
+    Parse a numbered multi-image answer ("1: YES\\n2: NO") into per-image verdicts.
+
+    Returns:
+        Optional[List[str]]: One "YES"/"NO" per image in order, or None if any is missing
+    """
+    answers = {}
+    for number, verdict in _ANSWER_RE.findall(text or ""):
+        index = int(number)
+        if 1 <= index <= count and index not in answers:
+            answers[index] = verdict.upper()
+    if len(answers) != count:
+        return None
+    return [answers[i] for i in range(1, count + 1)]
+
+
+class VerdictBatcher:
+    """
+    Collects completion checks from many users for a short window and sends them as
+    one multi-image request, then fans each image's YES/NO back to its waiter.
+
+    A batch is flushed when window_ms has passed since its first item or when it holds
+    max_items. Up to `workers` batches are in flight at once on a thread pool; while all
+    are busy, new checks keep collecting into the next batch. Single-item batches, and
+    batches whose answer cannot be parsed, go through send_single, concurrently per item.
+    """
+
+    def __init__(
+        self,
+        send_single: Callable[[VerdictRequest], Optional[str]],
+        send_batch: Callable[[List[VerdictRequest]], Optional[str]],
+        window_ms: float = VERDICT_BATCH_WINDOW_MS,
+        max_items: int = VERDICT_BATCH_MAX_ITEMS,
+        workers: int = VERDICT_BATCH_WORKERS,
+    ):
+        self.send_single = send_single
+        self.send_batch = send_batch
+        self.window = window_ms / 1000.0
+        self.max_items = max(1, max_items)
+        self.workers = max(1, workers)
+        # Batch requests, and the per-item single checks they fall back to, run on separate
+        # pools so a flush never waits on its own pool
+        self._batch_slots = threading.BoundedSemaphore(self.workers)
+        self._batch_executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="verdict-batch")
+        self._single_executor = ThreadPoolExecutor(
+            max_workers=self.workers * self.max_items, thread_name_prefix="verdict-single"
+        )
+        self._cond = threading.Condition()
+        self._pending: List[VerdictRequest] = []
+        self._worker: Optional[threading.Thread] = None
+        self.batches_sent = 0
+        self.items_batched = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    def submit(self, image: str, media_type: str, finish_criteria: str) -> "Future[Optional[str]]":
+        """Queue a check; the returned future resolves to the verdict text."""
+        request = VerdictRequest(image=image, media_type=media_type, finish_criteria=finish_criteria)
+        with self._cond:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._loop, name="verdict-batcher", daemon=True)
+                self._worker.start()
+            self._pending.append(request)
+            self._cond.notify_all()
+        return request.future
+
+    def _loop(self) -> None:
+        while True:
+            # Wait for a free slot first; checks arriving meanwhile join the next batch
+            self._batch_slots.acquire()
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                deadline = time.monotonic() + self.window
+                while len(self._pending) < self.max_items:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[: self.max_items]
+                del self._pending[: self.max_items]
+            self._batch_executor.submit(self._flush_in_slot, batch)
+
+    def _flush_in_slot(self, batch: List[VerdictRequest]) -> None:
+        try:
+            self._flush(batch)
+        finally:
+            self._batch_slots.release()
+
+    def _flush(self, batch: List[VerdictRequest]) -> None:
+        if len(batch) > 1:
+            try:
+                verdicts = parse_batch_verdicts(self.send_batch(batch), len(batch))
+            except Exception as e:
+                logger.warning(f"Batched verdict request failed; checking individually: {e}")
+                verdicts = None
+            if verdicts is not None:
+                self.batches_sent += 1
+                self.items_batched += len(batch)
+                for request, verdict in zip(batch, verdicts):
+                    request.future.set_result(verdict)
+                return
+            logger.warning(f"Could not parse batched verdicts for {len(batch)} images; checking individually")
+
+        if len(batch) == 1:
+            self._resolve_single(batch[0])
+            return
+        for request in batch:
+            self._single_executor.submit(self._resolve_single, request)
+
+    def _resolve_single(self, request: VerdictRequest) -> None:
+        try:
+            request.future.set_result(self.send_single(request))
+        except Exception as e:
+            request.future.set_exception(e)
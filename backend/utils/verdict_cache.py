@@ -0,0 +1,156 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+VERDICT_CACHE_SIZE = int(os.getenv("VERDICT_CACHE_SIZE", "2048"))
+VERDICT_CACHE_TTL = float(os.getenv("VERDICT_CACHE_TTL", "3600"))
+# Optional JSON file the cache is loaded from at startup and saved to periodically
+VERDICT_CACHE_PATH = os.getenv("VERDICT_CACHE_PATH", "")
+VERDICT_CACHE_SAVE_INTERVAL = float(os.getenv("VERDICT_CACHE_SAVE_INTERVAL", "30"))
+
+# (pixel content hash, finish-criteria hash, model id)
+VerdictKey = Tuple[str, str, str]
+
+
+def criteria_hash(finish_criteria: Optional[str]) -> str:
+    """Hash of the finish criteria with case and whitespace differences normalized away."""
+    normalized = " ".join((finish_criteria or "").lower().split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def make_key(fingerprint: str, finish_criteria: Optional[str], model: str, criteria_key: Optional[str] = None) -> VerdictKey:
+    """
+    Key for a verdict; fingerprint is compute_fingerprint()'s SHA-256 of the decoded pixels.
+    criteria_key is criteria_hash(finish_criteria) when the caller already has it.
+    """
+    return (fingerprint, criteria_key if criteria_key is not None else criteria_hash(finish_criteria), model)
+
+
+class VerdictCache:
+    """
+    Bounded LRU cache of completion verdicts with a per-entry TTL.
+
+    Keys are (pixel content hash, finish-criteria hash, model id), so users who reach the
+    same step with a pixel-identical screen share one model call; screens that differ in
+    any pixel never share a verdict.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = VERDICT_CACHE_SIZE,
+        ttl: float = VERDICT_CACHE_TTL,
+        path: Optional[str] = VERDICT_CACHE_PATH or None,
+        save_interval: float = VERDICT_CACHE_SAVE_INTERVAL,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        # { key: (verdict, expires_at) }, expires_at in wall-clock seconds so it survives restarts
+        self._entries: "OrderedDict[VerdictKey, Tuple[str, float]]" = OrderedDict()
+        self._dirty = False
+        self._last_save = time.time()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.path:
+            self.load()
+
+    def get(self, key: VerdictKey) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[1] <= time.time():
+                del self._entries[key]
+                self._dirty = True
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: VerdictKey, verdict: str) -> None:
+        with self._lock:
+            self._entries[key] = (verdict, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._dirty = True
+            save_due = self.path and time.time() - self._last_save >= self.save_interval
+        if save_due:
+            self.save()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self._dirty = True
+
+    def load(self) -> int:
+        """Load unexpired entries from the cache file; returns how many were loaded."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as handle:
+                rows = json.load(handle)
+        except FileNotFoundError:
+            return 0
+        except Exception as e:
+            logger.warning(f"Failed to load verdict cache from {self.path}: {e}")
+            return 0
+
+        now = time.time()
+        with self._lock:
+            for fingerprint, crit_hash, model, verdict, expires_at in rows:
+                # Entries keyed by the old 64-bit perceptual hash (ints) are dropped
+                if isinstance(fingerprint, str) and expires_at > now:
+                    self._entries[(fingerprint, crit_hash, model)] = (verdict, expires_at)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            loaded = len(self._entries)
+        logger.info(f"Loaded {loaded} cached verdicts from {self.path}")
+        return loaded
+
+    def save(self) -> None:
+        """Write entries to the cache file atomically (no-op without a path or changes)."""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            rows = [[key[0], key[1], key[2], verdict, expires_at] for key, (verdict, expires_at) in self._entries.items()]
+            self._dirty = False
+            self._last_save = time.time()
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as handle:
+                json.dump(rows, handle)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Failed to save verdict cache to {self.path}: {e}")
+
+
+# Global instance for easy import
+verdict_cache = VerdictCache()
+atexit.register(verdict_cache.save)
@@ -0,0 +1,142 @@
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+VERDICT_STREAMING = os.getenv("VERDICT_STREAMING", "1") == "1"
+# Output budget for a single-image verdict; also used to give up on rambling streams
+VERDICT_MAX_TOKENS = int(os.getenv("VERDICT_MAX_TOKENS", "16"))
+
+_DECISION_RE = re.compile(r"(?<![A-Z])(YES|NO)(?![A-Z])")
+
+
+def parse_decision(text: Optional[str]) -> Optional[str]:
+    """First standalone YES/NO in a complete answer ("Yes." -> "YES"), or None."""
+    match = _DECISION_RE.search((text or "").upper())
+    return match.group(1) if match else None
+
+
+@dataclass
+class Verdict:
+    """
+    Outcome of one completion check.
+
+    text is what analyze_screenshot() returns: the decision when there is one,
+    otherwise the raw reply or a status string such as "ERROR".
+    """
+
+    decision: Optional[str]
+    text: str
+    source: str
+    latency_ms: float = 0.0
+    output_tokens: Optional[int] = None
+    early_stopped: bool = False
+
+    @property
+    def completed(self) -> bool:
+        return self.decision == "YES"
+
+    @classmethod
+    def from_text(cls, text: Optional[str], source: str, latency_ms: float = 0.0, output_tokens: Optional[int] = None) -> "Verdict":
+        decision = parse_decision(text)
+        return cls(decision, decision or (text or ""), source, latency_ms, output_tokens)
+
+
+class VerdictStreamParser:
+    """
+    Incremental YES/NO detector for a token stream.
+
+    A candidate is only accepted once the next character shows the word ended, so "NO"
+    is not mistaken for the start of "NOT"; finish() accepts a candidate at the very end.
+    """
+
+    def __init__(self):
+        self.text = ""
+
+    def feed(self, chunk: str) -> Optional[str]:
+        self.text += chunk
+        upper = self.text.upper()
+        for match in _DECISION_RE.finditer(upper):
+            if match.end() < len(upper):
+                return match.group(1)
+        return None
+
+    def finish(self) -> Optional[str]:
+        return parse_decision(self.text)
+
+
+def _chunk_text(chunk: Any) -> str:
+    """Assistant text carried by one Letta stream chunk (empty for reasoning, usage, ...)."""
+    message_type = getattr(chunk, "message_type", "assistant_message")
+    if message_type != "assistant_message":
+        return ""
+    content = getattr(chunk, "content", None)
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(getattr(part, "text", "") or "" for part in content)
+    return ""
+
+
+def consume_verdict_stream(
+    stream: Iterable[Any],
+    started_at: float,
+    early_stop: bool = True,
+    max_tokens: int = VERDICT_MAX_TOKENS,
+) -> Verdict:
+    """
+    Read a Letta token stream until the verdict is known.
+
+    With early_stop, reading stops (and the stream is closed, cancelling the rest of
+    the generation) at the first unambiguous YES/NO, or after max_tokens text chunks.
+
+    Args:
+        stream: Iterator from client.agents.messages.create_stream(..., stream_tokens=True)
+        started_at: time.perf_counter() when the request was sent
+
+    Returns:
+        Verdict: source "stream"; output_tokens from the usage chunk when the stream
+        ran to completion, otherwise the number of text chunks read
+    """
+    parser = VerdictStreamParser()
+    text_chunks = 0
+    usage_tokens = None
+    decision = None
+    early_stopped = False
+    try:
+        for chunk in stream:
+            if getattr(chunk, "message_type", None) == "usage_statistics":
+                usage_tokens = getattr(chunk, "completion_tokens", None)
+                continue
+            text = _chunk_text(chunk)
+            if not text:
+                continue
+            text_chunks += 1
+            if not early_stop:
+                parser.text += text
+                continue
+            decision = parser.feed(text)
+            if decision is not None or text_chunks >= max_tokens:
+                early_stopped = True
+                break
+    finally:
+        if early_stopped:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except Exception as e:
+                    logger.debug(f"Closing verdict stream failed: {e}")
+
+    if decision is None:
+        decision = parser.finish()
+    latency_ms = (time.perf_counter() - started_at) * 1000
+    tokens = usage_tokens if usage_tokens is not None else text_chunks
+    if not early_stop:
+        # Multi-answer replies (batches) are parsed by the caller
+        return Verdict(None, parser.text, "stream", latency_ms, tokens)
+    return Verdict(decision, decision or parser.text, "stream", latency_ms, tokens, early_stopped)
@@ -0,0 +1,333 @@
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+# Whole-call budget for one completion check (all attempts), in seconds; starts once
+# the check holds an agent
+VERIFIER_DEADLINE = float(os.getenv("VERIFIER_DEADLINE", "15"))
+# Longest wait for a free agent before the check gives up (not a provider failure)
+VERIFIER_QUEUE_TIMEOUT = float(os.getenv("VERIFIER_QUEUE_TIMEOUT", "30"))
+# Threads running verifier calls; hedges and abandoned slow calls count against it
+VERIFIER_WORKERS = int(os.getenv("VERIFIER_WORKERS", "16"))
+# Send a duplicate request once the first has been outstanding for this latency quantile
+VERIFIER_HEDGE_ENABLED = os.getenv("VERIFIER_HEDGE", "1") == "1"
+VERIFIER_HEDGE_QUANTILE = float(os.getenv("VERIFIER_HEDGE_QUANTILE", "0.95"))
+VERIFIER_HEDGE_MIN_DELAY = float(os.getenv("VERIFIER_HEDGE_MIN_DELAY", "0.5"))
+# Hedge delay used until enough latencies have been observed
+VERIFIER_HEDGE_DEFAULT_DELAY = float(os.getenv("VERIFIER_HEDGE_DEFAULT_DELAY", "3"))
+# Hedges allowed per call on average, so a slow provider is not hit with double load
+VERIFIER_HEDGE_BUDGET = float(os.getenv("VERIFIER_HEDGE_BUDGET", "0.1"))
+# Circuit breaker: open when at least this share of the last WINDOW calls failed
+VERIFIER_BREAKER_FAILURE_RATE = float(os.getenv("VERIFIER_BREAKER_FAILURE_RATE", "0.5"))
+VERIFIER_BREAKER_WINDOW = int(os.getenv("VERIFIER_BREAKER_WINDOW", "20"))
+VERIFIER_BREAKER_MIN_CALLS = int(os.getenv("VERIFIER_BREAKER_MIN_CALLS", "10"))
+# Seconds the breaker stays open before letting a probe call through
+VERIFIER_BREAKER_OPEN_SECONDS = float(os.getenv("VERIFIER_BREAKER_OPEN_SECONDS", "30"))
+
+# Latencies kept for quantiles
+_LATENCY_WINDOW = 512
+_LATENCY_MIN_SAMPLES = 20
+
+T = TypeVar("T")
+
+
+class VerifierTimeout(Exception):
+    """No attempt finished within the call's deadline."""
+
+
+class CircuitOpenError(Exception):
+    """The circuit breaker is open; the call was not attempted."""
+
+
+class LatencyWindow:
+    """Latencies of the most recent successful calls, for quantiles."""
+
+    def __init__(self, size: int = _LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    """
+    Rolling-window circuit breaker.
+
+    closed: calls go through; outcomes are kept for the last `window` calls, and the
+    breaker opens once at least min_calls are known and the failure share reaches
+    failure_rate. open: calls are refused until open_seconds have passed. half_open:
+    one probe call is let through; its success closes the breaker, its failure
+    re-opens it.
+    """
+
+    def __init__(
+        self,
+        failure_rate: float = VERIFIER_BREAKER_FAILURE_RATE,
+        window: int = VERIFIER_BREAKER_WINDOW,
+        min_calls: int = VERIFIER_BREAKER_MIN_CALLS,
+        open_seconds: float = VERIFIER_BREAKER_OPEN_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._outcomes: Deque[bool] = deque(maxlen=max(1, window))
+        self._opened_at = 0.0
+        self._probing = False
+        self.state = "closed"
+        self.opened = 0
+
+    def allow(self) -> bool:
+        """Whether a call may be attempted now."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and self.clock() - self._opened_at >= self.open_seconds:
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record(self, success: bool) -> None:
+        with self._lock:
+            if self.state == "half_open":
+                if success:
+                    logger.info("Verifier circuit closed")
+                    self.state = "closed"
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if self.state == "closed" and len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+                self._open()
+
+    def _open(self) -> None:
+        self.state = "open"
+        self._opened_at = self.clock()
+        self._probing = False
+        self.opened += 1
+        logger.warning(f"Verifier circuit opened for {self.open_seconds:g}s")
+
+    def reset(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self._outcomes.clear()
+            self._probing = False
+            self.opened = 0
+
+
+class ResilientCaller:
+    """
+    Runs provider calls with a deadline, a hedged duplicate and a circuit breaker.
+
+    call(fn) starts fn on a worker thread. If it has not returned after the hedge delay
+    (the hedge_quantile of recent latencies), a second fn() is started and the first
+    successful result wins. A call that has not succeeded by the deadline raises
+    VerifierTimeout; the abandoned attempts finish in the background (synchronous
+    HTTP calls cannot be cancelled) without blocking the caller. While the breaker
+    is open, call() raises CircuitOpenError immediately.
+
+    With a lease (e.g. the AgentPool), each attempt runs fn(resource) on a resource it
+    holds for the whole attempt. The primary's resource is taken before the deadline
+    starts, so time spent queueing for it neither eats into the deadline nor counts
+    against the breaker; a hedge is only sent when another resource is idle at once.
+    """
+
+    def __init__(
+        self,
+        deadline: float = VERIFIER_DEADLINE,
+        hedge: bool = VERIFIER_HEDGE_ENABLED,
+        hedge_quantile: float = VERIFIER_HEDGE_QUANTILE,
+        hedge_min_delay: float = VERIFIER_HEDGE_MIN_DELAY,
+        hedge_default_delay: float = VERIFIER_HEDGE_DEFAULT_DELAY,
+        hedge_budget: float = VERIFIER_HEDGE_BUDGET,
+        breaker: Optional[CircuitBreaker] = None,
+        max_workers: int = VERIFIER_WORKERS,
+        queue_timeout: float = VERIFIER_QUEUE_TIMEOUT,
+    ):
+        self.deadline = deadline
+        self.queue_timeout = queue_timeout
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_default_delay = hedge_default_delay
+        self.hedge_budget = hedge_budget
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.latencies = LatencyWindow()
+        self._executor = ThreadPoolExecutor(max_workers=max(2, max_workers), thread_name_prefix="verifier")
+        self._lock = threading.Lock()
+        self._hedge_tokens = 1.0
+        self._counters: Dict[str, int] = dict.fromkeys(
+            (
+                "calls", "successes", "failures", "timeouts", "short_circuits", "queue_timeouts",
+                "hedges", "hedges_skipped", "hedge_wins", "fallbacks",
+            ),
+            0,
+        )
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for the first attempt before sending a duplicate."""
+        if len(self.latencies) < _LATENCY_MIN_SAMPLES:
+            return self.hedge_default_delay
+        return max(self.hedge_min_delay, self.latencies.quantile(self.hedge_quantile))
+
+    def _take_hedge_token(self) -> bool:
+        with self._lock:
+            if self._hedge_tokens >= 1:
+                self._hedge_tokens -= 1
+                return True
+            return False
+
+    def _timed(self, fn: Callable[..., T], lease: Any = None, resource: Any = None) -> Callable[[], T]:
+        def run() -> T:
+            started_at = time.perf_counter()
+            try:
+                result = fn(resource) if lease is not None else fn()
+            finally:
+                if lease is not None:
+                    lease.give_back(resource)
+            self.latencies.add(time.perf_counter() - started_at)
+            return result
+
+        return run
+
+    def call(self, fn: Callable[..., T], deadline: Optional[float] = None, lease: Any = None) -> T:
+        """
+        Run fn under the deadline, hedging and circuit breaker.
+
+        Args:
+            fn (callable): The provider call; called as fn(resource) when a lease is given
+            deadline (float): Overrides the caller's default deadline, in seconds
+            lease: Pool each attempt borrows a resource from, with borrow(timeout),
+                try_borrow() and give_back(resource) (e.g. AgentPool)
+
+        Raises:
+            CircuitOpenError: The breaker is open
+            VerifierTimeout: No attempt succeeded within the deadline, or no resource
+                became free within queue_timeout
+            Exception: What the last attempt raised, when every attempt failed
+        """
+        resource = None
+        if lease is not None:
+            # Queueing for a busy agent is load, not provider latency
+            try:
+                resource = lease.borrow(timeout=self.queue_timeout)
+            except queue.Empty:
+                self._count("queue_timeouts")
+                raise VerifierTimeout(f"no verifier agent free within {self.queue_timeout:g}s")
+        if not self.breaker.allow():
+            if lease is not None:
+                lease.give_back(resource)
+            self._count("short_circuits")
+            raise CircuitOpenError("verifier circuit is open")
+        self._count("calls")
+        with self._lock:
+            self._hedge_tokens = min(10.0, self._hedge_tokens + self.hedge_budget)
+
+        deadline = self.deadline if deadline is None else deadline
+        deadline_at = time.monotonic() + deadline
+        attempts = {self._executor.submit(self._timed(fn, lease, resource)): "primary"}
+        hedge_at = time.monotonic() + self.hedge_delay() if self.hedge else None
+        last_error: Optional[BaseException] = None
+
+        while attempts:
+            now = time.monotonic()
+            if now >= deadline_at:
+                break
+            wake_at = min(deadline_at, hedge_at) if hedge_at is not None else deadline_at
+            done, _ = wait(list(attempts), timeout=max(0.0, wake_at - now), return_when=FIRST_COMPLETED)
+            for future in done:
+                kind = attempts.pop(future)
+                error = future.exception()
+                if error is None:
+                    if kind == "hedge":
+                        self._count("hedge_wins")
+                    self._finish(True)
+                    return future.result()
+                last_error = error
+                logger.warning(f"Verifier {kind} attempt failed: {error}")
+            # The hedge goes out when the primary is slow, or at once if it already failed
+            if hedge_at is not None and (not attempts or time.monotonic() >= hedge_at):
+                hedge_at = None
+                self._hedge(fn, lease, attempts)
+
+        self._finish(False)
+        if attempts:
+            self._count("timeouts")
+            raise VerifierTimeout(f"verifier did not answer within {deadline:g}s")
+        raise last_error
+
+    def _hedge(self, fn: Callable[..., T], lease: Any, attempts: Dict[Any, str]) -> None:
+        resource = None
+        if lease is not None:
+            # A duplicate that would queue behind the primary's agent gains nothing
+            resource = lease.try_borrow()
+            if resource is None:
+                self._count("hedges_skipped")
+                return
+        if not self._take_hedge_token():
+            if lease is not None:
+                lease.give_back(resource)
+            return
+        self._count("hedges")
+        attempts[self._executor.submit(self._timed(fn, lease, resource))] = "hedge"
+
+    def _finish(self, success: bool) -> None:
+        self._count("successes" if success else "failures")
+        self.breaker.record(success)
+
+    def record_fallback(self) -> None:
+        self._count("fallbacks")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+        stats["circuit"] = self.breaker.state
+        stats["circuit_opened"] = self.breaker.opened
+        for name, q in (("p50_ms", 0.5), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+            value = self.latencies.quantile(q)
+            stats[name] = round(value * 1000, 1) if value is not None else None
+        stats["hedge_delay_ms"] = round(self.hedge_delay() * 1000, 1)
+        return stats
+
+    def reset(self) -> None:
+        with self._lock:
+            for name in self._counters:
+                self._counters[name] = 0
+            self._hedge_tokens = 1.0
+        self.latencies = LatencyWindow()
+        self.breaker.reset()
+
+
+# Global instance for easy import
+verifier_guard = ResilientCaller()
@@ -26,6 +26,11 @@ const OverlayScreen = () => {
     });
 
     let stopped = false;
+    // Capture cadence recommended by the backend; starts at the old fixed 10s
+    let captureIntervalMs = 10000;
+    const unsubscribeInterval = wsClient.subscribeCaptureInterval((ms) => {
+      captureIntervalMs = ms;
+    });
 
     async function run() {
       try {
@@ -37,11 +42,21 @@ const OverlayScreen = () => {
           return;
         }
 
-        // Loop: every 10s send screenshot; backend will compare and advance
+        // Loop: send a screenshot every capture interval; backend will compare and advance
         while (!stopped) {
-          await new Promise((r) => setTimeout(r, 10000));
-          const resp = await sendScreenshot();
+          await new Promise((r) => setTimeout(r, captureIntervalMs));
+          let resp;
+          try {
+            resp = await sendScreenshot();
+          } catch (err) {
+            // 429: we are ahead of the server's token bucket; adopt its interval and retry
+            const limited = err?.response?.status === 429 ? err.response.data : null;
+            if (!limited) throw err;
+            if (limited.capture_interval_ms > 0) captureIntervalMs = limited.capture_interval_ms;
+            continue;
+          }
           const d = resp?.data || {};
+          if (d.capture_interval_ms > 0) captureIntervalMs = d.capture_interval_ms;
           if (d.lesson_completed) break;
           // if d.completed === true, backend advanced; continue
           // if false, wait and retry
@@ -55,6 +70,7 @@ const OverlayScreen = () => {
 
     return () => {
       unsubscribe();
+      unsubscribeInterval();
       wsClient.disconnectWebSocket();
       stopped = true;
     };
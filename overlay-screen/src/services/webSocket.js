@@ -2,6 +2,7 @@ import { io } from "socket.io-client";
 
 let socket = null;
 let listener = null;
+let intervalListener = null;
 
 function deriveBaseUrl(inputUrl) {
   try {
@@ -30,6 +31,23 @@ export function connectWebSocket(url) {
     // no-op; can be logged if needed
   });
 
+  // Join this user's room so targeted popups and capture-rate hints reach us
+  socket.on("connect", () => {
+    socket.emit("join_user_room", {
+      user_id: process.env.REACT_APP_USER_ID || "default-user",
+    });
+  });
+
+  // Server-recommended screenshot interval (backs off under load or when idle)
+  socket.on("capture_interval", (data) => {
+    if (typeof intervalListener === "function" && data?.interval_ms > 0) {
+      try {
+        intervalListener(data.interval_ms);
+      } catch (_e) {
+      }
+    }
+  });
+
   // Core popup channel from Flask-SocketIO
   socket.on("popup_message", (data) => {
     if (typeof listener === "function") {
@@ -59,6 +77,16 @@ export function subscribeWebSocket(callback) {
   return () => {};
 }
 
+export function subscribeCaptureInterval(callback) {
+  if (typeof callback === "function") {
+    intervalListener = callback;
+    return () => {
+      if (intervalListener === callback) intervalListener = null;
+    };
+  }
+  return () => {};
+}
+
 export function disconnectWebSocket() {
   if (socket) {
     try {
@@ -69,10 +97,12 @@ export function disconnectWebSocket() {
     socket = null;
   }
   listener = null;
+  intervalListener = null;
 }
 
 export default {
   connectWebSocket,
   subscribeWebSocket,
+  subscribeCaptureInterval,
   disconnectWebSocket,
 };